@@ -1,22 +1,139 @@
-import streamlit as st
-import zipfile
-import pandas as pd
-from io import BytesIO
 import os
+import zipfile
+from contextlib import nullcontext
+import streamlit as st
 from gde_unb import (
-    adequa_dataset,
-    avalia_elemento,
-    avalia_familia,
-    avaliar_estrutura,
-    gerar_relatorio_html,
-    image_to_base64
+    FR_DESCRICAO,
+    AvaliacaoIncremental,
+    CacheLRU,
+    CachePlanilhas,
+    Diagnostico,
+    EspacoSessao,
+    PROBLEMAS_PLANILHA,
+    RegistroFotos,
+    DIMENSAO_MAX_FOTO,
+    QUALIDADE_JPEG,
+    caminho_foto_original,
+    compara_inspecoes,
+    escreve_fotos_originais,
+    escreve_relatorio_arquivo,
+    etapa,
+    image_to_base64,
+    prepara_fotos,
+    infere_fr,
+    processa_planilha_ponte,
+    processa_zip_familia,
+    tabelas_inspecao
 )
+from gde_historico import HistoricoInspecoes
 
 st.set_page_config(page_title="Inspeção GDE/UnB", layout="wide")
+
+# Banco SQLite do histórico de inspeções (ver HistoricoInspecoes)
+CAMINHO_HISTORICO = os.environ.get("GDE_HISTORICO", "historico_gde.sqlite")
+
+# Memória máxima do cache de fotos reduzidas, compartilhado por todas as sessões
+LIMITE_CACHE_FOTOS_BYTES = int(float(os.environ.get("GDE_CACHE_FOTOS_MB", 128)) * 1024 ** 2)
+
+
+@st.cache_resource
+def cache_planilhas() -> CachePlanilhas:
+    return CachePlanilhas()
+
+
+@st.cache_resource
+def cache_fotos() -> CacheLRU:
+    # Fotos reduzidas indexadas pelo hash do conteúdo: cópias da mesma foto em outras famílias não são reprocessadas
+    return CacheLRU(max_entradas=1024, max_bytes=LIMITE_CACHE_FOTOS_BYTES)
+
+
+@st.cache_resource
+def logo_html() -> str:
+    # Lido e codificado em base64 uma única vez por processo, e não a cada nova execução do script
+    return f'<img src="data:image/png;base64,{image_to_base64("assets/images/GDE-logo.png")}" width="150"/>'
+
+
+@st.cache_resource
+def limpa_sessoes_abandonadas() -> int:
+    # Executada uma vez por processo: apaga diretórios de sessões de execuções anteriores do servidor
+    return EspacoSessao.limpa_antigas()
+
+
+@st.cache_data(max_entries=64)
+def historico_ponte(ponte: str, versao_banco: tuple) -> tuple:
+    # Série de G_d e maiores aumentos de G_de da ponte, consultados de novo só quando o banco (ou o seu WAL) é modificado
+    with HistoricoInspecoes(CAMINHO_HISTORICO) as historico:
+        return historico.serie_g_d(ponte), historico.maiores_crescimentos(10, ponte=ponte)
+
+
+def versao_historico() -> tuple:
+    # Datas de modificação do banco do histórico e do seu arquivo WAL, usadas como chave de historico_ponte
+    return tuple(os.stat(caminho).st_mtime_ns for caminho in (CAMINHO_HISTORICO, CAMINHO_HISTORICO + "-wal") if os.path.exists(caminho))
+
+
+def espaco_sessao() -> EspacoSessao:
+    # Arquivos enviados, fotos reduzidas e relatórios da sessão ficam em disco; a sessão guarda só os caminhos
+    if "espaco" not in st.session_state:
+        st.session_state["espaco"] = EspacoSessao()
+    return st.session_state["espaco"]
+
+
+def cache_familias() -> CacheLRU:
+    # Por sessão: as famílias guardadas apontam para arquivos do espaço da sessão
+    if "cache_familias" not in st.session_state:
+        st.session_state["cache_familias"] = CacheLRU(max_entradas=32)
+    return st.session_state["cache_familias"]
+
+
+def libera_espaco_sessao(*manter) -> None:
+    # Libera o disco da sessão (e tudo o que aponta para ele), exceto os arquivos indicados; as fotos reduzidas continuam no cache compartilhado
+    for chave in ("cache_familias", "avaliacao"):
+        st.session_state.pop(chave, None)
+    espaco_sessao().mantem(manter)
+
+
+def processa_familia(caminho_zip: str, nome_zip: str, dimensao_max: int, qualidade: int, manter_originais: bool) -> dict:
+    # Parte da família que não depende do F_r: leitura da planilha, avaliação dos elementos e preparo das fotos
+    familia = processa_zip_familia(caminho_zip, nome_zip, f_r=1, cache=cache_planilhas())
+    return prepara_fotos_familia(familia, dimensao_max, qualidade, manter_originais)
+
+
+def prepara_fotos_familia(familia: dict, dimensao_max: int, qualidade: int, manter_originais: bool) -> dict:
+    # Redução das fotos (e links para as originais) de uma família já avaliada
+    familia = dict(familia)
+    nome_arquivo = familia["nome_arquivo"]
+    fotos = familia["fotos"]
+    familia["originais"] = fotos if manter_originais else []
+    if manter_originais:
+        fotos = [(nome_img, leitor, caminho_foto_original(nome_arquivo, j, nome_img)) for j, (nome_img, leitor) in enumerate(fotos)]
+    familia["fotos"] = prepara_fotos(fotos, dimensao_max, qualidade, cache=cache_fotos(), espaco=espaco_sessao())
+    return familia
+
+
+def le_inspecao_anterior(arquivos, fr_atuais: dict) -> dict:
+    # Planilhas da inspeção anterior (um .zip por família), com o F_r da família atual de mesmo nome
+    familias = {}
+    for arquivo in arquivos:
+        caminho_zip, _ = espaco_sessao().guarda(arquivo, ".zip")
+        familia = processa_zip_familia(caminho_zip, arquivo.name, f_r=1, ler_fotos=False, cache=cache_planilhas())
+        nome = familia["nome_arquivo"]
+        familias[nome] = (familia["tabela_original"], fr_atuais.get(nome) or infere_fr(arquivo.name) or 1)
+    return familias
+
+
+def mostra_problemas(titulo: str, problemas) -> None:
+    # Problemas apontados pela validação da planilha (ver valida_dataset), com a descrição de cada tipo
+    if len(problemas):
+        st.warning(f"{titulo}: {len(problemas)} problema(s) na planilha.")
+        with st.expander(f"Problemas na planilha – {titulo}"):
+            st.dataframe(problemas.assign(descricao=problemas["tipo"].map(PROBLEMAS_PLANILHA)), hide_index=True)
+
+
+limpa_sessoes_abandonadas()
+
 st.title("Automatização da Inspeção GDE/UnB")
 
-img_base64 = image_to_base64("assets/images/GDE-logo.png")
-img_html = f'<img src="data:image/png;base64,{img_base64}" width="150"/>'
+img_html = logo_html()
 
 # Texto de entrada
 st.markdown(rf""" 
@@ -222,90 +339,258 @@ st.write("")
 
 
 # Configurações do Streamlit
-fr_descricao = {
-    1: "Barreiras, guarda-corpo, guarda rodas, pista de rolamento",
-    2: "Juntas de dilatação",
-    3: "Transversinas, cortinas, alas",
-    4: "Lajes, fundações, vigas secundárias, aparelhos de apoio",
-    5: "Vigas e pilares principais",
-}
+fr_descricao = FR_DESCRICAO
 
-num_familias = st.number_input("Quantas famílias deseja processar?", min_value=1, step=1)
+modo_planilha = st.radio(
+    "Formato dos dados de entrada",
+    [False, True],
+    format_func=lambda x: "Planilha única da ponte (.xlsx, todas as famílias)" if x else "Um arquivo .zip por família",
+    horizontal=True
+)
 
 uploaded_zips = []
 fr_selecionados = []
+familias_planilha = []
+
+if modo_planilha:
+    uploaded_planilha = st.file_uploader("Upload da planilha da ponte (.xlsx)", type="xlsx")
+    if uploaded_planilha:
+        try:
+            caminho_planilha, chave_planilha = espaco_sessao().guarda(uploaded_planilha, ".xlsx")
+            familias_planilha = cache_familias().obter_ou_calcular(
+                (chave_planilha, "planilha"), lambda: processa_planilha_ponte(caminho_planilha)
+            )
+        except (ValueError, KeyError, zipfile.BadZipFile) as erro:
+            st.error(f"Não foi possível ler a planilha: {erro}")
+        else:
+            if not familias_planilha:
+                st.warning("Nenhuma família encontrada na planilha.")
+
+    for i, familia in enumerate(familias_planilha):
+        st.markdown(f"### Família {i+1} – {familia['nome_arquivo']}")
+        st.caption(f"{len(familia['nome_elementos'])} elemento(s), {len(familia['fotos'])} foto(s).")
+        mostra_problemas(familia["nome_arquivo"], familia["problemas"])
+        opcoes_fr = list(fr_descricao.keys())
+        fr = st.selectbox(f"Grupo familiar ($F_r$) da Família {i+1}:", options=opcoes_fr,
+                          index=opcoes_fr.index(familia["f_r"]) if familia["f_r"] in opcoes_fr else 0,
+                          format_func=lambda x: f"{x} - {fr_descricao[x]}", key=f"fr_planilha_{chave_planilha}_{i}")
+        fr_selecionados.append(fr)
+else:
+    num_familias = st.number_input("Quantas famílias deseja processar?", min_value=1, step=1)
+
+    for i in range(num_familias):
+        st.markdown(f"### Família {i+1}")
+        uploaded_zip = st.file_uploader(f"Upload .zip da Família {i+1}", type="zip", key=f"zip_{i}")
+        fr = st.selectbox(f"Grupo familiar ($F_r$) da Família {i+1}:", options=list(fr_descricao.keys()),
+                          format_func=lambda x: f"{x} - {fr_descricao[x]}", key=f"fr_{i}")
+        uploaded_zips.append(uploaded_zip)
+        fr_selecionados.append(fr)
+
+with st.expander("Opções das fotos do relatório"):
+    dimensao_max = st.number_input("Dimensão máxima das fotos (px)", min_value=100, max_value=4000, value=DIMENSAO_MAX_FOTO, step=50)
+    qualidade = st.slider("Qualidade JPEG", min_value=30, max_value=95, value=QUALIDADE_JPEG)
+    manter_originais = st.checkbox("Disponibilizar as fotos originais (.zip separado, com links no relatório)")
+    relatorio_em_arquivo = st.radio(
+        "Formato do relatório",
+        [False, True],
+        format_func=lambda x: "Arquivo .zip (uma página por família, fotos em arquivos separados)" if x else "HTML único (fotos embutidas)"
+    )
 
-for i in range(num_familias):
-    st.markdown(f"### Família {i+1}")
-    uploaded_zip = st.file_uploader(f"Upload .zip da Família {i+1}", type="zip", key=f"zip_{i}")
-    fr = st.selectbox(f"Grupo familiar ($F_r$) da Família {i+1}:", options=list(fr_descricao.keys()),
-                      format_func=lambda x: f"{x} - {fr_descricao[x]}", key=f"fr_{i}")
-    uploaded_zips.append(uploaded_zip)
-    fr_selecionados.append(fr)
+with st.expander("Histórico de inspeções"):
+    ponte = st.text_input("Identificação da ponte")
+    data_inspecao = st.date_input("Data da inspeção")
+    salvar_historico = st.checkbox("Salvar o resultado no histórico", disabled=not ponte)
+    zips_anteriores = st.file_uploader(
+        "Inspeção anterior (arquivos .zip das famílias, opcional): o relatório inclui a comparação com a inspeção atual",
+        type="zip", accept_multiple_files=True
+    )
+
+diagnostico_ativo = st.checkbox("Registrar diagnóstico de desempenho (tempo e memória por etapa)")
 
 if st.button("Calcular"):
-    resultados_familias = {}
-    tabelas_originais = {}
-    imagens_por_familia = {}
-    nomes_arquivos = []
-    elementos_por_familia = {}
-
-    for i, (uploaded_zip, fr) in enumerate(zip(uploaded_zips, fr_selecionados)):
-        if uploaded_zip:
-            with zipfile.ZipFile(uploaded_zip, 'r') as zip_ref:
-                planilha_nome = next((f for f in zip_ref.namelist() if f.endswith(('.xlsx', '.xls'))), None)
-                if not planilha_nome:
-                    st.error(f"Família {i+1}: Nenhuma planilha encontrada no .zip")
+    if espaco_sessao().bytes_usados > espaco_sessao().limite_bytes // 2:
+        # Arquivos de envios antigos acumulados: o novo cálculo recomeça com o disco vazio, mantendo o último relatório
+        # (ainda disponível para download) e a planilha da ponte já lida nesta execução
+        libera_espaco_sessao(st.session_state.get("html_path"), st.session_state.get("originais_path"), caminho_planilha if familias_planilha else None)
+    diagnostico = Diagnostico(memoria=True) if diagnostico_ativo else None
+    with diagnostico or nullcontext():
+        # Avaliação mantida entre as execuções: só as famílias alteradas (arquivo ou F_r) são recalculadas e renderizadas de novo
+        avaliacao = st.session_state.setdefault("avaliacao", AvaliacaoIncremental(fr_descricao))
+        familias_atuais = []
+        tabelas_originais = {}
+        imagens_por_familia = {}
+        originais_por_familia = {}
+        nomes_arquivos = []
+        elementos_por_familia = {}
+
+        for i, (uploaded_zip, fr) in enumerate(zip(uploaded_zips, fr_selecionados)):
+            if uploaded_zip:
+                try:
+                    with etapa(f"Família {i+1}", uploaded_zip.size):
+                        caminho_zip, chave_zip = espaco_sessao().guarda(uploaded_zip, ".zip")
+                        chave = (chave_zip, uploaded_zip.name, dimensao_max, qualidade, manter_originais)
+                        familia = cache_familias().obter_ou_calcular(
+                            chave, lambda: processa_familia(caminho_zip, uploaded_zip.name, dimensao_max, qualidade, manter_originais)
+                        )
+                except ValueError as erro:
+                    st.error(f"Família {i+1}: {erro}")
                     continue
 
-                fotos_base64 = []
-                for file in zip_ref.namelist():
-                    if file.startswith("fotos/") and file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                        img_data = zip_ref.read(file)
-                        img_b64 = image_to_base64(img_data)
-                        fotos_base64.append((file.split("/")[-1], img_b64))
-
-                with zip_ref.open(planilha_nome) as f:
-                    df_raw = pd.read_excel(f, header=[0, 1])
-                    nome_zip = os.path.splitext(uploaded_zip.name)[0]
-                    nome_planilha = os.path.splitext(os.path.basename(planilha_nome))[0]
-                    nome_arquivo = f"{nome_zip}_{nome_planilha}"
-                    df_ajustado, nome_elementos = adequa_dataset(df_raw)
-
-                    resultado_familia = avalia_familia(df_ajustado, nome_arquivo, f_r=fr)
-                    resultados_familias.update(resultado_familia)
-                    tabelas_originais[nome_arquivo] = df_raw
-                    imagens_por_familia[nome_arquivo] = fotos_base64
-                    elementos_por_familia[nome_arquivo] = nome_elementos
-
-                    nomes_arquivos.append(uploaded_zip.name)
-
-                    st.success(f"Família {i+1} ({nome_arquivo}) processada com sucesso.")
-                    st.write(f"{len(fotos_base64)} imagem(ns) carregadas.")
-
-    if resultados_familias:
-        g_d, nivel, recomendacao = avaliar_estrutura(resultados_familias)
-        html_output, df_resumo_familias, df_grau_estrutura = gerar_relatorio_html(
-            resultados_familias, g_d, nivel, recomendacao, tabelas_originais,
-            imagens_por_familia, nomes_arquivos, fr_selecionados,
-            fr_descricao, elementos_por_familia
-        )
-
-        # Salvar estado da sessão
-        st.session_state["html_output"] = html_output
-        st.session_state["df_resumo_familias"] = df_resumo_familias
-        st.session_state["df_grau_estrutura"] = df_grau_estrutura
-
-if "html_output" in st.session_state:
+                nome_arquivo = familia["nome_arquivo"]
+                avaliacao.atualiza(nome_arquivo, familia["resultado"][nome_arquivo], familia["tabela_original"], familia["fotos"], uploaded_zip.name)
+                avaliacao.aplica_fr(nome_arquivo, fr)
+                familias_atuais.append(nome_arquivo)
+                tabelas_originais[nome_arquivo] = familia["tabela_original"]
+                imagens_por_familia[nome_arquivo] = familia["fotos"]
+                if familia["originais"]:
+                    originais_por_familia[nome_arquivo] = familia["originais"]
+                elementos_por_familia[nome_arquivo] = familia["nome_elementos"]
+
+                nomes_arquivos.append(uploaded_zip.name)
+
+                st.success(f"Família {i+1} ({nome_arquivo}) processada com sucesso.")
+                st.write(f"{len(familia['fotos'])} imagem(ns) carregadas.")
+                mostra_problemas(f"Família {i+1}", familia["problemas"])
+
+        for i, (familia_planilha, fr) in enumerate(zip(familias_planilha, fr_selecionados)):
+            nome_arquivo = familia_planilha["nome_arquivo"]
+            chave = (chave_planilha, nome_arquivo, dimensao_max, qualidade, manter_originais)
+            with etapa(f"Família {i+1}"):
+                familia = cache_familias().obter_ou_calcular(
+                    chave, lambda: prepara_fotos_familia(familia_planilha, dimensao_max, qualidade, manter_originais)
+                )
+
+            avaliacao.atualiza(nome_arquivo, familia["resultado"][nome_arquivo], familia["tabela_original"], familia["fotos"])
+            avaliacao.aplica_fr(nome_arquivo, fr)
+            familias_atuais.append(nome_arquivo)
+            tabelas_originais[nome_arquivo] = familia["tabela_original"]
+            imagens_por_familia[nome_arquivo] = familia["fotos"]
+            if familia["originais"]:
+                originais_por_familia[nome_arquivo] = familia["originais"]
+            elementos_por_familia[nome_arquivo] = familia["nome_elementos"]
+            nomes_arquivos.append(nome_arquivo)
+
+        estatisticas_cache = cache_planilhas().estatisticas()
+        st.caption(f"Cache de planilhas: {estatisticas_cache['acertos']} acerto(s), {estatisticas_cache['falhas']} falha(s), "
+                   f"{estatisticas_cache['entradas']} planilha(s) em disco ({estatisticas_cache['bytes'] / 1024:.0f} KiB).")
+
+        avaliacao.mantem(familias_atuais)
+        resultados_familias = avaliacao.familias
+        if resultados_familias:
+            with etapa("avaliar_estrutura"):
+                g_d, nivel, recomendacao = avaliacao.avalia()
+            if salvar_historico and ponte:
+                with HistoricoInspecoes(CAMINHO_HISTORICO) as historico:
+                    historico.registra(ponte, data_inspecao, resultados_familias)
+                st.success(f"Inspeção de {ponte} ({data_inspecao:%d/%m/%Y}) salva no histórico.")
+            diferencas = None
+            if zips_anteriores:
+                try:
+                    with etapa("compara_inspecoes"):
+                        fr_atuais = {nome: dados["f_r"] for nome, dados in resultados_familias.items()}
+                        anterior = tabelas_inspecao(le_inspecao_anterior(zips_anteriores, fr_atuais))
+                        atual = tabelas_inspecao({nome: (tabelas_originais[nome], fr_atuais[nome]) for nome in resultados_familias})
+                        diferencas = compara_inspecoes(anterior, atual)
+                except ValueError as erro:
+                    st.error(f"Inspeção anterior: {erro}")
+            # Os relatórios anteriores da sessão são apagados antes de gerar os novos
+            espaco = espaco_sessao()
+            for chave in ("html_path", "originais_path"):
+                espaco.remove(st.session_state.pop(chave, None))
+            originais_path = None
+            registro_fotos = RegistroFotos()
+            if relatorio_em_arquivo:
+                # As fotos originais vão no mesmo .zip do relatório, onde os links já funcionam
+                html_path = espaco.novo_caminho(".zip")
+                with open(html_path, "wb") as relatorio:
+                    df_resumo_familias, df_grau_estrutura = escreve_relatorio_arquivo(
+                        relatorio, resultados_familias, g_d, nivel, recomendacao, tabelas_originais,
+                        imagens_por_familia, nomes_arquivos, fr_selecionados,
+                        fr_descricao, elementos_por_familia, diagnostico, originais_por_familia, registro_fotos, diferencas
+                    )
+            else:
+                html_path = espaco.novo_caminho(".html")
+                with open(html_path, "wb") as relatorio:
+                    df_resumo_familias, df_grau_estrutura = avaliacao.escreve_relatorio_html(relatorio, diagnostico, registro_fotos, diferencas)
+
+            estatisticas_fotos = registro_fotos.estatisticas()
+            if estatisticas_fotos['bytes_economizados']:
+                st.caption(f"Fotos: {estatisticas_fotos['unicas']} distinta(s) de {estatisticas_fotos['fotos']}; "
+                           f"{estatisticas_fotos['bytes_economizados'] / 1024:.0f} KiB de cópias repetidas não incluídas no relatório.")
+
+            if originais_por_familia and not relatorio_em_arquivo:
+                originais_path = espaco.novo_caminho(".zip")
+                with open(originais_path, "wb") as arquivo_originais:
+                    escreve_fotos_originais(arquivo_originais, originais_por_familia)
+
+            # Salvar estado da sessão (apenas os caminhos dos arquivos)
+            try:
+                for caminho in (html_path, originais_path):
+                    if caminho is not None:
+                        espaco.registra(caminho)
+            except ValueError as erro:
+                espaco.remove(html_path)
+                espaco.remove(originais_path)
+                st.error(f"Não foi possível guardar o relatório: {erro}")
+                st.stop()
+            st.caption(f"Arquivos da sessão: {espaco.bytes_usados / 1024 ** 2:.1f} MB de {espaco.limite_bytes / 1024 ** 2:.0f} MB.")
+            st.session_state["html_path"] = html_path
+            st.session_state["originais_path"] = originais_path
+            st.session_state["relatorio_em_arquivo"] = relatorio_em_arquivo
+            st.session_state["df_resumo_familias"] = df_resumo_familias
+            st.session_state["df_grau_estrutura"] = df_grau_estrutura
+            st.session_state["diagnostico"] = diagnostico.tabela() if diagnostico else None
+            st.session_state["diferencas"] = diferencas
+
+if "html_path" in st.session_state and os.path.exists(st.session_state["html_path"]):
     st.subheader("Resumo dos Resultados por Família")
     st.table(st.session_state["df_resumo_familias"])
 
     st.subheader("Grau de Deterioração da Estrutura")
     st.table(st.session_state["df_grau_estrutura"])
 
-    st.download_button(
-        "⬇️ Baixar relatório HTML",
-        st.session_state["html_output"].encode("utf-8"),
-        file_name="relatorio_gde.html",
-        mime="text/html"
-    )
+    if st.session_state.get("diferencas") is not None:
+        diferencas = st.session_state["diferencas"]
+        st.subheader("Comparação com a inspeção anterior")
+        st.table(diferencas["estrutura"])
+        st.dataframe(diferencas["elementos"], hide_index=True)
+
+    if st.session_state.get("diagnostico") is not None:
+        with st.expander("Diagnóstico de desempenho"):
+            st.dataframe(st.session_state["diagnostico"], hide_index=True)
+
+    with open(st.session_state["html_path"], "rb") as relatorio:
+        if st.session_state.get("relatorio_em_arquivo"):
+            st.caption("Extraia o .zip e abra o arquivo index.html.")
+            st.download_button(
+                "⬇️ Baixar relatório (.zip)",
+                relatorio,
+                file_name="relatorio_gde.zip",
+                mime="application/zip"
+            )
+        else:
+            st.download_button(
+                "⬇️ Baixar relatório HTML",
+                relatorio,
+                file_name="relatorio_gde.html",
+                mime="text/html"
+            )
+
+    if st.session_state.get("originais_path") and os.path.exists(st.session_state["originais_path"]):
+        st.caption("Extraia o .zip das fotos originais na mesma pasta do relatório para que os links funcionem.")
+        with open(st.session_state["originais_path"], "rb") as originais:
+            st.download_button(
+                "⬇️ Baixar fotos originais (.zip)",
+                originais,
+                file_name="originais.zip",
+                mime="application/zip"
+            )
+
+if ponte and os.path.exists(CAMINHO_HISTORICO):
+    serie, crescimentos = historico_ponte(ponte, versao_historico())
+    if not serie.empty:
+        st.subheader(f"Histórico de $G_d$ – {ponte}")
+        st.line_chart(serie.set_index("data")["g_d"])
+    if not crescimentos.empty:
+        st.subheader("Elementos com maior aumento de $G_{de}$ desde a inspeção anterior")
+        st.dataframe(crescimentos, hide_index=True)
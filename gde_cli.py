@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from gde_historico import HistoricoInspecoes
+from gde_inventario import InventarioMapeado, matrizes_ponte
+from gde_servico import servidor_http
+from gde_unb import (
+    COLUNAS_PARTICAO,
+    FORMATOS_EXPORTACAO,
+    FORMATO_EXPORTACAO_PADRAO,
+    FR_DESCRICAO,
+    ExportadorResultados,
+    RankingPrioridades,
+    avalia_ponte,
+    compara_lote,
+    simula_incerteza,
+    tabelas_ponte,
+)
+
+
+def avalia_frota(diretorio: str | Path, saida: str | Path, n_workers: Optional[int] = None, fr_padrao: Optional[int] = None, historico: Optional[str | Path] = None, data: Optional[str | date] = None, exportar: Optional[str | Path] = None, formato: str = FORMATO_EXPORTACAO_PADRAO, particionar: Iterable[str] = ()) -> Tuple[int, float]:
+    """
+    Avalia em paralelo todas as pontes de um diretório (uma subpasta por ponte com os .zip das famílias) e grava uma linha de resumo por ponte em um arquivo CSV.
+
+    :param diretorio: Diretório com uma subpasta por ponte.
+    :param saida: Caminho do arquivo CSV de resumo.
+    :param n_workers: Número de processos. Se None, usa o número de CPUs.
+    :param fr_padrao: F_r usado para famílias cujo nome não permite inferir o F_r.
+    :param historico: Caminho opcional de um banco HistoricoInspecoes, em que as pontes avaliadas sem erro são registradas em uma única transação.
+    :param data: Data das inspeções registradas no histórico e na exportação. Se None, usa a data de hoje.
+    :param exportar: Diretório opcional em que os resultados das pontes avaliadas sem erro são exportados em tabelas de elementos, famílias e estruturas (ver ExportadorResultados).
+    :param formato: Formato da exportação (ver FORMATOS_EXPORTACAO e FORMATO_EXPORTACAO_PADRAO).
+    :param particionar: Colunas de partição da exportação (ver ExportadorResultados.escreve).
+
+    :return: Uma tupla com dois elementos: (a) n_pontes: Número de pontes avaliadas, (b) tempo: Tempo total em segundos.
+    """
+    pastas = sorted(p for p in Path(diretorio).iterdir() if p.is_dir())
+    campos = ['ponte', 'familias', 'g_d', 'nivel', 'recomendacao', 'problemas', 'erro']
+    n_workers = n_workers or os.cpu_count() or 1
+    chunksize = max(1, len(pastas) // (n_workers * 4))
+
+    data = data or date.today()
+    inspecoes = []
+
+    inicio = time.perf_counter()
+    with open(saida, "w", newline="", encoding="utf-8") as arquivo_csv:
+        writer = csv.DictWriter(arquivo_csv, fieldnames=campos)
+        writer.writeheader()
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            com_resultados = historico is not None or exportar is not None
+            for linha in executor.map(avalia_ponte, pastas, [fr_padrao] * len(pastas), [com_resultados] * len(pastas), chunksize=chunksize):
+                resultados = linha.pop('resultados', None)
+                if resultados and not linha['erro']:
+                    inspecoes.append((linha['ponte'], data, resultados))
+                writer.writerow(linha)
+    if historico is not None:
+        with HistoricoInspecoes(historico) as banco:
+            banco.registra_lote(inspecoes)
+    if exportar is not None:
+        ExportadorResultados().adiciona_lote(inspecoes).escreve(exportar, formato=formato, particionar=particionar)
+    tempo = time.perf_counter() - inicio
+
+    return len(pastas), tempo
+
+
+
+def _tabelas_ponte_ou_erro(pasta_ponte: Path, fr_padrao: Optional[int]) -> Tuple[Optional[Dict[str, pd.DataFrame]], Optional[str]]:
+    try:
+        return tabelas_ponte(pasta_ponte, fr_padrao), None
+    except Exception as erro:
+        return None, f"{pasta_ponte}: {erro}"
+
+
+def compara_frota(anterior: str | Path, atual: str | Path, n_workers: Optional[int] = None, fr_padrao: Optional[int] = None, somente_alteracoes: bool = True) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+    """
+    Compara duas inspeções de uma ponte ou, em lote, dois diretórios com uma subpasta por ponte (as pontes são pareadas pelo nome da subpasta). As inspeções são lidas em paralelo (pool de processos) e todos os pares são comparados de uma só vez (ver compara_lote).
+
+    :param anterior: Pasta da inspeção anterior (da ponte ou do diretório de pontes).
+    :param atual: Pasta da inspeção atual.
+    :param n_workers: Número de processos. Se None, usa o número de CPUs.
+    :param fr_padrao: F_r usado para famílias cujo nome não permite inferir o F_r.
+    :param somente_alteracoes: Se True, as tabelas de danos e de elementos trazem apenas as linhas alteradas, novas ou removidas.
+
+    :return: Uma tupla com dois elementos: (a) diferencas: Tabelas de compara_lote (a coluna 'ponte' tem o nome da subpasta ou, para uma ponte, o nome da pasta atual), (b) erros: Mensagens das pontes que não puderam ser lidas ou que só existem em um dos diretórios.
+    """
+    anterior, atual = Path(anterior), Path(atual)
+    if any(anterior.glob("*.zip")) or any(anterior.glob("*.xlsx")):
+        pares = [(atual.name, anterior, atual)]
+        erros = []
+    else:
+        pontes_anteriores = {p.name for p in anterior.iterdir() if p.is_dir()}
+        pontes_atuais = {p.name for p in atual.iterdir() if p.is_dir()}
+        pares = [(nome, anterior / nome, atual / nome) for nome in sorted(pontes_anteriores & pontes_atuais)]
+        erros = [f"{nome}: sem inspeção anterior" for nome in sorted(pontes_atuais - pontes_anteriores)]
+        erros += [f"{nome}: sem inspeção atual" for nome in sorted(pontes_anteriores - pontes_atuais)]
+
+    pastas = [pasta for _, *pastas_par in pares for pasta in pastas_par]
+    n_workers = n_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        lidas = list(executor.map(_tabelas_ponte_ou_erro, pastas, [fr_padrao] * len(pastas), chunksize=max(1, len(pastas) // (n_workers * 4))))
+
+    validos = []
+    for (nome, _, _), (tabelas_anteriores, erro_anterior), (tabelas_atuais, erro_atual) in zip(pares, lidas[0::2], lidas[1::2]):
+        if erro_anterior or erro_atual:
+            erros.extend(erro for erro in (erro_anterior, erro_atual) if erro)
+            continue
+        validos.append((nome, tabelas_anteriores, tabelas_atuais))
+    return compara_lote(validos, somente_alteracoes=somente_alteracoes), erros
+
+
+def prioriza_frota(diretorio: str | Path, k: int = 10, n_workers: Optional[int] = None, fr_padrao: Optional[int] = None) -> RankingPrioridades:
+    """
+    Avalia em paralelo todas as pontes de um diretório (ver avalia_frota) e monta o ranking das piores pontes, famílias e elementos. Os resultados de cada ponte são descartados assim que entram no ranking.
+
+    :param diretorio: Diretório com uma subpasta por ponte.
+    :param k: Número de itens mantidos por nível em cada ranking.
+    :param n_workers: Número de processos. Se None, usa o número de CPUs.
+    :param fr_padrao: F_r usado para famílias cujo nome não permite inferir o F_r.
+
+    :return: RankingPrioridades com as pontes avaliadas.
+    """
+    pastas = sorted(p for p in Path(diretorio).iterdir() if p.is_dir())
+    n_workers = n_workers or os.cpu_count() or 1
+    chunksize = max(1, len(pastas) // (n_workers * 4))
+
+    ranking = RankingPrioridades(k)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        linhas = executor.map(avalia_ponte, pastas, [fr_padrao] * len(pastas), [True] * len(pastas), chunksize=chunksize)
+        ranking.adiciona_lote((linha['ponte'], linha['resultados']) for linha in linhas if linha['resultados'])
+
+    return ranking
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada da linha de comando (python -m gde_cli).
+
+    :param argv: Argumentos da linha de comando. Se None, usa sys.argv.
+
+    :return: Código de saída do processo.
+    """
+    parser = argparse.ArgumentParser(prog="python -m gde_cli", description="Automatização da inspeção GDE/UnB.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    batch = subparsers.add_parser("batch", help="Avalia em lote um diretório com uma subpasta de arquivos .zip por ponte.")
+    batch.add_argument("diretorio", help="Diretório com uma subpasta por ponte.")
+    batch.add_argument("-o", "--saida", default="resumo_gde.csv", help="Arquivo CSV de resumo (padrão: resumo_gde.csv).")
+    batch.add_argument("-w", "--workers", type=int, default=None, help="Número de processos (padrão: número de CPUs).")
+    batch.add_argument("--fr-padrao", type=int, choices=sorted(FR_DESCRICAO), default=None, help="F_r para famílias não identificadas pelo nome do arquivo.")
+    batch.add_argument("--historico", default=None, help="Banco SQLite do histórico de inspeções em que os resultados são registrados.")
+    batch.add_argument("--data", type=date.fromisoformat, default=None, help="Data das inspeções no histórico e na exportação, no formato AAAA-MM-DD (padrão: hoje).")
+    batch.add_argument("--exportar", default=None, help="Diretório em que os resultados de elementos, famílias e estruturas são exportados.")
+    batch.add_argument("--formato", choices=sorted(FORMATOS_EXPORTACAO), default=FORMATO_EXPORTACAO_PADRAO, help=f"Formato da exportação (padrão: {FORMATO_EXPORTACAO_PADRAO}; parquet e feather requerem o pyarrow).")
+    batch.add_argument("--particionar", action="store_true", help="Particiona a exportação por ponte e data (pastas ponte=.../data=...).")
+
+    incerteza = subparsers.add_parser("incerteza", help="Simula a incerteza do G_d de uma ponte sob variações de ±1 grau em Fi e Fp.")
+    incerteza.add_argument("pasta_ponte", help="Pasta da ponte com um arquivo .zip por família.")
+    incerteza.add_argument("-n", "--amostras", type=int, default=10000, help="Número de amostras (padrão: 10000).")
+    incerteza.add_argument("--semente", type=int, default=None, help="Semente do gerador de números aleatórios.")
+    incerteza.add_argument("--fr-padrao", type=int, choices=sorted(FR_DESCRICAO), default=None, help="F_r para famílias não identificadas pelo nome do arquivo.")
+
+    ranking = subparsers.add_parser("ranking", help="Lista as piores pontes, famílias e elementos de um diretório, por nível de deterioração.")
+    ranking.add_argument("diretorio", help="Diretório com uma subpasta por ponte.")
+    ranking.add_argument("-k", type=int, default=10, help="Número de itens por nível (padrão: 10).")
+    ranking.add_argument("-t", "--tipo", choices=sorted(RankingPrioridades.TIPOS), default="pontes", help="Ranking exibido (padrão: pontes).")
+    ranking.add_argument("-o", "--saida", default=None, help="Arquivo CSV em que o ranking é gravado.")
+    ranking.add_argument("-w", "--workers", type=int, default=None, help="Número de processos (padrão: número de CPUs).")
+    ranking.add_argument("--fr-padrao", type=int, choices=sorted(FR_DESCRICAO), default=None, help="F_r para famílias não identificadas pelo nome do arquivo.")
+
+    comparar = subparsers.add_parser("comparar", help="Compara duas inspeções de uma ponte (ou dois diretórios com uma subpasta por ponte) e lista o que mudou.")
+    comparar.add_argument("anterior", help="Pasta da inspeção anterior (da ponte ou do diretório de pontes).")
+    comparar.add_argument("atual", help="Pasta da inspeção atual.")
+    comparar.add_argument("-o", "--saida", default="diferencas", help="Diretório em que as tabelas danos.csv, elementos.csv, familias.csv e estrutura.csv são gravadas (padrão: diferencas).")
+    comparar.add_argument("--todas", action="store_true", help="Inclui os danos e elementos sem alteração.")
+    comparar.add_argument("-w", "--workers", type=int, default=None, help="Número de processos (padrão: número de CPUs).")
+    comparar.add_argument("--fr-padrao", type=int, choices=sorted(FR_DESCRICAO), default=None, help="F_r para famílias não identificadas pelo nome do arquivo.")
+
+    inventario = subparsers.add_parser("inventario", help="Grava o inventário mapeado em disco de um diretório com uma subpasta por ponte (ver pontua).")
+    inventario.add_argument("diretorio", help="Diretório com uma subpasta por ponte.")
+    inventario.add_argument("-o", "--saida", default="inventario_gde", help="Diretório do inventário (padrão: inventario_gde).")
+    inventario.add_argument("-w", "--workers", type=int, default=None, help="Número de processos (padrão: número de CPUs).")
+    inventario.add_argument("--fr-padrao", type=int, choices=sorted(FR_DESCRICAO), default=None, help="F_r para famílias não identificadas pelo nome do arquivo.")
+
+    pontua = subparsers.add_parser("pontua", help="Avalia em blocos, com memória limitada, todas as pontes de um inventário mapeado em disco.")
+    pontua.add_argument("inventario", help="Diretório do inventário (ver inventario).")
+    pontua.add_argument("-o", "--saida", default="resumo_inventario.csv", help="Arquivo CSV com o G_d de cada ponte (padrão: resumo_inventario.csv).")
+    pontua.add_argument("--bloco", type=int, default=1 << 20, help="Número máximo de células por bloco (padrão: 1048576).")
+
+    servidor = subparsers.add_parser("servidor", help="Executa o serviço HTTP de avaliação (JSON ou .zip) com um pool de processos.")
+    servidor.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: 127.0.0.1).")
+    servidor.add_argument("--porta", type=int, default=8000, help="Porta de escuta (padrão: 8000).")
+    servidor.add_argument("-w", "--workers", type=int, default=None, help="Número de processos (padrão: número de CPUs).")
+    servidor.add_argument("--max-pendentes", type=int, default=256, help="Requisições em andamento ou na fila antes de responder 503 (padrão: 256).")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "batch":
+        n_pontes, tempo = avalia_frota(args.diretorio, args.saida, n_workers=args.workers, fr_padrao=args.fr_padrao, historico=args.historico, data=args.data,
+                                       exportar=args.exportar, formato=args.formato, particionar=COLUNAS_PARTICAO if args.particionar else ())
+        taxa = n_pontes / tempo if tempo else 0.0
+        print(f"{n_pontes} ponte(s) avaliada(s) em {tempo:.2f} s ({taxa:.1f} pontes/s). Resumo salvo em {args.saida}.")
+    elif args.comando == "ranking":
+        tabela = prioriza_frota(args.diretorio, k=args.k, n_workers=args.workers, fr_padrao=args.fr_padrao).tabela(args.tipo)
+        if args.saida:
+            tabela.to_csv(args.saida, index=False)
+        print(tabela.to_string(index=False, float_format="{:.3f}".format))
+    elif args.comando == "incerteza":
+        simulacao = simula_incerteza(matrizes_ponte(args.pasta_ponte, args.fr_padrao), n_amostras=args.amostras, semente=args.semente)
+        percentis = simulacao['percentis']
+        print(f"G_d nominal: {simulacao['g_d_nominal']:.2f} ({simulacao['nivel_nominal']})")
+        print(f"G_d simulado: {simulacao['media']:.2f} ± {simulacao['desvio']:.2f} (P5 = {percentis[5]:.2f}, P95 = {percentis[95]:.2f})")
+        for nivel, probabilidade in simulacao['probabilidades'].items():
+            print(f"  P({nivel}) = {probabilidade:.1%}")
+        print("Elementos mais influentes:")
+        print(simulacao['sensibilidade'].head(10).to_string(index=False, float_format="{:.3f}".format))
+    elif args.comando == "comparar":
+        diferencas, erros = compara_frota(args.anterior, args.atual, n_workers=args.workers, fr_padrao=args.fr_padrao, somente_alteracoes=not args.todas)
+        Path(args.saida).mkdir(parents=True, exist_ok=True)
+        for tabela, diferenca in diferencas.items():
+            diferenca.to_csv(Path(args.saida, f"{tabela}.csv"), index=False)
+        for erro in erros:
+            print(f"Aviso: {erro}")
+        print(diferencas['estrutura'].to_string(index=False, float_format="{:.2f}".format))
+        print(f"{len(diferencas['elementos'])} elemento(s) e {len(diferencas['danos'])} dano(s) alterado(s). Tabelas salvas em {args.saida}.")
+    elif args.comando == "inventario":
+        inicio = time.perf_counter()
+        inventario_mapeado, erros = InventarioMapeado.de_frota(args.diretorio, args.saida, n_workers=args.workers, fr_padrao=args.fr_padrao)
+        for erro in erros:
+            print(f"Aviso: {erro}")
+        print(f"{inventario_mapeado.n_pontes} ponte(s), {inventario_mapeado.n_elementos} elemento(s) e {inventario_mapeado.n_celulas} célula(s) com dano gravados em {args.saida} ({time.perf_counter() - inicio:.2f} s).")
+    elif args.comando == "pontua":
+        inicio = time.perf_counter()
+        tabela = InventarioMapeado(args.inventario).pontua(tamanho_bloco=args.bloco)
+        tempo = time.perf_counter() - inicio
+        tabela.to_csv(args.saida, index=False)
+        print(tabela['nivel'].value_counts(sort=False).to_string())
+        print(f"{len(tabela)} ponte(s) avaliada(s) em {tempo:.2f} s. Resumo salvo em {args.saida}.")
+    elif args.comando == "servidor":
+        servidor_http(args.host, args.porta, n_workers=args.workers, max_pendentes=args.max_pendentes)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
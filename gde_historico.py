@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from gde_unb import ResultadoFamilia, avaliar_estrutura
+
+
+class HistoricoInspecoes:
+    """
+    Histórico local de inspeções em um banco SQLite: G_d de cada inspeção (ponte e data), G_df de cada família e sum_d, d_max e G_de de cada elemento. Os índices por ponte e data permitem consultar tendências em carteiras com dezenas de milhares de inspeções. Registrar de novo a mesma ponte e data substitui a inspeção anterior.
+
+    :param caminho: Caminho do arquivo do banco (criado se não existir) ou ":memory:".
+    """
+
+    ESQUEMA = """
+        PRAGMA journal_mode = WAL;
+        CREATE TABLE IF NOT EXISTS inspecoes (
+            id INTEGER PRIMARY KEY,
+            ponte TEXT NOT NULL,
+            data TEXT NOT NULL,
+            g_d REAL NOT NULL,
+            nivel TEXT NOT NULL,
+            UNIQUE (ponte, data)
+        );
+        CREATE INDEX IF NOT EXISTS idx_inspecoes_data ON inspecoes (data);
+        CREATE TABLE IF NOT EXISTS familias (
+            inspecao_id INTEGER NOT NULL REFERENCES inspecoes (id) ON DELETE CASCADE,
+            familia TEXT NOT NULL,
+            f_r REAL NOT NULL,
+            g_df REAL NOT NULL,
+            PRIMARY KEY (inspecao_id, familia)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS elementos (
+            inspecao_id INTEGER NOT NULL REFERENCES inspecoes (id) ON DELETE CASCADE,
+            familia TEXT NOT NULL,
+            elemento TEXT NOT NULL,
+            sum_d REAL NOT NULL,
+            d_max REAL NOT NULL,
+            g_de REAL NOT NULL,
+            PRIMARY KEY (inspecao_id, familia, elemento)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, caminho: str | Path):
+        self.conexao = sqlite3.connect(str(caminho))
+        self.conexao.execute("PRAGMA foreign_keys = ON")
+        self.conexao.executescript(self.ESQUEMA)
+
+    def __enter__(self) -> "HistoricoInspecoes":
+        return self
+
+    def __exit__(self, *erro) -> None:
+        self.fechar()
+
+    def fechar(self) -> None:
+        """
+        Fecha a conexão com o banco.
+        """
+        self.conexao.close()
+
+    def _insere(self, ponte: str, data: str | date, resultados_familias: Dict[str, Dict[str, float]]) -> int:
+        if not isinstance(data, date):
+            try:
+                data = date.fromisoformat(str(data))
+            except ValueError:
+                raise ValueError(f"Data inválida: {data!r} (use o formato AAAA-MM-DD)") from None
+        data = data.isoformat()
+        g_d, nivel, _ = avaliar_estrutura(resultados_familias)
+        self.conexao.execute("DELETE FROM inspecoes WHERE ponte = ? AND data = ?", (ponte, data))
+        inspecao_id = self.conexao.execute("INSERT INTO inspecoes (ponte, data, g_d, nivel) VALUES (?, ?, ?, ?)", (ponte, data, g_d, nivel)).lastrowid
+
+        self.conexao.executemany(
+            "INSERT OR REPLACE INTO familias VALUES (?, ?, ?, ?)",
+            ((inspecao_id, familia, float(dados['f_r']), float(dados['g_df'])) for familia, dados in resultados_familias.items())
+        )
+        for familia, dados in resultados_familias.items():
+            if isinstance(dados, ResultadoFamilia):
+                linhas = zip(dados.elementos, dados.sum_d.tolist(), dados.d_max.tolist(), dados.g_de.tolist())
+            else:
+                linhas = ((el, r['sum_d'], r['d_max'], r['g_de']) for el, r in dados['resultados_elemento'].items())
+            self.conexao.executemany(
+                "INSERT OR REPLACE INTO elementos VALUES (?, ?, ?, ?, ?, ?)",
+                ((inspecao_id, familia, str(el), float(sum_d), float(d_max), float(g_de)) for el, sum_d, d_max, g_de in linhas)
+            )
+        return inspecao_id
+
+    def registra(self, ponte: str, data: str | date, resultados_familias: Dict[str, Dict[str, float]]) -> int:
+        """
+        Registra uma inspeção.
+
+        :param ponte: Identificação da ponte.
+        :param data: Data da inspeção (date ou texto no formato AAAA-MM-DD). Uma data inválida gera ValueError.
+        :param resultados_familias: Resultados das famílias (avalia_familia ou avalia_familia_compacta).
+
+        :return: Identificador da inspeção no banco.
+        """
+        with self.conexao:
+            return self._insere(ponte, data, resultados_familias)
+
+    def registra_lote(self, inspecoes: Iterable[Tuple[str, str | date, Dict[str, Dict[str, float]]]]) -> int:
+        """
+        Registra várias inspeções em uma única transação (ex: saída do modo em lote).
+
+        :param inspecoes: Iterável de tuplas (ponte, data, resultados_familias).
+
+        :return: Número de inspeções registradas.
+        """
+        n_inspecoes = 0
+        with self.conexao:
+            for ponte, data, resultados_familias in inspecoes:
+                self._insere(ponte, data, resultados_familias)
+                n_inspecoes += 1
+        return n_inspecoes
+
+    def consulta(self, sql: str, parametros: tuple = ()) -> pd.DataFrame:
+        """
+        Executa uma consulta SQL no banco.
+
+        :param sql: Consulta SQL.
+        :param parametros: Parâmetros da consulta.
+
+        :return: DataFrame com o resultado.
+        """
+        return pd.read_sql_query(sql, self.conexao, params=parametros)
+
+    def ultimos_g_d(self) -> pd.DataFrame:
+        """
+        G_d da inspeção mais recente de cada ponte.
+
+        :return: DataFrame com as colunas 'ponte', 'data', 'g_d' e 'nivel'.
+        """
+        return self.consulta("""
+            SELECT ponte, data, g_d, nivel
+            FROM (SELECT ponte, data, g_d, nivel, ROW_NUMBER() OVER (PARTITION BY ponte ORDER BY data DESC) AS ordem FROM inspecoes)
+            WHERE ordem = 1
+            ORDER BY ponte
+        """)
+
+    def serie_g_d(self, ponte: str) -> pd.DataFrame:
+        """
+        Evolução do G_d de uma ponte ao longo das inspeções.
+
+        :param ponte: Identificação da ponte.
+
+        :return: DataFrame com as colunas 'data', 'g_d' e 'nivel', em ordem cronológica.
+        """
+        return self.consulta("SELECT data, g_d, nivel FROM inspecoes WHERE ponte = ? ORDER BY data", (ponte,))
+
+    def maiores_crescimentos(self, n: int = 20, ponte: Optional[str] = None) -> pd.DataFrame:
+        """
+        Elementos cujo G_de mais cresceu entre as duas inspeções mais recentes de cada ponte. Os elementos são pareados pelo nome da família e do elemento.
+
+        :param n: Número máximo de elementos.
+        :param ponte: Se informado, considera apenas essa ponte.
+
+        :return: DataFrame com as colunas 'ponte', 'familia', 'elemento', 'data_anterior', 'data', 'g_de_anterior', 'g_de' e 'variacao', em ordem decrescente de variação.
+        """
+        filtro = "WHERE ponte = ?" if ponte is not None else ""
+        return self.consulta(f"""
+            WITH recentes AS (
+                SELECT id, ponte, data, ROW_NUMBER() OVER (PARTITION BY ponte ORDER BY data DESC) AS ordem
+                FROM inspecoes {filtro}
+            )
+            SELECT atual.ponte, e.familia, e.elemento, anterior.data AS data_anterior, atual.data,
+                   ea.g_de AS g_de_anterior, e.g_de, e.g_de - ea.g_de AS variacao
+            FROM recentes AS atual
+            JOIN recentes AS anterior ON anterior.ponte = atual.ponte AND anterior.ordem = 2
+            JOIN elementos AS e ON e.inspecao_id = atual.id
+            JOIN elementos AS ea ON ea.inspecao_id = anterior.id AND ea.familia = e.familia AND ea.elemento = e.elemento
+            WHERE atual.ordem = 1
+            ORDER BY variacao DESC
+            LIMIT ?
+        """, ((ponte,) if ponte is not None else ()) + (n,))
@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from gde_unb import (
+    FI_MAX,
+    FP_MAX,
+    LIMITES_G_D,
+    NIVEIS_G_D,
+    ResultadoFamilia,
+    calcula_dano,
+    codifica_fi_fp,
+    etapa,
+    extrai_matrizes_fi_fp,
+    infere_fr,
+    processa_zip_familia,
+    tabela_dano,
+)
+
+
+def matrizes_ponte(pasta_ponte: str | Path, fr_padrao: Optional[int] = None) -> Dict[str, Tuple[List[str], np.ndarray, np.ndarray, float]]:
+    """
+    Lê as matrizes Fi e Fp de todas as famílias de uma ponte (pasta com um arquivo .zip por família), no formato de entrada de InventarioMapeado.grava e de gde_unb.simula_incerteza.
+
+    :param pasta_ponte: Pasta da ponte contendo os arquivos .zip das famílias.
+    :param fr_padrao: F_r usado quando não for possível inferir o F_r pelo nome do arquivo (ver infere_fr).
+
+    :return: Dicionário {nome_da_família: (elementos, fi, fp, f_r)}.
+    """
+    familias = {}
+    for arquivo in sorted(Path(pasta_ponte).glob("*.zip")):
+        fr = infere_fr(arquivo.name) or fr_padrao
+        if fr is None:
+            raise ValueError(f"{arquivo.name}: F_r não identificado")
+        familia = processa_zip_familia(arquivo, arquivo.name, f_r=fr, ler_fotos=False)
+        familias[familia['nome_arquivo']] = (*extrai_matrizes_fi_fp(familia['tabela_original']), fr)
+
+    if not familias:
+        raise ValueError("Nenhum arquivo .zip encontrado")
+
+    return familias
+
+
+def _matrizes_ponte_ou_erro(pasta_ponte: Path, fr_padrao: Optional[int]) -> Tuple[Optional[Dict[str, Tuple[List[str], np.ndarray, np.ndarray, float]]], Optional[str]]:
+    try:
+        return matrizes_ponte(pasta_ponte, fr_padrao), None
+    except Exception as erro:
+        return None, f"{pasta_ponte}: {erro}"
+
+
+def _reduz_segmentos(ufunc: np.ufunc, valores: np.ndarray, limites: np.ndarray) -> np.ndarray:
+    """
+    Reduz os valores em segmentos contíguos delimitados por limites (n_segmentos + 1 deslocamentos), como ufunc.reduceat, mas com resultado 0 nos segmentos vazios.
+    """
+    resultado = np.zeros(len(limites) - 1, dtype=np.float64)
+    cheios = limites[1:] > limites[:-1]
+    if cheios.any():
+        resultado[cheios] = ufunc.reduceat(valores, limites[:-1][cheios])
+    return resultado
+
+
+# Versão do formato em disco de InventarioMapeado; altere quando o layout dos arquivos mudar.
+VERSAO_INVENTARIO = 1
+
+
+class InventarioMapeado:
+    """
+    Inventário de pontes gravado em disco como vetores binários contíguos, lidos por mapeamento de memória (np.memmap), para avaliar dezenas de milhares de pontes sem carregá-las inteiras na memória. Só as células com dano (Fi > 0 e Fp > 0) são gravadas, como códigos int8 da TABELA_DANO (ver codifica_fi_fp) ordenados por elemento, e a hierarquia ponte → família → elemento → célula é descrita por vetores de deslocamentos, como em uma matriz esparsa CSR. As notas fora do domínio discreto são guardadas à parte (índice da célula, Fi e Fp).
+
+    Arquivos do diretório (ver ARQUIVOS): codigos.bin, celulas_elemento.bin (n_elementos + 1 deslocamentos), elementos_familia.bin (n_familias + 1), familias_ponte.bin (n_pontes + 1), f_r.bin, fora_*.bin e os nomes de pontes, famílias e elementos (texto UTF-8 concatenado e deslocamentos). O cabeçalho inventario.json, com a versão e o comprimento de cada vetor, é gravado por último, de modo que um inventário incompleto não é aberto.
+
+    :param diretorio: Diretório de um inventário gravado por grava ou de_frota.
+    """
+
+    CABECALHO = "inventario.json"
+    ARQUIVOS = {
+        'codigos': "<i1",
+        'celulas_elemento': "<i8",
+        'elementos_familia': "<i8",
+        'familias_ponte': "<i8",
+        'f_r': "<f8",
+        'fora_indice': "<i8",
+        'fora_fi': "<f8",
+        'fora_fp': "<f8",
+        'nomes_pontes': "u1",
+        'nomes_pontes_indice': "<i8",
+        'nomes_familias': "u1",
+        'nomes_familias_indice': "<i8",
+        'nomes_elementos': "u1",
+        'nomes_elementos_indice': "<i8",
+    }
+    RESULTADOS = {
+        'sum_d': "<f8",
+        'd_max': "<f8",
+        'g_de': "<f8",
+        'g_df': "<f8",
+        'g_d': "<f8",
+    }
+
+    def __init__(self, diretorio: str | Path):
+
+        self.diretorio = Path(diretorio)
+        cabecalho = json.loads((self.diretorio / self.CABECALHO).read_text(encoding="utf-8"))
+        if cabecalho.get('versao') != VERSAO_INVENTARIO:
+            raise ValueError(f"{self.diretorio}: versão do inventário incompatível ({cabecalho.get('versao')})")
+        self.comprimentos = cabecalho['comprimentos']
+        self.n_pontes = self.comprimentos['familias_ponte'] - 1
+        self.n_familias = self.comprimentos['elementos_familia'] - 1
+        self.n_elementos = self.comprimentos['celulas_elemento'] - 1
+        self.n_celulas = self.comprimentos['codigos']
+
+    @staticmethod
+    def _mapeia(caminho: Path, dtype: str, comprimento: int, modo: str = "r") -> np.ndarray:
+        # np.memmap não mapeia arquivos vazios
+        if comprimento == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(caminho, dtype=dtype, mode=modo, shape=(comprimento,))
+
+    def vetor(self, nome: str) -> np.ndarray:
+        """
+        Mapeia um dos vetores do inventário (somente leitura).
+
+        :param nome: Nome do vetor (ver ARQUIVOS).
+
+        :return: np.memmap com o vetor.
+        """
+        return self._mapeia(self.diretorio / f"{nome}.bin", self.ARQUIVOS[nome], self.comprimentos[nome])
+
+    def nomes(self, tipo: str, inicio: int = 0, fim: Optional[int] = None) -> List[str]:
+        """
+        Lê os nomes de um intervalo de pontes, famílias ou elementos.
+
+        :param tipo: 'pontes', 'familias' ou 'elementos'.
+        :param inicio: Índice do primeiro nome.
+        :param fim: Índice final (exclusivo). Se None, vai até o último.
+
+        :return: Lista de nomes.
+        """
+        indice = self.vetor(f"nomes_{tipo}_indice")
+        fim = len(indice) - 1 if fim is None else fim
+        limites = np.asarray(indice[inicio:fim + 1]) - indice[inicio]
+        texto = bytes(self.vetor(f"nomes_{tipo}")[indice[inicio]:indice[fim]]) if fim > inicio else b""
+        return [texto[a:b].decode("utf-8") for a, b in zip(limites[:-1].tolist(), limites[1:].tolist())]
+
+    @classmethod
+    def grava(cls, diretorio: str | Path, inspecoes: Iterable[Tuple[str, Dict[str, Tuple[List[str], np.ndarray, np.ndarray, float]]]]) -> "InventarioMapeado":
+        """
+        Grava um inventário a partir de uma sequência de pontes, uma de cada vez: cada ponte é convertida e acrescentada ao fim dos arquivos, de modo que a memória usada não depende do tamanho do inventário.
+
+        :param diretorio: Diretório de destino (criado se necessário; um inventário anterior é substituído).
+        :param inspecoes: Iterável de pares (ponte, familias), com familias no formato de matrizes_ponte: {nome_da_família: (elementos, fi, fp, f_r)}.
+
+        :return: InventarioMapeado com o inventário gravado.
+        """
+
+        diretorio = Path(diretorio)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        (diretorio / cls.CABECALHO).unlink(missing_ok=True)
+        comprimentos = dict.fromkeys(cls.ARQUIVOS, 0)
+
+        with ExitStack() as pilha:
+            arquivos = {nome: pilha.enter_context(open(diretorio / f"{nome}.bin", "wb")) for nome in cls.ARQUIVOS}
+
+            def escreve(nome: str, valores) -> None:
+                valores = np.asarray(valores, dtype=cls.ARQUIVOS[nome])
+                arquivos[nome].write(valores.tobytes())
+                comprimentos[nome] += valores.size
+
+            def escreve_nomes(tipo: str, nomes: List[str]) -> None:
+                dados = [nome.encode("utf-8") for nome in nomes]
+                escreve(f"nomes_{tipo}_indice", comprimentos[f"nomes_{tipo}"] + np.cumsum([len(dado) for dado in dados], dtype=np.int64))
+                escreve(f"nomes_{tipo}", np.frombuffer(b"".join(dados), dtype=np.uint8))
+
+            for nome in ('celulas_elemento', 'elementos_familia', 'familias_ponte', 'nomes_pontes_indice', 'nomes_familias_indice', 'nomes_elementos_indice'):
+                escreve(nome, [0])
+
+            for ponte, familias in inspecoes:
+                for nome_familia, (elementos, fi, fp, f_r) in familias.items():
+                    fi_t = np.asarray(fi, dtype=np.float64).T
+                    fp_t = np.asarray(fp, dtype=np.float64).T
+                    with np.errstate(invalid="ignore"):
+                        com_dano = (fi_t > 0) & (fp_t > 0)
+                    fi_c, fp_c = fi_t[com_dano], fp_t[com_dano]
+                    codigos, _ = codifica_fi_fp(fi_c, fp_c)
+                    fora = np.flatnonzero(codigos < 0)
+
+                    escreve('fora_indice', comprimentos['codigos'] + fora)
+                    escreve('fora_fi', fi_c[fora])
+                    escreve('fora_fp', fp_c[fora])
+                    escreve('celulas_elemento', comprimentos['codigos'] + np.cumsum(com_dano.sum(axis=1), dtype=np.int64))
+                    escreve('codigos', codigos)
+                    escreve_nomes('elementos', [str(elemento) for elemento in elementos])
+                    escreve('elementos_familia', [comprimentos['celulas_elemento'] - 1])
+                    escreve('f_r', [f_r])
+                escreve_nomes('familias', list(familias))
+                escreve('familias_ponte', [comprimentos['f_r']])
+                escreve_nomes('pontes', [str(ponte)])
+
+        temporario = diretorio / f"{cls.CABECALHO}.tmp"
+        temporario.write_text(json.dumps({'versao': VERSAO_INVENTARIO, 'comprimentos': comprimentos}), encoding="utf-8")
+        os.replace(temporario, diretorio / cls.CABECALHO)
+        return cls(diretorio)
+
+    @classmethod
+    def de_frota(cls, diretorio: str | Path, destino: str | Path, n_workers: Optional[int] = None, fr_padrao: Optional[int] = None) -> Tuple["InventarioMapeado", List[str]]:
+        """
+        Lê em paralelo todas as pontes de um diretório (uma subpasta por ponte com os .zip das famílias, ver matrizes_ponte) e grava o inventário à medida que as pontes são lidas.
+
+        :param diretorio: Diretório com uma subpasta por ponte.
+        :param destino: Diretório do inventário.
+        :param n_workers: Número de processos. Se None, usa o número de CPUs.
+        :param fr_padrao: F_r usado para famílias cujo nome não permite inferir o F_r.
+
+        :return: Uma tupla com dois elementos: (a) inventario: InventarioMapeado gravado, (b) erros: Mensagens das pontes que não puderam ser lidas (e ficaram fora do inventário).
+        """
+        pastas = sorted(p for p in Path(diretorio).iterdir() if p.is_dir())
+        n_workers = n_workers or os.cpu_count() or 1
+        erros = []
+
+        def lidas(executor: ProcessPoolExecutor) -> Iterator[Tuple[str, Dict[str, Tuple[List[str], np.ndarray, np.ndarray, float]]]]:
+            for pasta, (familias, erro) in zip(pastas, executor.map(_matrizes_ponte_ou_erro, pastas, [fr_padrao] * len(pastas), chunksize=max(1, len(pastas) // (n_workers * 4)))):
+                if erro:
+                    erros.append(erro)
+                else:
+                    yield pasta.name, familias
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            inventario = cls.grava(destino, lidas(executor))
+        return inventario, erros
+
+    def blocos(self, tamanho_bloco: int = 1 << 20) -> Iterator[Tuple[int, int]]:
+        """
+        Divide as pontes em blocos contíguos de até tamanho_bloco células. Os blocos nunca separam uma ponte; uma ponte maior que o bloco forma um bloco sozinha.
+
+        :param tamanho_bloco: Número máximo de células por bloco.
+
+        :return: Iterador de pares (primeira_ponte, ponte_final) (final exclusivo).
+        """
+        celulas_ponte = np.asarray(self.vetor('celulas_elemento')[np.asarray(self.vetor('elementos_familia')[np.asarray(self.vetor('familias_ponte'))])])
+        inicio = 0
+        while inicio < self.n_pontes:
+            fim = int(np.searchsorted(celulas_ponte, celulas_ponte[inicio] + tamanho_bloco, side="right")) - 1
+            fim = min(max(fim, inicio + 1), self.n_pontes)
+            yield inicio, fim
+            inicio = fim
+
+    def pontua(self, tamanho_bloco: int = 1 << 20, dano: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None, saida: Optional[str | Path] = None) -> pd.DataFrame:
+        """
+        Avalia todo o inventário em blocos de pontes (ver blocos): para cada bloco, os danos das células são obtidos por consulta à tabela de danos e reduzidos por elemento (G_de), família (G_df) e ponte (G_d) com np.add.reduceat e np.maximum.reduceat, sem laço em Python por ponte. A memória usada é proporcional ao tamanho do bloco, e os resultados por elemento e família são gravados em vetores mapeados em disco (ver RESULTADOS e resultados_ponte).
+
+        :param tamanho_bloco: Número máximo de células por bloco.
+        :param dano: Função dano(fi, fp) alternativa (por exemplo, após uma mudança de metodologia). Ela é avaliada uma única vez na grade de notas para montar a tabela de danos, e nas notas fora do domínio discreto. Se None, usa calcula_dano.
+        :param saida: Diretório dos vetores de resultados. Se None, usa a subpasta resultados do inventário.
+
+        :return: DataFrame com uma linha por ponte e as colunas 'ponte', 'familias', 'elementos', 'g_d' e 'nivel'.
+        """
+        dano = dano or calcula_dano
+        if dano is calcula_dano:
+            tabela = tabela_dano()
+        else:
+            tabela = np.asarray(dano(*np.meshgrid(np.arange(FI_MAX + 1.0), np.arange(FP_MAX + 1.0), indexing="ij")), dtype=np.float64).ravel()
+
+        saida = Path(saida) if saida is not None else self.diretorio / "resultados"
+        saida.mkdir(parents=True, exist_ok=True)
+        n_resultado = {'sum_d': self.n_elementos, 'd_max': self.n_elementos, 'g_de': self.n_elementos, 'g_df': self.n_familias, 'g_d': self.n_pontes}
+        resultados = {nome: self._mapeia(saida / f"{nome}.bin", dtype, n_resultado[nome], modo="w+") for nome, dtype in self.RESULTADOS.items()}
+
+        codigos = self.vetor('codigos')
+        celulas_elemento = self.vetor('celulas_elemento')
+        elementos_familia = self.vetor('elementos_familia')
+        familias_ponte = self.vetor('familias_ponte')
+        f_r = self.vetor('f_r')
+        fora_indice = self.vetor('fora_indice')
+        fora_fi, fora_fp = self.vetor('fora_fi'), self.vetor('fora_fp')
+
+        with etapa("pontua_inventario"):
+            for p0, p1 in self.blocos(tamanho_bloco):
+                f0, f1 = int(familias_ponte[p0]), int(familias_ponte[p1])
+                e0, e1 = int(elementos_familia[f0]), int(elementos_familia[f1])
+                c0, c1 = int(celulas_elemento[e0]), int(celulas_elemento[e1])
+
+                codigos_bloco = np.asarray(codigos[c0:c1])
+                d = tabela.take(codigos_bloco)
+                k0, k1 = np.searchsorted(fora_indice, (c0, c1))
+                if k1 > k0:
+                    d[np.asarray(fora_indice[k0:k1]) - c0] = dano(np.asarray(fora_fi[k0:k1]), np.asarray(fora_fp[k0:k1]))
+
+                sum_d = _reduz_segmentos(np.add, d, np.asarray(celulas_elemento[e0:e1 + 1]) - c0)
+                d_max = _reduz_segmentos(np.maximum, d, np.asarray(celulas_elemento[e0:e1 + 1]) - c0)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    g_de = np.where(sum_d != 0, d_max * (1 + (sum_d - d_max) / sum_d), 0.0)
+
+                # Como em ResultadoFamilia, só os elementos com G_de > 0 entram no G_df
+                g_de_positivo = np.maximum(g_de, 0.0)
+                limites_familia = np.asarray(elementos_familia[f0:f1 + 1]) - e0
+                gde_sum = _reduz_segmentos(np.add, g_de_positivo, limites_familia)
+                gde_max = _reduz_segmentos(np.maximum, g_de_positivo, limites_familia)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    g_df = np.where(gde_sum > 0, gde_max * np.sqrt(1 + (gde_sum - gde_max) / gde_sum), 0.0)
+
+                f_r_bloco = np.asarray(f_r[f0:f1])
+                limites_ponte = np.asarray(familias_ponte[p0:p1 + 1]) - f0
+                numerador = _reduz_segmentos(np.add, f_r_bloco * g_df, limites_ponte)
+                denominador = _reduz_segmentos(np.add, f_r_bloco, limites_ponte)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    g_d = np.where(denominador != 0, numerador / denominador, 0.0)
+
+                resultados['sum_d'][e0:e1] = sum_d
+                resultados['d_max'][e0:e1] = d_max
+                resultados['g_de'][e0:e1] = g_de
+                resultados['g_df'][f0:f1] = g_df
+                resultados['g_d'][p0:p1] = g_d
+
+        for vetor in resultados.values():
+            if isinstance(vetor, np.memmap):
+                vetor.flush()
+
+        g_d = np.asarray(resultados['g_d'])
+        familias_ponte = np.asarray(familias_ponte)
+        return pd.DataFrame({
+            'ponte': self.nomes('pontes'),
+            'familias': np.diff(familias_ponte),
+            'elementos': np.diff(np.asarray(elementos_familia)[familias_ponte]),
+            'g_d': g_d,
+            'nivel': pd.Categorical.from_codes(np.searchsorted(LIMITES_G_D, g_d, side="left"), categories=NIVEIS_G_D, ordered=True),
+        })
+
+    def resultados_ponte(self, ponte: int | str, saida: Optional[str | Path] = None) -> Dict[str, ResultadoFamilia]:
+        """
+        Lê os resultados de uma ponte gravados por pontua, no formato de avalia_familia_compacta (aceito por avaliar_estrutura, pelo relatório e por ExportadorResultados).
+
+        :param ponte: Índice ou nome da ponte.
+        :param saida: Diretório dos vetores de resultados usado em pontua.
+
+        :return: Dicionário {nome_da_família: ResultadoFamilia}.
+        """
+        if isinstance(ponte, str):
+            ponte = self.nomes('pontes').index(ponte)
+        saida = Path(saida) if saida is not None else self.diretorio / "resultados"
+        n_resultado = {'sum_d': self.n_elementos, 'd_max': self.n_elementos, 'g_de': self.n_elementos}
+        vetores = {nome: self._mapeia(saida / f"{nome}.bin", self.RESULTADOS[nome], n) for nome, n in n_resultado.items()}
+
+        familias_ponte = self.vetor('familias_ponte')
+        elementos_familia = self.vetor('elementos_familia')
+        f0, f1 = int(familias_ponte[ponte]), int(familias_ponte[ponte + 1])
+        f_r = self.vetor('f_r')
+        nomes_elementos = self.nomes('elementos', int(elementos_familia[f0]), int(elementos_familia[f1]))
+
+        resultados = {}
+        for familia, nome in zip(range(f0, f1), self.nomes('familias', f0, f1)):
+            e0, e1 = int(elementos_familia[familia]), int(elementos_familia[familia + 1])
+            elementos = nomes_elementos[e0 - int(elementos_familia[f0]):e1 - int(elementos_familia[f0])]
+            resultados[nome] = ResultadoFamilia(elementos, *(np.array(vetores[chave][e0:e1]) for chave in n_resultado), float(f_r[familia]))
+        return resultados
@@ -0,0 +1,457 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from gde_unb import (
+    LIMITE_ARQUIVO_BYTES,
+    ResultadoFamilia,
+    avalia_elementos_lote,
+    avalia_ponte,
+    avaliar_estrutura,
+    infere_fr,
+    processa_zip_familia,
+    tabela_dano,
+)
+
+
+def _matrizes_json(familia: Mapping) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Lê os elementos e as matrizes Fi e Fp de uma família no formato JSON do serviço HTTP (ver avalia_inspecao_json). São aceitos dois formatos: (a) matrizes {"elementos": [...], "fi": [[...]], "fp": [[...]]} (danos × elementos, como em extrai_matrizes_fi_fp) ou (b) notas por elemento {"elementos": {"P01": {"fi": [...], "fp": [...]}}}, completadas com zeros até o maior número de danos.
+
+    :param familia: Dicionário da família.
+
+    :return: Uma tupla com três elementos: (a) elementos: Nomes dos elementos, (b) fi: Matriz com os fatores de intensidade, (c) fp: Matriz com os fatores de ponderação.
+    """
+    elementos = familia.get('elementos')
+    if isinstance(elementos, Mapping):
+        nomes = [str(nome) for nome in elementos]
+        notas = []
+        for nome, dados in zip(nomes, elementos.values()):
+            if not isinstance(dados, Mapping):
+                raise ValueError(f"Elemento {nome}: esperado um objeto {{\"fi\": [...], \"fp\": [...]}}")
+            for chave in ('fi', 'fp'):
+                if not isinstance(dados.get(chave, []), list):
+                    raise ValueError(f"Elemento {nome}: '{chave}' deve ser uma lista")
+            notas.append((dados.get('fi', []), dados.get('fp', [])))
+        n_danos = max((len(fi) for fi, _ in notas), default=0)
+        fi = np.zeros((n_danos, len(nomes)), dtype=np.float64)
+        fp = np.zeros((n_danos, len(nomes)), dtype=np.float64)
+        for j, (nome, (fi_elemento, fp_elemento)) in enumerate(zip(nomes, notas)):
+            if len(fi_elemento) != len(fp_elemento):
+                raise ValueError(f"Elemento {nome}: listas 'fi' e 'fp' com tamanhos diferentes")
+            fi[:len(fi_elemento), j] = fi_elemento
+            fp[:len(fp_elemento), j] = fp_elemento
+    elif isinstance(elementos, list):
+        nomes = [str(nome) for nome in elementos]
+        for chave in ('fi', 'fp'):
+            if not isinstance(familia.get(chave, []), list):
+                raise ValueError(f"'{chave}' deve ser uma lista de linhas (danos × elementos)")
+        fi = np.asarray(familia.get('fi', []), dtype=np.float64).reshape(-1, len(nomes))
+        fp = np.asarray(familia.get('fp', []), dtype=np.float64).reshape(-1, len(nomes))
+        if fi.shape != fp.shape:
+            raise ValueError("Matrizes 'fi' e 'fp' com dimensões diferentes")
+    else:
+        raise ValueError("Chave 'elementos' ausente ou inválida")
+
+    if not (np.isfinite(fi).all() and np.isfinite(fp).all()):
+        raise ValueError("Notas Fi e Fp devem ser números finitos")
+    return nomes, fi, fp
+
+
+def avalia_inspecao_json(inspecao: Mapping) -> Dict[str, object]:
+    """
+    Avalia uma inspeção recebida em JSON pelo serviço HTTP (ver ServicoGDE). Formato de entrada: {"ponte": "...", "familias": {nome_da_família: {"f_r": ..., "elementos": ..., "fi": ..., "fp": ...}}} (ver _matrizes_json). Se "f_r" for omitido, ele é inferido pelo nome da família (ver infere_fr).
+
+    :param inspecao: Dicionário da inspeção.
+
+    :return: Dicionário serializável em JSON com as chaves 'ponte', 'g_d', 'nivel', 'recomendacao' e 'familias' ({nome_da_família: dicionário de ResultadoFamilia.como_dict}).
+    """
+    familias = inspecao.get('familias') if isinstance(inspecao, Mapping) else None
+    if not isinstance(familias, Mapping) or not familias:
+        raise ValueError("Chave 'familias' ausente ou vazia")
+
+    resultados_familias = {}
+    for nome, familia in familias.items():
+        if not isinstance(familia, Mapping):
+            raise ValueError(f"Família {nome}: formato inválido")
+        f_r = familia.get('f_r')
+        if f_r is None:
+            f_r = infere_fr(str(nome))
+        if f_r is None:
+            raise ValueError(f"Família {nome}: F_r não identificado")
+        try:
+            elementos, fi, fp = _matrizes_json(familia)
+        except (ValueError, TypeError) as erro:
+            raise ValueError(f"Família {nome}: {erro}") from None
+        resultados_familias[str(nome)] = ResultadoFamilia(elementos, *avalia_elementos_lote(fi, fp), float(f_r))
+
+    g_d, nivel, recomendacao = avaliar_estrutura(resultados_familias)
+    return {
+        'ponte': inspecao.get('ponte'),
+        'g_d': g_d,
+        'nivel': nivel,
+        'recomendacao': recomendacao,
+        'familias': {nome: dados.como_dict() for nome, dados in resultados_familias.items()},
+    }
+
+
+def avalia_lote_json(inspecoes: List[Mapping]) -> List[Dict[str, object]]:
+    """
+    Avalia um lote de inspeções em JSON (ver avalia_inspecao_json) em uma única tarefa do pool de processos. Erros de uma inspeção são registrados na chave 'erro' da sua posição em vez de interromper o lote.
+
+    :param inspecoes: Lista de dicionários de inspeção.
+
+    :return: Lista de resultados, na ordem das inspeções.
+    """
+    resultados = []
+    for inspecao in inspecoes:
+        try:
+            resultados.append(avalia_inspecao_json(inspecao))
+        except (ValueError, TypeError, KeyError) as erro:
+            resultados.append({'ponte': inspecao.get('ponte') if isinstance(inspecao, Mapping) else None, 'erro': str(erro)})
+    return resultados
+
+
+def avalia_requisicao_json(corpo: bytes) -> bytes:
+    """
+    Atende o corpo de uma requisição POST /avaliar no processo de avaliação: a decodificação e a codificação do JSON também são feitas aqui, fora do processo do servidor HTTP, e somente bytes trafegam entre os processos. Um lote {"inspecoes": [...]} é avaliado por avalia_lote_json e respondido com {"resultados": [...]}; qualquer outro objeto é avaliado como uma inspeção (ver avalia_inspecao_json).
+
+    :param corpo: Corpo da requisição (JSON em UTF-8).
+
+    :return: Resposta em JSON (UTF-8).
+    """
+
+    try:
+        payload = json.loads(corpo)
+    except ValueError as erro:
+        raise ValueError(f"JSON inválido: {erro}") from None
+    if isinstance(payload, Mapping) and 'inspecoes' in payload:
+        if not isinstance(payload['inspecoes'], list):
+            raise ValueError("Chave 'inspecoes' deve ser uma lista")
+        resposta = {'resultados': avalia_lote_json(payload['inspecoes'])}
+    else:
+        resposta = avalia_inspecao_json(payload)
+    return json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+
+
+def _membros_zip(zip_ref: zipfile.ZipFile, extensoes: Tuple[str, ...]) -> List[zipfile.ZipInfo]:
+    """
+    Membros de um .zip recebido pelo serviço com as extensões indicadas, conferidos antes da leitura: a soma dos tamanhos descompactados declarados (ZipInfo.file_size, que o zipfile não deixa ultrapassar na leitura) não pode passar de LIMITE_ARQUIVO_BYTES.
+
+    :param zip_ref: Arquivo .zip aberto.
+    :param extensoes: Extensões dos membros que serão lidos.
+
+    :return: Lista de ZipInfo dos membros.
+    """
+    membros = [info for info in zip_ref.infolist() if not info.is_dir() and info.filename.endswith(extensoes)]
+    if sum(info.file_size for info in membros) > LIMITE_ARQUIVO_BYTES:
+        raise ValueError(f"Conteúdo descompactado do .zip acima do limite de {LIMITE_ARQUIVO_BYTES / 1024 ** 2:.0f} MB")
+    return membros
+
+
+def avalia_zip_json(dados: bytes, nome: str = "familia.zip", f_r: Optional[float] = None) -> Dict[str, object]:
+    """
+    Avalia um arquivo .zip recebido pelo serviço HTTP. Se o .zip contiver uma planilha na raiz, é tratado como o .zip de uma família (ver processa_zip_familia); caso contrário, como o pacote de uma ponte com arquivos .zip de famílias e/ou planilhas .xlsx (ver avalia_ponte), extraído em uma pasta temporária.
+
+    :param dados: Conteúdo do .zip.
+    :param nome: Nome do arquivo .zip (usado no nome da família e para inferir o F_r).
+    :param f_r: F_r da família (ou F_r padrão da ponte). Se None, é inferido pelo nome.
+
+    :return: Dicionário serializável em JSON no formato de avalia_inspecao_json, com a chave adicional 'problemas' (número de problemas apontados por valida_dataset).
+    """
+    with zipfile.ZipFile(io.BytesIO(dados)) as zip_ref:
+        nomes = zip_ref.namelist()
+        familia_unica = any(n.endswith(('.xlsx', '.xls')) and "/" not in n for n in nomes) and not any(n.endswith(".zip") for n in nomes)
+        if familia_unica:
+            _membros_zip(zip_ref, ('.xlsx', '.xls'))
+        else:
+            membros = _membros_zip(zip_ref, (".zip", ".xlsx"))
+            repetidos = sorted(nome for nome, n in Counter(Path(info.filename).name for info in membros).items() if n > 1)
+            if repetidos:
+                raise ValueError(f"Arquivos com o mesmo nome em pastas diferentes do .zip: {', '.join(repetidos)}")
+            with tempfile.TemporaryDirectory(prefix="gde_servico_") as pasta:
+                destino = Path(pasta) / Path(nome).stem
+                destino.mkdir(parents=True)
+                tamanho_total = 0
+                for info in membros:
+                    # Somente o nome do arquivo é usado: caminhos do .zip não escapam da pasta temporária
+                    caminho = destino / Path(info.filename).name
+                    caminho.write_bytes(zip_ref.read(info))
+                    if caminho.suffix == ".zip":
+                        # As planilhas dos .zip das famílias entram no mesmo limite do pacote da ponte
+                        with zipfile.ZipFile(caminho) as zip_familia:
+                            tamanho_total += sum(info_familia.file_size for info_familia in _membros_zip(zip_familia, ('.xlsx', '.xls')))
+                    else:
+                        tamanho_total += info.file_size
+                    if tamanho_total > LIMITE_ARQUIVO_BYTES:
+                        raise ValueError(f"Conteúdo descompactado do .zip acima do limite de {LIMITE_ARQUIVO_BYTES / 1024 ** 2:.0f} MB")
+                linha = avalia_ponte(destino, fr_padrao=int(f_r) if f_r else None, com_resultados=True)
+            if linha['erro'] and not linha['familias']:
+                raise ValueError(linha['erro'])
+            resultados = linha.pop('resultados')
+            return {**linha, 'familias': {n: dados_familia.como_dict() for n, dados_familia in resultados.items()}}
+
+    if f_r is None:
+        f_r = infere_fr(nome)
+    if f_r is None:
+        raise ValueError(f"{nome}: F_r não identificado")
+    familia = processa_zip_familia(io.BytesIO(dados), nome, f_r=float(f_r), ler_fotos=False)
+    g_d, nivel, recomendacao = avaliar_estrutura(familia['resultado'])
+    return {
+        'ponte': None,
+        'g_d': g_d,
+        'nivel': nivel,
+        'recomendacao': recomendacao,
+        'familias': {n: dados_familia.como_dict() for n, dados_familia in familia['resultado'].items()},
+        'problemas': len(familia['problemas']),
+    }
+
+
+def _aquece_worker(indice: int = 0) -> int:
+    """
+    Tarefa inicial de cada processo do ServicoGDE: importa NumPy e pandas e monta a TABELA_DANO antes da primeira requisição.
+
+    :param indice: Índice da tarefa (não utilizado; permite o uso com executor.map).
+
+    :return: PID do processo.
+    """
+    tabela_dano()
+    pd.DataFrame
+    return os.getpid()
+
+
+class ServicoGDE:
+    """
+    Núcleo do serviço HTTP de avaliação: pool limitado de processos e métricas de latência e de fila. As requisições acima de max_pendentes são recusadas (o servidor responde 503) em vez de acumuladas na memória.
+
+    :param n_workers: Número de processos. Se None, usa o número de CPUs.
+    :param max_pendentes: Número máximo de requisições em andamento ou na fila.
+    :param n_latencias: Número de latências recentes usadas nos percentis.
+    """
+
+    def __init__(self, n_workers: Optional[int] = None, max_pendentes: int = 256, n_latencias: int = 4096):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.max_pendentes = max_pendentes
+        self.executor = ProcessPoolExecutor(max_workers=self.n_workers)
+        self.pendentes = 0
+        self.rejeitadas = 0
+        self.requisicoes: Dict[str, int] = {}
+        self.erros: Dict[str, int] = {}
+        self.inicio = time.time()
+        self._latencias = deque(maxlen=n_latencias)
+        self._trava = threading.Lock()
+
+    def aquece(self) -> None:
+        """
+        Inicia todos os processos do pool e carrega NumPy e pandas em cada um (ver _aquece_worker).
+        """
+        list(self.executor.map(_aquece_worker, range(self.n_workers)))
+
+    def reserva(self) -> bool:
+        """
+        Reserva uma vaga na fila de requisições.
+
+        :return: False se a fila estiver cheia (a requisição deve ser recusada).
+        """
+        with self._trava:
+            if self.pendentes >= self.max_pendentes:
+                self.rejeitadas += 1
+                return False
+            self.pendentes += 1
+            return True
+
+    def executa(self, funcao: Callable, *args) -> object:
+        """
+        Executa uma função no pool de processos e libera a vaga reservada com reserva.
+
+        :param funcao: Função de nível de módulo (ex: avalia_lote_json).
+        :param args: Argumentos da função.
+
+        :return: Resultado da função.
+        """
+        try:
+            return self.executor.submit(funcao, *args).result()
+        finally:
+            with self._trava:
+                self.pendentes -= 1
+
+    def registra(self, rota: str, latencia: float, erro: bool = False) -> None:
+        """
+        Registra uma requisição atendida nas métricas.
+
+        :param rota: Rota da requisição (ex: "/avaliar").
+        :param latencia: Tempo de atendimento em segundos.
+        :param erro: Se True, a requisição terminou com erro.
+        """
+        with self._trava:
+            self.requisicoes[rota] = self.requisicoes.get(rota, 0) + 1
+            if erro:
+                self.erros[rota] = self.erros.get(rota, 0) + 1
+            self._latencias.append(latencia)
+
+    def metricas(self) -> Dict[str, object]:
+        """
+        Métricas do serviço.
+
+        :return: Dicionário com as chaves 'workers', 'pendentes', 'max_pendentes', 'rejeitadas', 'requisicoes' e 'erros' (por rota), 'tempo_ativo' (s) e 'latencia_ms' (média e percentis 50, 95 e 99 das últimas requisições).
+        """
+        with self._trava:
+            latencias = sorted(self._latencias)
+            metricas = {
+                'workers': self.n_workers,
+                'pendentes': self.pendentes,
+                'max_pendentes': self.max_pendentes,
+                'rejeitadas': self.rejeitadas,
+                'requisicoes': dict(self.requisicoes),
+                'erros': dict(self.erros),
+                'tempo_ativo': time.time() - self.inicio,
+            }
+
+        def percentil(p: float) -> float:
+            return 1000 * latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] if latencias else 0.0
+
+        metricas['latencia_ms'] = {
+            'media': 1000 * sum(latencias) / len(latencias) if latencias else 0.0,
+            'p50': percentil(50),
+            'p95': percentil(95),
+            'p99': percentil(99),
+        }
+        return metricas
+
+    def encerra(self) -> None:
+        """
+        Encerra o pool de processos.
+        """
+        self.executor.shutdown(wait=True)
+
+
+def cria_servidor_http(servico: ServicoGDE, host: str = "127.0.0.1", porta: int = 8000):
+    """
+    Cria o servidor HTTP (biblioteca padrão, uma thread por conexão) do serviço de avaliação. Rotas:
+        - POST /avaliar: inspeção em JSON (ver avalia_inspecao_json) ou lote {"inspecoes": [...]}, respondido com {"resultados": [...]} (ver avalia_requisicao_json). Cada requisição é uma tarefa do pool: lotes amortizam o custo por requisição e requisições simultâneas usam processos diferentes.
+        - POST /avaliar/zip?nome=...&f_r=...: .zip de uma família ou de uma ponte no corpo da requisição (ver avalia_zip_json).
+        - GET /metricas: métricas do serviço (ver ServicoGDE.metricas).
+        - GET /saude: {"status": "ok"}.
+
+    :param servico: Serviço de avaliação.
+    :param host: Endereço de escuta.
+    :param porta: Porta de escuta (0 escolhe uma porta livre, ver server_address).
+
+    :return: Servidor http.server.ThreadingHTTPServer, iniciado com serve_forever.
+    """
+
+    class Manipulador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, formato: str, *args) -> None:
+            pass
+
+        def responde(self, status: int, corpo: object, cabecalhos: Optional[Dict[str, str]] = None) -> None:
+            dados = corpo if isinstance(corpo, bytes) else json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            for chave, valor in (cabecalhos or {}).items():
+                self.send_header(chave, valor)
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self) -> None:
+            rota = urlsplit(self.path).path
+            if rota == "/saude":
+                self.responde(200, {'status': "ok"})
+            elif rota == "/metricas":
+                self.responde(200, servico.metricas())
+            else:
+                self.responde(404, {'erro': f"Rota não encontrada: {rota}"})
+
+        def do_POST(self) -> None:
+            inicio = time.perf_counter()
+            url = urlsplit(self.path)
+            status, corpo, cabecalhos = self.atende(url.path, parse_qs(url.query))
+            if url.path in ("/avaliar", "/avaliar/zip"):
+                # Registrada antes do envio: um GET /metricas feito após a resposta já inclui esta requisição
+                servico.registra(url.path, time.perf_counter() - inicio, erro=status >= 400)
+            self.responde(status, corpo, cabecalhos)
+
+        def atende(self, rota: str, parametros: Dict[str, List[str]]) -> Tuple[int, object, Optional[Dict[str, str]]]:
+            if rota not in ("/avaliar", "/avaliar/zip"):
+                # O corpo não é lido: a conexão é encerrada para que ele não seja tomado pela próxima requisição
+                self.close_connection = True
+                return 404, {'erro': f"Rota não encontrada: {rota}"}, None
+            cabecalho = self.headers.get("Content-Length")
+            if cabecalho is None:
+                self.close_connection = True
+                return 411, {'erro': "Cabeçalho Content-Length ausente"}, None
+            try:
+                tamanho = int(cabecalho)
+            except ValueError:
+                tamanho = -1
+            if tamanho < 0:
+                self.close_connection = True
+                return 400, {'erro': f"Content-Length inválido: {cabecalho}"}, None
+            if tamanho > LIMITE_ARQUIVO_BYTES:
+                self.close_connection = True
+                return 413, {'erro': "Requisição acima do limite de tamanho"}, None
+            corpo = self.rfile.read(tamanho)
+            if rota == "/avaliar/zip":
+                f_r = parametros.get('f_r', [None])[0]
+                try:
+                    tarefa = (avalia_zip_json, corpo, parametros.get('nome', ["familia.zip"])[0], float(f_r) if f_r else None)
+                except ValueError:
+                    return 400, {'erro': f"F_r inválido: {f_r}"}, None
+            else:
+                tarefa = (avalia_requisicao_json, corpo)
+
+            if not servico.reserva():
+                return 503, {'erro': "Fila de avaliação cheia"}, {"Retry-After": "1"}
+            try:
+                return 200, servico.executa(*tarefa), None
+            except (ValueError, TypeError, KeyError, zipfile.BadZipFile) as erro:
+                return 400, {'erro': str(erro)}, None
+            except Exception as erro:
+                return 500, {'erro': f"{type(erro).__name__}: {erro}"}, None
+
+    servidor = ThreadingHTTPServer((host, porta), Manipulador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def servidor_http(host: str = "127.0.0.1", porta: int = 8000, n_workers: Optional[int] = None, max_pendentes: int = 256) -> None:
+    """
+    Executa o serviço HTTP de avaliação (ver cria_servidor_http) até a interrupção do processo (Ctrl+C).
+
+    :param host: Endereço de escuta.
+    :param porta: Porta de escuta.
+    :param n_workers: Número de processos de avaliação. Se None, usa o número de CPUs.
+    :param max_pendentes: Número máximo de requisições em andamento ou na fila.
+    """
+    servico = ServicoGDE(n_workers=n_workers, max_pendentes=max_pendentes)
+    servico.aquece()
+    servidor = cria_servidor_http(servico, host, porta)
+    print(f"Serviço GDE em http://{servidor.server_address[0]}:{servidor.server_address[1]} ({servico.n_workers} processo(s)).")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servico.encerra()
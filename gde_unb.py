@@ -1,8 +1,192 @@
-import pandas as pd
-import numpy as np
+from __future__ import annotations
+
 import base64
+import hashlib
+import heapq
+import importlib.util
+import io
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import unicodedata
+import weakref
+import zipfile
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import date
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, List, Tuple
+from urllib.parse import quote
+from xml.etree import ElementTree
+from typing import IO, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class _ImportacaoTardia:
+    """
+    Módulo importado somente no primeiro acesso a um de seus atributos. Nesse momento o nome global que guardava este objeto passa a apontar para o próprio módulo, sem custo nos acessos seguintes. Com isso, importar gde_unb não carrega pandas, NumPy nem Pillow, e o núcleo de cálculo da estrutura (avaliar_estrutura, classifica_g_d, AvaliacaoIncremental) funciona sem eles. A troca só vale para os nomes globais de gde_unb: os demais módulos do projeto importam pandas e NumPy diretamente em vez de reaproveitar pd e np daqui.
+
+    :param modulo: Nome completo do módulo (ex: "pandas").
+    :param nome_global: Nome do módulo em gde_unb (ex: "pd").
+    """
+
+    def __init__(self, modulo: str, nome_global: str):
+        self._modulo = modulo
+        self._nome_global = nome_global
+
+    def __getattr__(self, atributo: str) -> object:
+        modulo = importlib.import_module(self._modulo)
+        globals()[self._nome_global] = modulo
+        return getattr(modulo, atributo)
+
+
+pd = _ImportacaoTardia("pandas", "pd")
+np = _ImportacaoTardia("numpy", "np")
+
+if importlib.util.find_spec("PIL") is not None:
+    Image = _ImportacaoTardia("PIL.Image", "Image")
+    ImageOps = _ImportacaoTardia("PIL.ImageOps", "ImageOps")
+else:  # Pillow é opcional: sem ele as fotos são mantidas no tamanho original
+    Image = ImageOps = None
+
+FR_DESCRICAO = {
+    1: "Barreiras, guarda-corpo, guarda rodas, pista de rolamento",
+    2: "Juntas de dilatação",
+    3: "Transversinas, cortinas, alas",
+    4: "Lajes, fundações, vigas secundárias, aparelhos de apoio",
+    5: "Vigas e pilares principais",
+}
+
+# Palavras-chave (nome do arquivo sem acentos, minúsculo) usadas para inferir o F_r no modo em lote.
+# A ordem importa: "transversina" deve ser testada antes de "viga".
+FR_PALAVRAS_CHAVE = [
+    (2, r"junta"),
+    (3, r"transversina|cortina|alas?\b"),
+    (1, r"barreira|guarda|pista|rolamento"),
+    (4, r"laje|fundac|bloco|aparelho"),
+    (5, r"viga|pilar"),
+]
+
+EXTENSOES_IMAGEM = ('.png', '.jpg', '.jpeg')
+
+# As galerias do relatório exibem as fotos em caixas de 300 px; 600 px mantém a nitidez em telas de alta densidade.
+DIMENSAO_MAX_FOTO = 600
+QUALIDADE_JPEG = 75
+
+# GIF transparente de 1 pixel: src das fotos embutidas uma única vez, cuja imagem vem da regra CSS "content" da foto (ver gera_galeria_html).
+PIXEL_TRANSPARENTE = "data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7"
+
+
+_DIAGNOSTICO_ATUAL: ContextVar[Optional["Diagnostico"]] = ContextVar("diagnostico_gde", default=None)
+
+
+class Diagnostico:
+    """
+    Coleta, por etapa do processamento, o tempo de relógio, o tempo de CPU, os bytes processados e (opcionalmente) o pico de memória alocada. Ativo apenas dentro de um bloco with; fora dele as etapas instrumentadas (ver etapa) não medem nada.
+
+    O pico de memória usa o tracemalloc, que desacelera o processamento; ele é global ao processo, então os picos medidos incluem alocações de outras threads ativas no mesmo período.
+
+    :param memoria: Se True, mede o pico de memória de cada etapa.
+    """
+
+    def __init__(self, memoria: bool = False):
+        self.memoria = memoria
+        self.registros = []
+        self._pilha = []
+        self._token = None
+        self._iniciou_tracemalloc = False
+
+    def __enter__(self) -> "Diagnostico":
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._iniciou_tracemalloc = True
+        self._token = _DIAGNOSTICO_ATUAL.set(self)
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        _DIAGNOSTICO_ATUAL.reset(self._token)
+        if self._iniciou_tracemalloc:
+            tracemalloc.stop()
+            self._iniciou_tracemalloc = False
+        return False
+
+    @contextmanager
+    def etapa(self, nome: str, n_bytes: int = 0) -> Iterator[Dict[str, object]]:
+        """
+        Mede uma etapa. O registro é devolvido no with para que a etapa possa completar o campo 'bytes'.
+
+        :param nome: Nome da etapa.
+        :param n_bytes: Bytes processados pela etapa, se já conhecidos.
+
+        :return: Registro da etapa com as chaves 'etapa', 'nivel', 'tempo_s', 'cpu_s', 'bytes' e 'pico_memoria_bytes'.
+        """
+        registro = {'etapa': nome, 'nivel': len(self._pilha), 'tempo_s': 0.0, 'cpu_s': 0.0, 'bytes': n_bytes, 'pico_memoria_bytes': None}
+        self.registros.append(registro)
+
+        medir_memoria = self.memoria and tracemalloc.is_tracing()
+        if medir_memoria:
+            atual, pico = tracemalloc.get_traced_memory()
+            if self._pilha:
+                self._pilha[-1][2] = max(self._pilha[-1][2], pico)
+            tracemalloc.reset_peak()
+        else:
+            atual = 0
+        # [registro, memória no início, maior pico absoluto observado durante a etapa]
+        quadro = [registro, atual, atual]
+        self._pilha.append(quadro)
+
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield registro
+        finally:
+            registro['tempo_s'] = time.perf_counter() - inicio
+            registro['cpu_s'] = time.process_time() - inicio_cpu
+            self._pilha.pop()
+            if medir_memoria and tracemalloc.is_tracing():
+                pico = max(tracemalloc.get_traced_memory()[1], quadro[2])
+                registro['pico_memoria_bytes'] = pico - quadro[1]
+                if self._pilha:
+                    self._pilha[-1][2] = max(self._pilha[-1][2], pico)
+
+    def tabela(self) -> pd.DataFrame:
+        """
+        Tabela das etapas medidas, na ordem de início, com o nome indentado conforme o aninhamento.
+
+        :return: DataFrame com uma linha por etapa.
+        """
+        return pd.DataFrame([
+            {
+                "Etapa": "  " * registro['nivel'] + registro['etapa'],
+                "Tempo (ms)": round(registro['tempo_s'] * 1000, 2),
+                "CPU (ms)": round(registro['cpu_s'] * 1000, 2),
+                "Bytes": registro['bytes'],
+                "Pico de memória (KiB)": None if registro['pico_memoria_bytes'] is None else round(registro['pico_memoria_bytes'] / 1024, 1),
+            }
+            for registro in self.registros
+        ])
+
+
+def etapa(nome: str, n_bytes: int = 0) -> ContextManager[Dict[str, object]]:
+    """
+    Instrumenta uma etapa do processamento no diagnóstico ativo (ver Diagnostico). Sem diagnóstico ativo, não mede nada.
+
+    :param nome: Nome da etapa.
+    :param n_bytes: Bytes processados pela etapa, se já conhecidos.
+
+    :return: Gerenciador de contexto que devolve o registro da etapa (ou um dicionário descartável).
+    """
+    diagnostico = _DIAGNOSTICO_ATUAL.get()
+    if diagnostico is None:
+        return nullcontext({})
+    return diagnostico.etapa(nome, n_bytes)
+
 
 def image_to_base64(image_input: str | bytes | Path) -> str:
     """
@@ -23,28 +207,165 @@ def image_to_base64(image_input: str | bytes | Path) -> str:
     return base64.b64encode(img_bytes).decode("utf-8")
 
 
-def gerar_relatorio_html(resultados_familias: Dict[str, Dict[str, float]], g_d: float, nivel: str, recomendacao: str, tabelas_originais: Dict[str, pd.DataFrame], imagens_por_familia: Dict[str, list], nomes_arquivos: List[str], fr_lista: List[int], fr_descricao: Dict[int, str], elementos_por_familia: Dict[str, List[str]]) -> Tuple[str, pd.DataFrame, pd.DataFrame]:
+def hash_foto(imagem: str | bytes | Callable[[], bytes]) -> str:
     """
-    Gera o relatório consolidado em formato HTML e dois DataFrames com os resultados da inspeção.
+    Calcula o hash SHA-256 do conteúdo de uma foto, usado para identificar cópias idênticas da mesma imagem.
 
-    Esta função monta um relatório em HTML com as tabelas originais, imagens, cálculos dos índices G_de e G_df, além de um resumo consolidado por família e pela estrutura como um todo. Também retorna dois DataFrames auxiliares para exibição no Streamlit.
+    :param imagem: Imagem em base64 (str), bytes da imagem ou função sem argumentos que retorna os bytes da imagem. Imagens em base64 são decodificadas, para que a mesma foto tenha o mesmo hash nos dois formatos.
 
-    :param resultados_familias: Dicionário com os resultados numéricos de cada família (valores de F_r, G_df, F_r × G_df e resultados por elemento).
-    :param g_d: Grau de Deterioração da Estrutura calculado.
-    :param nivel: Nível qualitativo de deterioração da estrutura (ex: "Baixo", "Alto", etc.).
-    :param recomendacao: Texto com a recomendação de ação baseada no nível de deterioração.
-    :param tabelas_originais: Dicionário com os DataFrames originais das planilhas de inspeção por família.
-    :param imagens_por_familia: Dicionário com listas de tuplas (nome_da_imagem, imagem_em_base64) por família.
-    :param nomes_arquivos: Lista com os nomes dos arquivos submetidos por família.
-    :param fr_lista: Lista dos fatores de importância F_r utilizados por família.
-    :param fr_descricao: Dicionário com a descrição textual de cada fator F_r.
-    :param elementos_por_familia: Dicionário com os nomes dos elementos estruturais presentes em cada família.
+    :return: Hash SHA-256 em hexadecimal.
+    """
+    dados = imagem() if callable(imagem) else imagem
+    if isinstance(dados, str):
+        try:
+            dados = base64.b64decode(dados)
+        except ValueError:  # texto que não é base64 válido: usa o próprio texto
+            dados = dados.encode()
+    return hashlib.sha256(dados).hexdigest()
 
-    :return: Uma tupla com três elementos: (a) html: string com o relatório completo em HTML, (b) df_resumo_familias_streamlit: DataFrame com o resumo das famílias formatado para Streamlit, 
-    (c) df_estrutura_streamlit: DataFrame com os dados gerais da estrutura formatado para exibição no Streamlit.
+
+def reduz_imagem(imagem: bytes | Callable[[], bytes], dimensao_max: int = DIMENSAO_MAX_FOTO, qualidade: int = QUALIDADE_JPEG) -> bytes:
+    """
+    Decodifica uma foto, reduz o lado maior para no máximo dimensao_max pixels (mantendo a proporção e a orientação EXIF) e a recodifica em JPEG. Sem o Pillow instalado, ou se a imagem não puder ser decodificada, os bytes originais são devolvidos.
+
+    :param imagem: Bytes da imagem ou função sem argumentos que retorna os bytes da imagem.
+    :param dimensao_max: Maior dimensão (largura ou altura) da imagem reduzida, em pixels.
+    :param qualidade: Qualidade JPEG (1 a 95).
+
+    :return: Bytes da imagem reduzida em JPEG.
+    """
+    dados = imagem() if callable(imagem) else imagem
+    if Image is None:
+        return dados
+
+    try:
+        with Image.open(io.BytesIO(dados)) as img:
+            img.draft("RGB", (dimensao_max, dimensao_max))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((dimensao_max, dimensao_max))
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                fundo = Image.new("RGB", img.size, (255, 255, 255))
+                fundo.paste(img, mask=img.getchannel("A"))
+                img = fundo
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            saida = io.BytesIO()
+            img.save(saida, format="JPEG", quality=qualidade, optimize=True)
+    except (OSError, ValueError):
+        return dados
+
+    return saida.getvalue()
+
+
+def prepara_fotos(fotos: List[tuple], dimensao_max: int = DIMENSAO_MAX_FOTO, qualidade: int = QUALIDADE_JPEG, n_workers: Optional[int] = None, cache: Optional["CacheLRU"] = None, espaco: Optional["EspacoSessao"] = None) -> List[tuple]:
+    """
+    Reduz em paralelo (pool de threads) as fotos de uma família para exibição no relatório (ver reduz_imagem). Fotos com conteúdo idêntico (ver hash_foto) são reduzidas uma única vez e compartilham os mesmos bytes.
+
+    :param fotos: Lista de tuplas (nome_da_imagem, imagem) ou (nome_da_imagem, imagem, link_original), em que a imagem são os bytes ou uma função que retorna os bytes.
+    :param dimensao_max: Maior dimensão das fotos reduzidas, em pixels.
+    :param qualidade: Qualidade JPEG das fotos reduzidas.
+    :param n_workers: Número de threads. Se None, usa o padrão do ThreadPoolExecutor.
+    :param cache: Cache opcional das fotos reduzidas, indexado pelo hash da foto, dimensao_max e qualidade; permite reaproveitar fotos repetidas entre famílias e execuções.
+    :param espaco: Espaço de sessão opcional (ver EspacoSessao). Se informado, as fotos reduzidas são gravadas em disco e a lista devolvida traz funções que leem os arquivos, em vez dos bytes.
+
+    :return: Lista de tuplas no mesmo formato da entrada, com os bytes das fotos reduzidas (ou funções que os leem).
+    """
+    if not fotos:
+        return []
+
+    def reduz(chave: str, imagem: bytes | Callable[[], bytes]) -> Tuple[bytes | Callable[[], bytes], int]:
+        if cache is None:
+            reduzida = reduz_imagem(imagem, dimensao_max, qualidade)
+        else:
+            reduzida = cache.obter_ou_calcular((chave, dimensao_max, qualidade), partial(reduz_imagem, imagem, dimensao_max, qualidade))
+        if espaco is not None:
+            # Cada foto vai para o disco assim que é reduzida: só as fotos em processamento ficam na memória
+            return partial(Path.read_bytes, espaco.guarda(reduzida, ".jpg")[0]), len(reduzida)
+        return reduzida, len(reduzida)
+
+    with etapa("prepara_fotos") as registro, ThreadPoolExecutor(max_workers=n_workers) as executor:
+        chaves = list(executor.map(lambda foto: hash_foto(foto[1]), fotos))
+        unicas = {}
+        for chave, foto in zip(chaves, fotos):
+            unicas.setdefault(chave, foto[1])
+        reduzidas = dict(zip(unicas, executor.map(reduz, unicas, unicas.values())))
+        registro['bytes'] = sum(tamanho for _, tamanho in reduzidas.values())
+
+    return [(foto[0], reduzidas[chave][0], *foto[2:]) for foto, chave in zip(fotos, chaves)]
+
+
+def caminho_foto_original(nome_familia: str, j: int, nome_img: str) -> str:
+    """
+    Caminho relativo de uma foto original no arquivo .zip de fotos originais (ver escreve_fotos_originais). O nome leva a posição da foto, pois fotos de subpastas diferentes do .zip da família podem ter o mesmo nome.
+
+    :param nome_familia: Nome da família.
+    :param j: Posição da foto na família (a partir de 0).
+    :param nome_img: Nome da imagem.
+
+    :return: Caminho relativo da foto original.
+    """
+    return f"originais/{nome_familia}/{j+1:03d}_{Path(nome_img).name}"
+
+
+def escreve_fotos_originais(destino: str | Path | IO[bytes], fotos_por_familia: Dict[str, List[tuple]]) -> int:
+    """
+    Grava as fotos originais (resolução completa) em um arquivo .zip, uma a uma, nos caminhos dados por caminho_foto_original.
+
+    :param destino: Caminho do arquivo .zip ou objeto de arquivo aberto em modo binário.
+    :param fotos_por_familia: Dicionário com listas de tuplas (nome_da_imagem, imagem) por família, em que a imagem são os bytes ou uma função que retorna os bytes.
+
+    :return: Número de fotos gravadas.
     """
+    n_fotos = 0
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED) as zip_saida:
+        for nome_familia, fotos in fotos_por_familia.items():
+            for j, (nome_img, imagem, *_) in enumerate(fotos):
+                zip_saida.writestr(caminho_foto_original(nome_familia, j, nome_img), imagem() if callable(imagem) else imagem)
+                n_fotos += 1
+    return n_fotos
+
+
+class RegistroFotos:
+    """
+    Registro das fotos incluídas em um relatório, indexadas pelo hash do conteúdo (ver hash_foto). Cada foto distinta é gravada uma única vez; as cópias apenas referenciam a primeira ocorrência.
+    """
+
+    def __init__(self):
+        self.referencias = {}
+        self.fotos = 0
+        self.bytes_total = 0
+        self.bytes_economizados = 0
+
+    def registra(self, dados: str | bytes, referencia: str) -> Tuple[str, bool]:
+        """
+        Registra uma ocorrência de uma foto no relatório.
+
+        :param dados: Conteúdo da foto (bytes ou base64). Os contadores de bytes usam sempre o tamanho da imagem decodificada.
+        :param referencia: Referência (classe CSS ou caminho) a ser usada se a foto ainda não tiver sido registrada.
 
-    html = """<html><head><meta charset='utf-8'><title>Relatório GDE</title>
+        :return: Uma tupla com dois elementos: (a) referência da primeira ocorrência da foto, (b) True se a foto é nova e precisa ser gravada.
+        """
+        chave = hash_foto(dados)
+        tamanho = len(dados) * 3 // 4 - dados[-2:].count("=") if isinstance(dados, str) else len(dados)
+        self.fotos += 1
+        self.bytes_total += tamanho
+        if chave in self.referencias:
+            self.bytes_economizados += tamanho
+            return self.referencias[chave], False
+        self.referencias[chave] = referencia
+        return referencia, True
+
+    def estatisticas(self) -> Dict[str, int]:
+        """
+        Retorna os contadores do registro.
+
+        :return: Dicionário com as chaves 'fotos', 'unicas', 'bytes' e 'bytes_economizados'.
+        """
+        return {'fotos': self.fotos, 'unicas': len(self.referencias), 'bytes': self.bytes_total, 'bytes_economizados': self.bytes_economizados}
+
+
+CABECALHO_HTML = """<html><head><meta charset='utf-8'><title>Relatório GDE</title>
     <style>
     body { font-family: Arial; margin: 30px; }
     table { border-collapse: collapse; width: 100%; margin-bottom: 20px; }
@@ -60,40 +381,169 @@ def gerar_relatorio_html(resultados_familias: Dict[str, Dict[str, float]], g_d:
     <h1>Relatório Consolidado GDE</h1>
     """
 
-    resumo_familias_html = []
-    resumo_familias_streamlit = []
+# Tamanho (múltiplo de 3) dos blocos de bytes codificados por vez, para que os pedaços em base64 possam ser concatenados.
+TAMANHO_BLOCO_BASE64 = 3 * 64 * 1024
+
+
+def base64_em_partes(imagem: str | bytes | Callable[[], bytes], tamanho_bloco: int = TAMANHO_BLOCO_BASE64) -> Iterator[str]:
+    """
+    Codifica uma imagem em base64 em pedaços, sem montar a string completa na memória.
+
+    :param imagem: Imagem já em base64 (str), bytes da imagem ou função sem argumentos que retorna os bytes da imagem (leitura sob demanda).
+    :param tamanho_bloco: Número de bytes codificados por pedaço (múltiplo de 3).
+
+    :return: Iterador de pedaços da string base64.
+    """
+    if isinstance(imagem, str):
+        yield imagem
+        return
+
+    dados = memoryview(imagem() if callable(imagem) else imagem)
+    for inicio in range(0, len(dados), tamanho_bloco):
+        yield base64.b64encode(dados[inicio:inicio + tamanho_bloco]).decode("ascii")
+
+
+def tabelas_resumo(resultados_familias: Dict[str, Dict[str, float]], g_d: float, nivel: str, recomendacao: str, nomes_arquivos: List[str], formato: str = "streamlit") -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Monta as tabelas de resumo por família e da estrutura usadas no relatório e na página do Streamlit.
+
+    :param resultados_familias: Dicionário com os resultados numéricos de cada família.
+    :param g_d: Grau de Deterioração da Estrutura calculado.
+    :param nivel: Nível qualitativo de deterioração da estrutura.
+    :param recomendacao: Texto com a recomendação de ação.
+    :param nomes_arquivos: Lista com os nomes dos arquivos submetidos por família.
+    :param formato: "streamlit" (LaTeX entre $) ou "html" (LaTeX entre \\( \\) para o MathJax).
+
+    :return: Uma tupla com dois elementos: (a) df_resumo_familias: DataFrame com o resumo das famílias, (b) df_estrutura: DataFrame com os dados gerais da estrutura.
+    """
+    if formato == "html":
+        abre, fecha, vezes_gdf = "\\(", "\\)", "\\times G_{df}"
+    else:
+        abre, fecha, vezes_gdf = "$", "$", "× G_df"
+
+    resumo_familias = []
     soma_fr = 0
     soma_fr_gdf = 0
+    for i, dados in enumerate(resultados_familias.values()):
+        soma_fr += dados["f_r"]
+        soma_fr_gdf += dados["f_r × g_df"]
+        resumo_familias.append({
+            "Família / Arquivo": f"Família {i+1} – {nomes_arquivos[i]}",
+            f"Fator de Importância ({abre}F_r{fecha})": dados["f_r"],
+            f"{abre}F_r {vezes_gdf}{fecha}": dados["f_r × g_df"]
+        })
 
-    for i, (nome, dados) in enumerate(resultados_familias.items()):
-        fr = dados["f_r"]
-        fr_gdf = dados["f_r × g_df"]
-        descricao = fr_descricao.get(fr, "")
-        soma_fr += fr
-        soma_fr_gdf += fr_gdf
-
-        html += f"<hr><h2>Família {i+1} - {nome}</h2>"
-
-        if nome in tabelas_originais:
-            df_html = tabelas_originais[nome].fillna(0)
-            html += "<h3>Tabela original da inspeção</h3>"
-            html += df_html.to_html(index=False, border=1)
-
-        imagens = imagens_por_familia.get(nome, [])
-        if imagens:
-            html += "<h3>Imagens da inspeção</h3><div class='image-gallery'>"
-            for nome_img, base64_img in imagens:
-                html += f"""
-                <div class='image-box'>
-                    <img src='data:image/jpeg;base64,{base64_img}' alt='{nome_img}' />
-                    <div><small>{nome_img}</small></div>
+    dados_estrutura = {
+        "Descrição": [
+            f"{abre}\\sum (F_r \\times G_{{df}}){fecha}",
+            f"{abre}\\sum F_r{fecha}",
+            f"Grau de Deterioração da Estrutura ({abre}G_d{fecha})",
+            "Nível de Deterioração",
+            "Ação Recomendada"
+        ],
+        "Valor": [
+            f"{soma_fr_gdf:.10f}",
+            f"{soma_fr}",
+            f"{g_d:.10f}",
+            nivel.strip(),
+            recomendacao.strip()
+        ]
+    }
+
+    return pd.DataFrame(resumo_familias), pd.DataFrame(dados_estrutura)
+
+
+def gera_galeria_html(imagens: List[tuple], caminhos: Optional[List[str]] = None, registro_fotos: Optional[RegistroFotos] = None) -> Iterator[str]:
+    """
+    Gera a galeria de imagens de uma família. Sem caminhos, as imagens são embutidas em base64 (ver base64_em_partes); com caminhos, são referenciadas pelos arquivos externos e carregadas sob demanda pelo navegador (loading="lazy").
+
+    :param imagens: Lista de tuplas (nome_da_imagem, imagem) ou (nome_da_imagem, imagem, link_original).
+    :param caminhos: Caminhos relativos dos arquivos das imagens, na mesma ordem de imagens.
+    :param registro_fotos: Registro das fotos já embutidas no relatório (ver RegistroFotos). Se informado, cada foto distinta é embutida uma única vez, na regra CSS "content" de uma classe (foto-1, foto-2, ...), e todas as ocorrências são <img> dessa classe (com src PIXEL_TRANSPARENTE) que compartilham a mesma imagem. Assim as cópias aparecem sem JavaScript, inclusive na impressão, em que imagens de fundo são omitidas por padrão.
+
+    :return: Iterador de pedaços (str) do HTML da galeria.
+    """
+    if not imagens:
+        return
+
+    yield "<h3>Imagens da inspeção</h3><div class='image-gallery'>"
+    for k, (nome_img, imagem, *link) in enumerate(imagens):
+        yield """
+                <div class='image-box'>"""
+        if caminhos is None and registro_fotos is not None:
+            dados = imagem() if callable(imagem) else imagem
+            referencia, nova = registro_fotos.registra(dados, f"foto-{len(registro_fotos.referencias) + 1}")
+            if nova:
+                yield f"<style>img.{referencia} {{ content: url('data:image/jpeg;base64,"
+                yield from base64_em_partes(dados)
+                yield "'); }</style>"
+            yield f"""
+                    <img class='{referencia}' src='{PIXEL_TRANSPARENTE}' alt='{nome_img}' />"""
+        elif caminhos is None:
+            yield """
+                    <img src='data:image/jpeg;base64,"""
+            yield from base64_em_partes(imagem)
+            yield f"' alt='{nome_img}' />"
+        else:
+            yield f"""
+                    <img src='{caminhos[k]}' loading='lazy' alt='{nome_img}' />"""
+        legenda = f"<a href='{link[0]}' target='_blank'>{nome_img}</a>" if link and link[0] else nome_img
+        yield f"""
+                    <div><small>{legenda}</small></div>
                 </div>
                 """
-            html += "</div>"
+    yield "</div>"
+
+
+def gera_secao_familia_html(i: int, nome: str, dados: Dict[str, float], tabela_original: Optional[pd.DataFrame], galeria: Iterator[str], fr_descricao: Dict[int, str]) -> Iterator[str]:
+    """
+    Gera a seção do relatório de uma família: tabela original, galeria, resultados por peça e cálculo do G_df.
+
+    :param i: Posição da família (a partir de 0).
+    :param nome: Nome da família.
+    :param dados: Resultado da família (dicionário de avalia_familia ou ResultadoFamilia).
+    :param tabela_original: DataFrame da planilha de inspeção ou None.
+    :param galeria: Pedaços do HTML da galeria (ver gera_galeria_html).
+    :param fr_descricao: Dicionário com a descrição textual de cada fator F_r.
+
+    :return: Iterador de pedaços (str) do HTML da seção.
+    """
+    yield f"<hr><h2>Família {i+1} - {nome}</h2>"
+    yield from gera_tabela_familia_html(tabela_original)
+    yield from galeria
+    yield from gera_resultados_familia_html(dados, fr_descricao)
+
+
+def gera_tabela_familia_html(tabela_original: Optional[pd.DataFrame]) -> Iterator[str]:
+    """
+    Gera a tabela original da inspeção de uma família (parte de gera_secao_familia_html).
+
+    :param tabela_original: DataFrame da planilha de inspeção ou None.
+
+    :return: Iterador de pedaços (str) do HTML da tabela.
+    """
+    if tabela_original is not None:
+        df_html = tabela_original.fillna(0)
+        yield "<h3>Tabela original da inspeção</h3>"
+        yield df_html.to_html(index=False, border=1)
+
+
+def gera_resultados_familia_html(dados: Dict[str, float], fr_descricao: Dict[int, str]) -> Iterator[str]:
+    """
+    Gera os resultados por peça e o cálculo do G_df de uma família (parte de gera_secao_familia_html).
+
+    :param dados: Resultado da família (dicionário de avalia_familia ou ResultadoFamilia).
+    :param fr_descricao: Dicionário com a descrição textual de cada fator F_r.
+
+    :return: Iterador de pedaços (str) do HTML dos resultados.
+    """
+    fr = dados["f_r"]
+    fr_gdf = dados["f_r × g_df"]
+    descricao = fr_descricao.get(fr, "")
 
-        resultados_elemento = dados.get("resultados_elemento", {})
-        html += f"<h3>Resultados por peça \\(G_{{de}}\\)</h3>"
-        html += r"""
+    resultados_elemento = dados.get("resultados_elemento", {})
+    yield f"<h3>Resultados por peça \\(G_{{de}}\\)</h3>"
+    yield r"""
         <table>
             <tr>
                 <th>Elemento</th>
@@ -103,8 +553,7 @@ def gerar_relatorio_html(resultados_familias: Dict[str, Dict[str, float]], g_d:
                 <th>\(F_r \times G_{df}\)</th>
             </tr>
         """
-        for el, resultado in resultados_elemento.items():
-            html += f"""
+    yield "".join(f"""
             <tr>
                 <td>{el}</td>
                 <td>{resultado['sum_d']:.2f}</td>
@@ -112,15 +561,18 @@ def gerar_relatorio_html(resultados_familias: Dict[str, Dict[str, float]], g_d:
                 <td>{resultado['g_de']:.2f}</td>
                 <td>{fr_gdf:.2f}</td>
             </tr>
-            """
-        html += "</table>"
+            """ for el, resultado in resultados_elemento.items())
+    yield "</table>"
 
-        html += f"<p><strong>Fator de Importância:</strong> \\(F_r = {fr}\\) – {descricao}</p>"
+    yield f"<p><strong>Fator de Importância:</strong> \\(F_r = {fr}\\) – {descricao}</p>"
 
+    if isinstance(dados, ResultadoFamilia):
+        gde_sum, gde_max = dados.gde_sum, dados.gde_max
+    else:
         gde_sum = sum([v['g_de'] for v in resultados_elemento.values()])
         gde_max = max([v['g_de'] for v in resultados_elemento.values()], default=0)
 
-        html += f"""
+    yield f"""
         <h3>Cálculo do \\(G_{{df}}\\) (Grau de Deficiência Familiar)</h3>
         \\[
         G_{{df}} = {gde_max:.4f} \\cdot \\sqrt{{1 + \\frac{{({gde_sum:.4f} - {gde_max:.4f})}}{{{gde_sum:.4f}}}}} = {dados['g_df']:.4f}
@@ -130,213 +582,2449 @@ def gerar_relatorio_html(resultados_familias: Dict[str, Dict[str, float]], g_d:
         \\]
         """
 
-        resumo_familias_html.append({
-            "Família / Arquivo": f"Família {i+1} – {nomes_arquivos[i]}",
-            "Fator de Importância (\\(F_r\\))": fr,
-            "\\(F_r \\times G_{df}\\)": fr_gdf
-        })
-        resumo_familias_streamlit.append({
-            "Família / Arquivo": f"Família {i+1} – {nomes_arquivos[i]}",
-            "Fator de Importância ($F_r$)": fr,
-            "$F_r × G_df$": fr_gdf
-        })
 
-    df_resumo_familias_streamlit = pd.DataFrame(resumo_familias_streamlit)
-    df_resumo_familias_html = pd.DataFrame(resumo_familias_html)
+def gera_resumo_html(resultados_familias: Dict[str, Dict[str, float]], g_d: float, nivel: str, recomendacao: str, nomes_arquivos: List[str], diagnostico: Optional[Diagnostico] = None, diferencas: Optional[Dict[str, pd.DataFrame]] = None) -> Iterator[str]:
+    """
+    Gera as seções finais do relatório: resumo por família, grau de deterioração da estrutura e, se houver, a comparação com a inspeção anterior e o apêndice de diagnóstico.
 
-    html += "<hr><h2>Resumo dos Resultados por Família</h2>"
-    html += df_resumo_familias_html.to_html(index=False, border=1)
+    :return: Iterador de pedaços (str) do HTML do resumo.
+    """
+    df_resumo_familias_html, df_estrutura_html = tabelas_resumo(resultados_familias, g_d, nivel, recomendacao, nomes_arquivos, formato="html")
 
-    dados_estrutura_html = {
-        "Descrição": [
-            "\\(\\sum (F_r \\times G_{df})\\)",
-            "\\(\\sum F_r\\)",
-            "Grau de Deterioração da Estrutura (\\(G_d\\))",
-            "Nível de Deterioração",
-            "Ação Recomendada"
-        ],
-        "Valor": [
-            f"{soma_fr_gdf:.10f}",
-            f"{soma_fr}",
-            f"{g_d:.10f}",
-            nivel.strip(),
-            recomendacao.strip()
-        ]
-    }
-    dados_estrutura_streamlit = {
-        "Descrição": [
-            "$\\sum (F_r \\times G_{df})$",
-            "$\\sum F_r$",
-            "Grau de Deterioração da Estrutura ($G_d$)",
-            "Nível de Deterioração",
-            "Ação Recomendada"
-        ],
-        "Valor": [
-            f"{soma_fr_gdf:.10f}",
-            f"{soma_fr}",
-            f"{g_d:.10f}",
-            nivel.strip(),
-            recomendacao.strip()
-        ]
-    }
+    yield "<hr><h2>Resumo dos Resultados por Família</h2>"
+    yield df_resumo_familias_html.to_html(index=False, border=1)
 
-    df_estrutura_html = pd.DataFrame(dados_estrutura_html)
-    df_estrutura_streamlit = pd.DataFrame(dados_estrutura_streamlit)
+    yield "<hr><h2>Grau de Deterioração da Estrutura</h2>"
+    yield df_estrutura_html.to_html(index=False, border=1)
 
-    html += "<hr><h2>Grau de Deterioração da Estrutura</h2>"
-    html += df_estrutura_html.to_html(index=False, border=1)
-    html += "</body></html>"
+    if diferencas is not None:
+        yield from gera_secao_diferencas_html(diferencas)
 
-    return html, df_resumo_familias_streamlit, df_estrutura_streamlit
+    if diagnostico is not None and diagnostico.registros:
+        yield "<hr><h2>Apêndice – Diagnóstico de desempenho</h2>"
+        yield diagnostico.tabela().to_html(index=False, border=1, na_rep="–")
 
 
-def adequa_dataset(df_ajustado: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+def gera_secao_diferencas_html(diferencas: Dict[str, pd.DataFrame], max_linhas: int = 100) -> Iterator[str]:
     """
-    Esta função adequa um conjunto de dados em Excel para o formato com colunas simples (colunas sem mescla) e extrai os nomes dos elementos estruturais informados.
+    Gera a seção do relatório com a comparação com a inspeção anterior (ver compara_inspecoes): G_d, G_df por família e as maiores alterações por elemento e por dano.
 
-    :param path_excel: Caminho dos dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas com multi-index (colunas mescladas).
+    :param diferencas: Tabelas de compara_inspecoes.
+    :param max_linhas: Número máximo de linhas exibidas nas tabelas de elementos e de danos.
 
-    :return: A saída contém três variáveis, são elas: (a) df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples. (b) nome_elementos: Nomes dos elementos estruturais. (c) nome_familia: Nome da familia de elementos.
+    :return: Iterador de pedaços (str) do HTML da seção.
     """
-    elementos_brutos = df_ajustado.columns.get_level_values(0)
-    nome_elementos = sorted(set(e for e in elementos_brutos if e != 'Danos'))
+    yield "<hr><h2>Comparação com a inspeção anterior</h2>"
+    for tabela, titulo in (('estrutura', "Estrutura"), ('familias', "Famílias"), ('elementos', "Elementos alterados"), ('danos', "Danos alterados")):
+        diferenca = diferencas[tabela]
+        yield f"<h3>{titulo}</h3>"
+        if diferenca.empty:
+            yield "<p>Sem alterações.</p>"
+            continue
+        if len(diferenca) > max_linhas:
+            yield f"<p>{max_linhas} de {len(diferenca)} linhas, da maior para a menor variação.</p>"
+        yield diferenca.head(max_linhas).to_html(index=False, border=1, na_rep="–", float_format="{:.2f}".format)
 
-    df_ajustado.columns = [
-        f"{sub} - {main}" if main != 'Danos' else 'Danos'
-        for main, sub in df_ajustado.columns
-    ]
 
-    return df_ajustado, nome_elementos
+def gera_relatorio_html(resultados_familias: Dict[str, Dict[str, float]], g_d: float, nivel: str, recomendacao: str, tabelas_originais: Dict[str, pd.DataFrame], imagens_por_familia: Dict[str, list], nomes_arquivos: List[str], fr_lista: List[int], fr_descricao: Dict[int, str], elementos_por_familia: Dict[str, List[str]], diagnostico: Optional[Diagnostico] = None, registro_fotos: Optional[RegistroFotos] = None, diferencas: Optional[Dict[str, pd.DataFrame]] = None) -> Iterator[str]:
+    """
+    Gera o relatório consolidado em HTML em pedaços (cabeçalho, tabelas e galerias de cada família e resumo), sem montar o documento inteiro na memória. As imagens são codificadas em base64 uma a uma, no momento em que são escritas.
 
+    Os parâmetros são os mesmos de gerar_relatorio_html. Em imagens_por_familia, a imagem de cada tupla pode ser a string base64, os bytes da imagem ou uma função que retorna os bytes (ver base64_em_partes). Uma tupla pode ter um terceiro elemento com o link (caminho relativo ou URL) para a foto original, exibido na legenda.
 
-def avalia_elemento(df_ajustado: pd.DataFrame) -> Dict[str, Dict[str, float]]:
-    """
-    Esta função avalia os elementos estruturais com base nos dados de Fi e Fp informados gerando o somatório dos danos, dano máximo e grau de deterioração do elemento.
+    Fotos com conteúdo idêntico, na mesma família ou em famílias diferentes, são embutidas uma única vez (ver RegistroFotos).
 
-    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+    :param diagnostico: Diagnóstico de desempenho opcional; se informado, suas etapas são incluídas em um apêndice do relatório.
+    :param registro_fotos: Registro de fotos opcional, para consultar as estatísticas de deduplicação após a geração.
+    :param diferencas: Comparação opcional com a inspeção anterior (ver compara_inspecoes), incluída após o resumo.
 
-    :return: A saída contém uma única variável dicionário que detalha os resultados para cada elemento. O dicionário possui as seguintes chaves: (a) 'sum_d': Soma total dos valores d. (b) 'd_max': Valor máximo de dano encontrado. (c) 'g_de' : Grau de deterioração do elemento (G_de).
+    :return: Iterador de pedaços (str) do documento HTML.
     """
-    resultados = {}
-    colunas = [col for col in df_ajustado.columns if col != "Danos"]
-    elementos = sorted(set(col.split(" - ")[1] for col in colunas))
+    registro_fotos = RegistroFotos() if registro_fotos is None else registro_fotos
+    yield CABECALHO_HTML
 
-    for elemento in elementos:
-        registros = []
+    for i, (nome, dados) in enumerate(resultados_familias.items()):
+        galeria = gera_galeria_html(imagens_por_familia.get(nome, []), registro_fotos=registro_fotos)
+        yield from gera_secao_familia_html(i, nome, dados, tabelas_originais.get(nome), galeria, fr_descricao)
 
-        for _, row in df_ajustado.iterrows():
-            dano = str(row["Danos"]).strip()
-            if dano.lower() in ["danos", ""] or pd.isna(dano):
-                continue
+    yield from gera_resumo_html(resultados_familias, g_d, nivel, recomendacao, nomes_arquivos, diagnostico, diferencas)
+    yield "</body></html>"
 
-            try:
-                fi = float(row[f"Fi - {elemento}"])
-                fp = float(row[f"Fp - {elemento}"])
-            except (KeyError, ValueError, TypeError):
-                fi, fp = 0, 0
-
-            if fi <= 2.0:
-                d = 0.8 * fi * fp
-            elif fi >= 3.0:
-                d = (12 * fi - 28) * fp
-            else:
-                d = 0
 
-            registros.append(d)
+def escreve_relatorio_html(destino: str | Path | IO, resultados_familias: Dict[str, Dict[str, float]], g_d: float, nivel: str, recomendacao: str, tabelas_originais: Dict[str, pd.DataFrame], imagens_por_familia: Dict[str, list], nomes_arquivos: List[str], fr_lista: List[int], fr_descricao: Dict[int, str], elementos_por_familia: Dict[str, List[str]], diagnostico: Optional[Diagnostico] = None, registro_fotos: Optional[RegistroFotos] = None, diferencas: Optional[Dict[str, pd.DataFrame]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Escreve o relatório consolidado em HTML diretamente em um arquivo, pedaço a pedaço (ver gera_relatorio_html). O uso de memória não cresce com o número de fotos.
 
-        sum_d = sum(registros)
-        d_max = max(registros) if registros else 0
-        g_de = d_max * (1 + ((sum_d - d_max) / sum_d)) if sum_d else 0
+    :param destino: Caminho do arquivo de saída ou objeto de arquivo aberto em modo texto ou binário (UTF-8).
+    :param diagnostico: Diagnóstico de desempenho opcional, incluído em um apêndice do relatório.
+    :param registro_fotos: Registro de fotos opcional, para consultar as estatísticas de deduplicação (ver RegistroFotos).
+    :param diferencas: Comparação opcional com a inspeção anterior (ver compara_inspecoes).
 
-        resultados[elemento] = {
-            'sum_d': sum_d,
-            'd_max': d_max,
-            'g_de': g_de
-        }
+    Os demais parâmetros são os mesmos de gerar_relatorio_html.
 
-    return resultados
+    :return: Uma tupla com dois elementos: (a) df_resumo_familias_streamlit: DataFrame com o resumo das famílias formatado para Streamlit, (b) df_estrutura_streamlit: DataFrame com os dados gerais da estrutura formatado para exibição no Streamlit.
+    """
+    partes = gera_relatorio_html(resultados_familias, g_d, nivel, recomendacao, tabelas_originais, imagens_por_familia, nomes_arquivos, fr_lista, fr_descricao, elementos_por_familia, diagnostico, registro_fotos, diferencas)
+    escreve_partes_html(destino, partes)
 
+    return tabelas_resumo(resultados_familias, g_d, nivel, recomendacao, nomes_arquivos)
 
-def avalia_familia(df_ajustado: pd.DataFrame, nome_arquivo: str, f_r: float) -> Dict[str, Dict[str, float]]:
+
+def escreve_partes_html(destino: str | Path | IO, partes: Iterable[str]) -> int:
     """
-    Avalia a família de elementos estruturais com base nos resultados dos elementos. 
+    Escreve os pedaços de um documento HTML em um arquivo, à medida que são gerados.
 
-    :param df_ajustado: DataFrame com os dados ajustados.
-    :param nome_arquivo: Nome do arquivo (sem caminho e sem extensão).
-    :param f_r: Fator de redução.
+    :param destino: Caminho do arquivo de saída ou objeto de arquivo aberto em modo texto ou binário (UTF-8).
+    :param partes: Pedaços (str) do documento.
 
-    :return: Un dicionário com os resultados da avaliação da família. O dicionário contém as seguintes chaves: (a) 'gde_max': Valor máximo de g_de encontrado. 
-    (b) 'g_df': Grau de deterioração da família. (c) 'f_r': Fator de redução. (d) 'f_r × g_df': Produto do fator de redução pelo grau de deterioração da família. 
-    (e) 'resultados_elemento': Dicionário com os resultados por elemento.
+    :return: Número de bytes (ou caracteres, em modo texto) escritos.
     """
-    resultados_elemento = avalia_elemento(df_ajustado)
-    gde_list = [dados['g_de'] for dados in resultados_elemento.values() if dados['g_de'] > 0]
+    with etapa("escreve_relatorio_html") as registro:
+        if isinstance(destino, (str, Path)):
+            with open(destino, "wb") as arquivo:
+                registro['bytes'] = sum(arquivo.write(parte.encode("utf-8")) for parte in partes)
+        elif isinstance(destino, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(destino, "mode", ""):
+            registro['bytes'] = sum(destino.write(parte.encode("utf-8")) for parte in partes)
+        else:
+            registro['bytes'] = sum(destino.write(parte) for parte in partes)
+    return registro['bytes']
 
-    if not gde_list:
-        return {
-            nome_arquivo: {
-                'gde_max': 0.0,
-                'g_df': 0.0,
-                'f_r': f_r,
-                'f_r × g_df': 0.0,
-                'resultados_elemento': resultados_elemento  # ainda útil se quiser ver 0s
-            }
-        }
 
-    gde_max = max(gde_list)
-    gde_sum = sum(gde_list)
+def caminho_imagem_relatorio(i: int, j: int, nome_img: str) -> str:
+    """
+    Caminho relativo da imagem j da família i no relatório em arquivo (ver escreve_relatorio_arquivo). O nome leva a posição da imagem, pois fotos de subpastas diferentes do .zip da família podem ter o mesmo nome.
 
-    g_df = gde_max * np.sqrt(1 + (gde_sum - gde_max) / gde_sum) if gde_sum else 0
-    fr_gdf = f_r * g_df
+    :param i: Posição da família (a partir de 0).
+    :param j: Posição da imagem na família (a partir de 0).
+    :param nome_img: Nome da imagem.
 
-    return {
-        nome_arquivo: {
-            'gde_max': gde_max,
-            'g_df': float(g_df),
-            'f_r': f_r,
-            'f_r × g_df': float(fr_gdf),
-            'resultados_elemento': resultados_elemento  # <-- resultado por peça
-        }
-    }
+    :return: Caminho relativo da imagem.
+    """
+    return f"imagens/familia_{i+1}/{j+1:03d}_{Path(nome_img).name}"
 
 
-def avaliar_estrutura(resultados_familias: Dict[str, Dict[str, float]]) -> Tuple[float, str]:
+def escreve_relatorio_arquivo(destino: str | Path | IO[bytes], resultados_familias: Dict[str, Dict[str, float]], g_d: float, nivel: str, recomendacao: str, tabelas_originais: Dict[str, pd.DataFrame], imagens_por_familia: Dict[str, list], nomes_arquivos: List[str], fr_lista: List[int], fr_descricao: Dict[int, str], elementos_por_familia: Dict[str, List[str]], diagnostico: Optional[Diagnostico] = None, originais_por_familia: Optional[Dict[str, List[tuple]]] = None, registro_fotos: Optional[RegistroFotos] = None, diferencas: Optional[Dict[str, pd.DataFrame]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Escreve o relatório consolidado como um arquivo .zip (ou diretório) com index.html, uma página HTML por família e as imagens em arquivos separados, referenciadas por caminho relativo e carregadas sob demanda (loading="lazy"). As imagens são gravadas diretamente a partir dos bytes (ou da leitura sob demanda das entradas do .zip enviado), sem conversão para base64, e a página inicial tem tamanho independente do número de fotos.
+
+    :param destino: Caminho do arquivo .zip, caminho de um diretório (qualquer caminho sem a extensão .zip) ou objeto de arquivo aberto em modo binário (gravado como .zip).
+    :param diagnostico: Diagnóstico de desempenho opcional, incluído em um apêndice de index.html.
+    :param originais_por_familia: Fotos originais opcionais por família (ver escreve_fotos_originais), gravadas no mesmo arquivo nos caminhos dados por caminho_foto_original.
+    :param registro_fotos: Registro de fotos opcional (ver RegistroFotos). Fotos com conteúdo idêntico são gravadas uma única vez e todas as galerias apontam para o mesmo arquivo.
+    :param diferencas: Comparação opcional com a inspeção anterior (ver compara_inspecoes), incluída em index.html.
+
+    Os demais parâmetros são os mesmos de gerar_relatorio_html.
+
+    :return: Uma tupla com dois elementos: (a) df_resumo_familias_streamlit: DataFrame com o resumo das famílias formatado para Streamlit, (b) df_estrutura_streamlit: DataFrame com os dados gerais da estrutura formatado para exibição no Streamlit.
+    """
+    em_diretorio = isinstance(destino, (str, Path)) and Path(destino).suffix.lower() != ".zip"
+
+    with etapa("escreve_relatorio_arquivo") as registro, (nullcontext() if em_diretorio else zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_STORED)) as zip_saida:
+        def grava(caminho: str, dados: bytes) -> None:
+            if em_diretorio:
+                saida = Path(destino, caminho)
+                saida.parent.mkdir(parents=True, exist_ok=True)
+                saida.write_bytes(dados)
+            else:
+                zip_saida.writestr(caminho, dados)
+            registro['bytes'] += len(dados)
+
+        def grava_html(caminho: str, partes: Iterator[str]) -> None:
+            if em_diretorio:
+                Path(destino).mkdir(parents=True, exist_ok=True)
+                arquivo = open(Path(destino, caminho), "wb")
+            else:
+                info = zipfile.ZipInfo(caminho, time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED  # só as páginas são comprimidas; as imagens já são JPEG/PNG
+                arquivo = zip_saida.open(info, "w")
+            with arquivo:
+                registro['bytes'] += sum(arquivo.write(parte.encode("utf-8")) for parte in partes)
+
+        registro['bytes'] = 0
+        registro_fotos = RegistroFotos() if registro_fotos is None else registro_fotos
+        links = []
+        for i, (nome, dados) in enumerate(resultados_familias.items()):
+            imagens = imagens_por_familia.get(nome, [])
+            caminhos = []
+            for j, (nome_img, imagem, *_) in enumerate(imagens):
+                imagem = imagem() if callable(imagem) else imagem
+                if isinstance(imagem, str):
+                    imagem = base64.b64decode(imagem)
+                caminho, nova = registro_fotos.registra(imagem, caminho_imagem_relatorio(i, j, nome_img))
+                if nova:
+                    grava(caminho, imagem)
+                caminhos.append(caminho)
+
+            pagina = f"familia_{i+1}.html"
+            galeria = gera_galeria_html(imagens, caminhos)
+            grava_html(pagina, (CABECALHO_HTML, "<p><a href='index.html'>&larr; Voltar ao resumo</a></p>", *gera_secao_familia_html(i, nome, dados, tabelas_originais.get(nome), galeria, fr_descricao), "</body></html>"))
+            links.append(f"<li><a href='{pagina}'>Família {i+1} - {nome}</a> ({len(imagens)} imagens)</li>")
+
+        for nome_familia, fotos in (originais_por_familia or {}).items():
+            for j, (nome_img, imagem, *_) in enumerate(fotos):
+                grava(caminho_foto_original(nome_familia, j, nome_img), imagem() if callable(imagem) else imagem)
+
+        indice = (CABECALHO_HTML, "<h2>Famílias</h2><ul>", *links, "</ul>", *gera_resumo_html(resultados_familias, g_d, nivel, recomendacao, nomes_arquivos, diagnostico, diferencas), "</body></html>")
+        grava_html("index.html", iter(indice))
+
+    return tabelas_resumo(resultados_familias, g_d, nivel, recomendacao, nomes_arquivos)
+
+
+def gerar_relatorio_html(resultados_familias: Dict[str, Dict[str, float]], g_d: float, nivel: str, recomendacao: str, tabelas_originais: Dict[str, pd.DataFrame], imagens_por_familia: Dict[str, list], nomes_arquivos: List[str], fr_lista: List[int], fr_descricao: Dict[int, str], elementos_por_familia: Dict[str, List[str]]) -> Tuple[str, pd.DataFrame, pd.DataFrame]:
+    """
+    Gera o relatório consolidado em formato HTML e dois DataFrames com os resultados da inspeção.
+
+    Esta função monta um relatório em HTML com as tabelas originais, imagens, cálculos dos índices G_de e G_df, além de um resumo consolidado por família e pela estrutura como um todo. Também retorna dois DataFrames auxiliares para exibição no Streamlit. Para relatórios grandes, prefira escreve_relatorio_html, que grava o documento em partes.
+
+    :param resultados_familias: Dicionário com os resultados numéricos de cada família (valores de F_r, G_df, F_r × G_df e resultados por elemento).
+    :param g_d: Grau de Deterioração da Estrutura calculado.
+    :param nivel: Nível qualitativo de deterioração da estrutura (ex: "Baixo", "Alto", etc.).
+    :param recomendacao: Texto com a recomendação de ação baseada no nível de deterioração.
+    :param tabelas_originais: Dicionário com os DataFrames originais das planilhas de inspeção por família.
+    :param imagens_por_familia: Dicionário com listas de tuplas (nome_da_imagem, imagem_em_base64) por família.
+    :param nomes_arquivos: Lista com os nomes dos arquivos submetidos por família.
+    :param fr_lista: Lista dos fatores de importância F_r utilizados por família.
+    :param fr_descricao: Dicionário com a descrição textual de cada fator F_r.
+    :param elementos_por_familia: Dicionário com os nomes dos elementos estruturais presentes em cada família.
+
+    :return: Uma tupla com três elementos: (a) html: string com o relatório completo em HTML, (b) df_resumo_familias_streamlit: DataFrame com o resumo das famílias formatado para Streamlit, 
+    (c) df_estrutura_streamlit: DataFrame com os dados gerais da estrutura formatado para exibição no Streamlit.
+    """
+    html = "".join(gera_relatorio_html(resultados_familias, g_d, nivel, recomendacao, tabelas_originais, imagens_por_familia, nomes_arquivos, fr_lista, fr_descricao, elementos_por_familia))
+    df_resumo_familias_streamlit, df_estrutura_streamlit = tabelas_resumo(resultados_familias, g_d, nivel, recomendacao, nomes_arquivos)
+
+    return html, df_resumo_familias_streamlit, df_estrutura_streamlit
+
+
+def adequa_dataset(df_ajustado: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Esta função adequa um conjunto de dados em Excel para o formato com colunas simples (colunas sem mescla) e extrai os nomes dos elementos estruturais informados.
+
+    :param path_excel: Caminho dos dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas com multi-index (colunas mescladas).
+
+    :return: A saída contém três variáveis, são elas: (a) df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples. (b) nome_elementos: Nomes dos elementos estruturais. (c) nome_familia: Nome da familia de elementos.
+    """
+    elementos_brutos = df_ajustado.columns.get_level_values(0)
+    nome_elementos = sorted(set(e for e in elementos_brutos if e != 'Danos'))
+
+    df_ajustado.columns = [
+        f"{sub} - {main}" if main != 'Danos' else 'Danos'
+        for main, sub in df_ajustado.columns
+    ]
+
+    return df_ajustado, nome_elementos
+
+
+# Tipos de problema apontados por valida_dataset.
+PROBLEMAS_PLANILHA = {
+    'sem_coluna_danos': "A planilha não tem a coluna Danos; todas as linhas foram avaliadas.",
+    'coluna_invalida': "Coluna fora do padrão Fi/Fp por elemento; ignorada.",
+    'coluna_duplicada': "Coluna repetida; apenas a primeira ocorrência é usada.",
+    'coluna_ausente': "O elemento não tem a coluna Fi ou Fp correspondente; os danos do elemento foram zerados.",
+    'nao_numerico': "Valor não numérico; o par (Fi, Fp) da célula foi zerado.",
+    'par_incompleto': "Apenas um dos fatores (Fi ou Fp) foi preenchido; o par foi zerado.",
+    'fora_do_intervalo': "Nota fora do intervalo (Fi de 0 a 4, Fp de 0 a 5); o dano é calculado pela fórmula.",
+}
+
+
+def _coluna_danos(df_ajustado: pd.DataFrame) -> Optional[pd.Series]:
+    if "Danos" not in df_ajustado.columns:
+        return None
+    danos = df_ajustado["Danos"]
+    return danos.iloc[:, 0] if danos.ndim > 1 else danos
+
+
+def _linhas_danos(df_ajustado: pd.DataFrame) -> Optional[np.ndarray]:
+    """
+    Máscara das linhas avaliadas: campo Danos preenchido e diferente do cabeçalho "Danos". None se a planilha não tiver a coluna Danos.
+    """
+    danos = _coluna_danos(df_ajustado)
+    if danos is None:
+        return None
+    return ~danos.astype(str).str.strip().str.lower().isin(("danos", "")).to_numpy()
+
+
+def rotulos_danos(df_ajustado: pd.DataFrame) -> List[str]:
+    """
+    Nomes dos danos das linhas das matrizes Fi e Fp (ver extrai_matrizes_fi_fp), na mesma ordem. Sem a coluna Danos, as linhas são identificadas pela posição ("Linha 1", "Linha 2", ...).
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: Lista com o nome de cada dano.
+    """
+    linhas_validas = _linhas_danos(df_ajustado)
+    if linhas_validas is None:
+        return [f"Linha {i + 1}" for i in range(len(df_ajustado))]
+    return _coluna_danos(df_ajustado).astype(str).str.strip().to_numpy()[linhas_validas].tolist()
+
+
+# Células (danos × elementos) convertidas por vez na extração e na redução dos códigos: limita os
+# temporários float64/intp a alguns MiB, independentemente do tamanho da planilha.
+TAMANHO_BLOCO_CELULAS = 256 * 1024
+
+
+def _valida_matrizes(df_ajustado: pd.DataFrame, codificar: bool = False) -> Tuple[List[str], np.ndarray, np.ndarray, List[Dict[str, object]]]:
+    """
+    Núcleo de valida_dataset: converte as colunas Fi e Fp em blocos de elementos, reúne os problemas encontrados em blocos de arrays (um dicionário de colunas por verificação), sem montar o DataFrame, e devolve as matrizes Fi e Fp já limpas ou, com codificar=True, a matriz de códigos int8 e os danos fora do domínio (ver codifica_fi_fp) sem montar as matrizes float64 completas.
+    """
+    colunas = [col for col in df_ajustado.columns if col != "Danos"]
+    blocos = []
+
+    def registra(tipo: str, linhas: np.ndarray, colunas_problema: List[str], valores: np.ndarray) -> None:
+        if len(linhas):
+            blocos.append({'linha': linhas, 'coluna': colunas_problema, 'tipo': tipo, 'valor': valores})
+
+    def registra_cabecalho(tipo: str, colunas_problema: List[str]) -> None:
+        registra(tipo, np.full(len(colunas_problema), -1), colunas_problema, np.full(len(colunas_problema), "", dtype=object))
+
+    por_prefixo = {"Fi": set(), "Fp": set()}
+    invalidas = []
+    for col in colunas:
+        prefixo, separador, elemento = str(col).partition(" - ")
+        if separador and prefixo in por_prefixo and elemento:
+            por_prefixo[prefixo].add(elemento)
+        else:
+            invalidas.append(str(col))
+    elementos = sorted(por_prefixo["Fi"] | por_prefixo["Fp"])
+    registra_cabecalho('coluna_invalida', invalidas)
+    registra_cabecalho('coluna_duplicada', [str(col) for col in df_ajustado.columns[df_ajustado.columns.duplicated()].unique()])
+    registra_cabecalho('coluna_ausente', [
+        f"{prefixo} - {elemento}" for elemento in elementos for prefixo in ("Fi", "Fp") if elemento not in por_prefixo[prefixo]
+    ])
+
+    linhas_validas = _linhas_danos(df_ajustado)
+    if linhas_validas is None:
+        registra_cabecalho('sem_coluna_danos', ["Danos"])
+        linhas_validas = np.ones(len(df_ajustado), dtype=bool)
+    posicoes = np.flatnonzero(linhas_validas)
+    todas_validas = len(posicoes) == len(df_ajustado)
+
+    if df_ajustado.columns.has_duplicates:
+        df_ajustado = df_ajustado.loc[:, ~df_ajustado.columns.duplicated()]
+
+    forma = (len(posicoes), len(elementos))
+    if codificar:
+        codigos = np.empty(forma, dtype=np.int8)
+        linhas_fora, colunas_fora, danos_fora = [], [], []
+    else:
+        fi_total = np.empty(forma, dtype=np.float64)
+        fp_total = np.empty(forma, dtype=np.float64)
+    presentes = np.array([elemento in por_prefixo["Fi"] and elemento in por_prefixo["Fp"] for elemento in elementos], dtype=bool)
+
+    passo = max(1, TAMANHO_BLOCO_CELULAS // max(len(posicoes), 1))
+    for inicio in range(0, len(elementos), passo):
+        fatia = slice(inicio, inicio + passo)
+        matrizes = []
+        ausentes = []
+        for prefixo, maximo in (("Fi", FI_MAX), ("Fp", FP_MAX)):
+            nomes = [f"{prefixo} - {elemento}" for elemento in elementos[fatia]]
+            # Colunas ausentes viram NaN (e depois zero); colunas numéricas são convertidas em bloco
+            bloco = df_ajustado.reindex(columns=nomes)
+            if all(tipo.kind in "biuf" for tipo in bloco.dtypes):
+                matriz = bloco.to_numpy(dtype=np.float64, copy=True) if todas_validas else bloco.to_numpy(dtype=np.float64)[linhas_validas]
+                vazio = np.isnan(matriz)
+            else:
+                brutos = bloco.to_numpy(dtype=object)[linhas_validas]
+                matriz = bloco.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)[linhas_validas]
+                vazio = np.isnan(matriz)
+                # Só as células preenchidas que não viraram número são inspecionadas (texto em branco conta como vazio)
+                linha, coluna = np.nonzero(vazio & ~pd.isna(brutos))
+                preenchidas = np.fromiter((str(valor).strip() != "" for valor in brutos[linha, coluna]), dtype=bool, count=len(linha))
+                linha, coluna = linha[preenchidas], coluna[preenchidas]
+                vazio[linha, coluna] = False
+                registra('nao_numerico', posicoes[linha], [nomes[j] for j in coluna], brutos[linha, coluna])
+            with np.errstate(invalid="ignore"):
+                linha, coluna = np.nonzero((matriz < 0) | (matriz > maximo))
+            registra('fora_do_intervalo', posicoes[linha], [nomes[j] for j in coluna], matriz[linha, coluna].astype(object))
+            matrizes.append(matriz)
+            ausentes.append(vazio)
+        fi, fp = matrizes
+
+        # Par incompleto: um fator numérico e o outro vazio, com as duas colunas presentes na planilha
+        for (vazio, outro), prefixo in (((ausentes[0], fp), "Fi"), ((ausentes[1], fi), "Fp")):
+            linha, coluna = np.nonzero(vazio & np.isfinite(outro) & presentes[fatia])
+            registra('par_incompleto', posicoes[linha], [f"{prefixo} - {elementos[inicio + j]}" for j in coluna], np.full(len(linha), "", dtype=object))
+
+        invalidos = ~(np.isfinite(fi) & np.isfinite(fp))
+        fi[invalidos] = 0.0
+        fp[invalidos] = 0.0
+
+        if codificar:
+            codigos[:, fatia], d_fora = codifica_fi_fp(fi, fp)
+            if len(d_fora):
+                linha, coluna = np.nonzero(codigos[:, fatia] < 0)
+                linhas_fora.append(linha)
+                colunas_fora.append(coluna + inicio)
+                danos_fora.append(d_fora)
+        else:
+            fi_total[:, fatia] = fi
+            fp_total[:, fatia] = fp
+
+    if not codificar:
+        return elementos, fi_total, fp_total, blocos
+    if not danos_fora:
+        return elementos, codigos, np.zeros(0, dtype=np.float64), blocos
+    # d_fora segue a ordem das células na matriz completa (linha a linha), como em codifica_fi_fp
+    ordem = np.lexsort((np.concatenate(colunas_fora), np.concatenate(linhas_fora)))
+    return elementos, codigos, np.concatenate(danos_fora)[ordem], blocos
+
+
+def valida_dataset(df_ajustado: pd.DataFrame) -> Tuple[List[str], np.ndarray, np.ndarray, pd.DataFrame]:
+    """
+    Valida os dados ajustados de uma só vez, coluna a coluna: estrutura do cabeçalho (coluna Danos, colunas Fi/Fp por elemento, colunas repetidas ou sem par), valores não numéricos, pares (Fi, Fp) incompletos e notas fora do intervalo. Devolve também as matrizes Fi e Fp já limpas, prontas para a avaliação (ver extrai_matrizes_fi_fp).
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: Uma tupla com quatro elementos: (a) elementos: Nomes dos elementos em ordem alfabética, (b) fi: Matriz float64 com os fatores de intensidade, (c) fp: Matriz float64 com os fatores de ponderação, (d) problemas: DataFrame com uma linha por problema e as colunas 'linha' (posição da linha em df_ajustado, a partir de 0, ou −1 para problemas do cabeçalho; na planilha modelo corresponde à linha linha + 3 do Excel), 'coluna', 'tipo' (chave de PROBLEMAS_PLANILHA) e 'valor' (conteúdo da célula).
+    """
+    return _monta_problemas(*_valida_matrizes(df_ajustado))
+
+
+def _monta_problemas(elementos: List[str], primeira: np.ndarray, segunda: np.ndarray, blocos: List[Dict[str, object]]) -> Tuple[List[str], np.ndarray, np.ndarray, pd.DataFrame]:
+    problemas = pd.DataFrame({
+        'linha': np.concatenate([bloco['linha'] for bloco in blocos]).astype(np.int64) if blocos else np.zeros(0, dtype=np.int64),
+        'coluna': [coluna for bloco in blocos for coluna in bloco['coluna']],
+        'tipo': np.concatenate([np.full(len(bloco['linha']), bloco['tipo'], dtype=object) for bloco in blocos]) if blocos else np.zeros(0, dtype=object),
+        'valor': np.concatenate([bloco['valor'] for bloco in blocos]) if blocos else np.zeros(0, dtype=object),
+    })
+    return elementos, primeira, segunda, problemas.sort_values(['linha', 'coluna'], kind="stable", ignore_index=True)
+
+
+def valida_dataset_codigos(df_ajustado: pd.DataFrame) -> Tuple[List[str], np.ndarray, np.ndarray, pd.DataFrame]:
+    """
+    Mesma validação de valida_dataset, devolvendo a matriz compacta de códigos no lugar das matrizes Fi e Fp (ver extrai_codigos_fi_fp).
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: Uma tupla com quatro elementos: (a) elementos: Nomes dos elementos em ordem alfabética, (b) codigos: Matriz int8 de códigos (danos × elementos), (c) d_fora: Danos das células fora do domínio das notas, (d) problemas: DataFrame de problemas, como em valida_dataset.
+    """
+    return _monta_problemas(*_valida_matrizes(df_ajustado, codificar=True))
+
+
+def extrai_matrizes_fi_fp(df_ajustado: pd.DataFrame) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Converte as colunas Fi e Fp dos dados ajustados em duas matrizes numéricas (danos × elementos). Linhas cujo campo Danos está vazio ou repete o cabeçalho "Danos" são descartadas. Células ausentes ou não numéricas, em Fi ou em Fp, zeram o par (Fi, Fp) correspondente. Mesma limpeza de valida_dataset, sem a montagem da lista de problemas.
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: Uma tupla com três elementos: (a) elementos: Nomes dos elementos em ordem alfabética (ordem das colunas das matrizes), (b) fi: Matriz float64 com os fatores de intensidade, (c) fp: Matriz float64 com os fatores de ponderação.
+    """
+    return _valida_matrizes(df_ajustado)[:3]
+
+
+def calcula_dano(fi: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    Calcula o dano d de cada célula a partir dos fatores Fi e Fp: d = 0.8 · Fi · Fp quando Fi ≤ 2, d = (12 · Fi − 28) · Fp quando Fi ≥ 3 e d = 0 nos demais casos.
+
+    :param fi: Matriz (ou vetor) com os fatores de intensidade.
+    :param fp: Matriz (ou vetor) com os fatores de ponderação, de mesmo formato de fi.
+
+    :return: Matriz de danos d com o mesmo formato das entradas.
+    """
+    fi = np.asarray(fi, dtype=np.float64)
+    fp = np.asarray(fp, dtype=np.float64)
+    return np.where(fi <= 2.0, 0.8 * fi * fp, np.where(fi >= 3.0, (12.0 * fi - 28.0) * fp, 0.0))
+
+
+# Domínio discreto das notas: Fi de 0 a 4 e Fp de 0 a 5 (0 indica célula sem dano).
+FI_MAX = 4
+FP_MAX = 5
+
+
+@lru_cache(maxsize=None)
+def tabela_dano() -> np.ndarray:
+    """
+    Dano d de cada par (Fi, Fp) do domínio, indexado pelo código Fi · (FP_MAX + 1) + Fp (ver codifica_fi_fp). Calculada no primeiro uso e disponível também como gde_unb.TABELA_DANO.
+
+    :return: Vetor float64 com (FI_MAX + 1) · (FP_MAX + 1) danos.
+    """
+    return calcula_dano(*np.meshgrid(np.arange(FI_MAX + 1.0), np.arange(FP_MAX + 1.0), indexing="ij")).ravel()
+
+
+def __getattr__(nome: str) -> object:
+    # TABELA_DANO é calculada sob demanda para que a importação do módulo não carregue o NumPy
+    if nome == "TABELA_DANO":
+        return tabela_dano()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+def codifica_fi_fp(fi: np.ndarray, fp: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte as matrizes Fi e Fp em uma matriz de códigos int8 da TABELA_DANO (código = Fi · (FP_MAX + 1) + Fp). Células fora do domínio discreto (notas fracionárias, negativas ou acima de FI_MAX/FP_MAX) recebem o código −1 e têm o dano calculado à parte pela fórmula (calcula_dano).
+
+    :param fi: Matriz com os fatores de intensidade.
+    :param fp: Matriz com os fatores de ponderação, de mesmo formato de fi.
+
+    :return: Uma tupla com dois elementos: (a) codigos: Matriz int8 de códigos, (b) d_fora: Danos das células com código −1, na ordem em que aparecem em codigos (vazio se todas as notas estiverem no domínio).
+    """
+    fi = np.asarray(fi, dtype=np.float64)
+    fp = np.asarray(fp, dtype=np.float64)
+    # A conversão para int8 trunca as notas; NaN, infinitos e valores fora do int8 viram lixo, descartado pela comparação com o original
+    with np.errstate(invalid="ignore"):
+        fi_int = fi.astype(np.int8)
+        fp_int = fp.astype(np.int8)
+    na_grade = (fi_int == fi) & (fp_int == fp) & (fi_int >= 0) & (fi_int <= FI_MAX) & (fp_int >= 0) & (fp_int <= FP_MAX)
+    codigos = fi_int
+    codigos *= FP_MAX + 1
+    codigos += fp_int
+    fora = ~na_grade
+    codigos[fora] = -1
+    return codigos, calcula_dano(fi[fora], fp[fora])
+
+
+def calcula_dano_codigos(codigos: np.ndarray, d_fora: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calcula o dano d de cada célula a partir dos códigos de codifica_fi_fp, por consulta à TABELA_DANO.
+
+    :param codigos: Matriz int8 de códigos.
+    :param d_fora: Danos das células com código −1 (ver codifica_fi_fp).
+
+    :return: Matriz de danos d com o mesmo formato de codigos.
+    """
+    d = tabela_dano().take(codigos)
+    fora = codigos < 0
+    if d_fora is not None and len(d_fora):
+        d[fora] = d_fora
+    elif fora.any():
+        raise ValueError("Há células fora do domínio das notas Fi/Fp sem os danos calculados (d_fora)")
+    return d
+
+
+def avalia_elementos_lote(fi: np.ndarray, fp: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Avalia todos os elementos de uma vez a partir das matrizes Fi e Fp (danos × elementos). As notas são convertidas em códigos (ver codifica_fi_fp) e avaliadas por avalia_elementos_codigos.
+
+    :param fi: Matriz com os fatores de intensidade.
+    :param fp: Matriz com os fatores de ponderação.
+
+    :return: Uma tupla com três vetores por elemento: (a) sum_d: Soma dos danos, (b) d_max: Dano máximo, (c) g_de: Grau de deterioração do elemento.
+    """
+    return avalia_elementos_codigos(*codifica_fi_fp(fi, fp))
+
+
+def avalia_elementos_codigos(codigos: np.ndarray, d_fora: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Avalia todos os elementos de uma vez a partir da matriz de códigos (danos × elementos) de codifica_fi_fp, sem montar a matriz de danos: conta as ocorrências de cada código por elemento (np.bincount, em blocos de TAMANHO_BLOCO_CELULAS células) e obtém sum_d e d_max da TABELA_DANO; as células fora do domínio entram com os danos de d_fora.
+
+    :param codigos: Matriz int8 de códigos.
+    :param d_fora: Danos das células fora do domínio das notas (ver codifica_fi_fp).
+
+    :return: Uma tupla com três vetores por elemento: (a) sum_d: Soma dos danos, (b) d_max: Dano máximo, (c) g_de: Grau de deterioração do elemento.
+    """
+    n_linhas, n_elementos = codigos.shape
+    if n_linhas == 0:
+        zeros = np.zeros(n_elementos, dtype=np.float64)
+        return zeros, zeros.copy(), zeros.copy()
+
+    # Quantas vezes cada código aparece em cada elemento; o código −1 vai para a última posição e é tratado à parte
+    tabela = tabela_dano()
+    n_codigos = len(tabela) + 1
+    contagens = np.empty((n_elementos, n_codigos), dtype=np.int64)
+    passo = max(1, TAMANHO_BLOCO_CELULAS // n_linhas)
+    for inicio in range(0, n_elementos, passo):
+        bloco = codigos[:, inicio:inicio + passo]
+        indices = bloco.astype(np.intp)
+        indices[bloco < 0] = n_codigos - 1
+        indices += np.arange(bloco.shape[1]) * n_codigos
+        contagens[inicio:inicio + bloco.shape[1]] = np.bincount(indices.ravel(), minlength=bloco.size and bloco.shape[1] * n_codigos).reshape(-1, n_codigos)
+
+    sum_d = contagens[:, :-1] @ tabela
+    d_max = np.where(contagens[:, :-1] > 0, tabela, -np.inf).max(axis=1)
+    if contagens[:, -1].any():
+        if d_fora is None or not len(d_fora):
+            raise ValueError("Há células fora do domínio das notas Fi/Fp sem os danos calculados (d_fora)")
+        coluna = np.nonzero(codigos < 0)[1]
+        sum_d += np.bincount(coluna, weights=d_fora, minlength=n_elementos)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if contagens[:, -1].any():
+            np.maximum.at(d_max, coluna, d_fora)
+        g_de = np.where(sum_d != 0, d_max * (1 + (sum_d - d_max) / sum_d), 0.0)
+
+    return sum_d, d_max, g_de
+
+
+def extrai_codigos_fi_fp(df_ajustado: pd.DataFrame) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Converte os dados ajustados diretamente na matriz compacta de códigos (ver extrai_matrizes_fi_fp e codifica_fi_fp), em blocos de elementos: as matrizes float64 completas de Fi e Fp não chegam a ser montadas.
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: Uma tupla com três elementos: (a) elementos: Nomes dos elementos, (b) codigos: Matriz int8 de códigos (danos × elementos), (c) d_fora: Danos das células fora do domínio das notas.
+    """
+    return _valida_matrizes(df_ajustado, codificar=True)[:3]
+
+
+def avalia_elemento(df_ajustado: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    Esta função avalia os elementos estruturais com base nos dados de Fi e Fp informados gerando o somatório dos danos, dano máximo e grau de deterioração do elemento. O cálculo é feito de uma só vez sobre a matriz de códigos danos × elementos (ver extrai_codigos_fi_fp e avalia_elementos_codigos).
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: A saída contém uma única variável dicionário que detalha os resultados para cada elemento. O dicionário possui as seguintes chaves: (a) 'sum_d': Soma total dos valores d. (b) 'd_max': Valor máximo de dano encontrado. (c) 'g_de' : Grau de deterioração do elemento (G_de).
+    """
+    elementos, codigos, d_fora = extrai_codigos_fi_fp(df_ajustado)
+    sum_d, d_max, g_de = avalia_elementos_codigos(codigos, d_fora)
+
+    return {
+        elemento: {
+            'sum_d': float(sum_d[j]),
+            'd_max': float(d_max[j]),
+            'g_de': float(g_de[j])
+        }
+        for j, elemento in enumerate(elementos)
+    }
+
+
+def avalia_familia(df_ajustado: pd.DataFrame, nome_arquivo: str, f_r: float) -> Dict[str, Dict[str, float]]:
+    """
+    Avalia a família de elementos estruturais com base nos resultados dos elementos. 
+
+    :param df_ajustado: DataFrame com os dados ajustados.
+    :param nome_arquivo: Nome do arquivo (sem caminho e sem extensão).
+    :param f_r: Fator de redução.
+
+    :return: Un dicionário com os resultados da avaliação da família. O dicionário contém as seguintes chaves: (a) 'gde_max': Valor máximo de g_de encontrado. 
+    (b) 'g_df': Grau de deterioração da família. (c) 'f_r': Fator de redução. (d) 'f_r × g_df': Produto do fator de redução pelo grau de deterioração da família. 
+    (e) 'resultados_elemento': Dicionário com os resultados por elemento.
+    """
+    resultados_elemento = avalia_elemento(df_ajustado)
+    gde_list = [dados['g_de'] for dados in resultados_elemento.values() if dados['g_de'] > 0]
+
+    if not gde_list:
+        return {
+            nome_arquivo: {
+                'gde_max': 0.0,
+                'g_df': 0.0,
+                'f_r': f_r,
+                'f_r × g_df': 0.0,
+                'resultados_elemento': resultados_elemento  # ainda útil se quiser ver 0s
+            }
+        }
+
+    gde_max = max(gde_list)
+    gde_sum = sum(gde_list)
+
+    g_df = gde_max * np.sqrt(1 + (gde_sum - gde_max) / gde_sum) if gde_sum else 0
+    fr_gdf = f_r * g_df
+
+    return {
+        nome_arquivo: {
+            'gde_max': gde_max,
+            'g_df': float(g_df),
+            'f_r': f_r,
+            'f_r × g_df': float(fr_gdf),
+            'resultados_elemento': resultados_elemento  # <-- resultado por peça
+        }
+    }
+
+
+class ElementosFamilia(Mapping):
+    """
+    Visão somente leitura dos resultados por elemento de um ResultadoFamilia no formato de avalia_elemento ({elemento: {'sum_d', 'd_max', 'g_de'}}). Os dicionários são montados sob demanda a partir dos vetores da família.
+    """
+
+    __slots__ = ('_familia', '_indices')
+
+    def __init__(self, familia: "ResultadoFamilia"):
+        self._familia = familia
+        self._indices = None
+
+    def __getitem__(self, elemento: str) -> Dict[str, float]:
+        if self._indices is None:
+            self._indices = {nome: j for j, nome in enumerate(self._familia.elementos)}
+        return self._registro(self._indices[elemento])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._familia.elementos)
+
+    def __len__(self) -> int:
+        return len(self._familia.elementos)
+
+    def _registro(self, j: int) -> Dict[str, float]:
+        familia = self._familia
+        return {'sum_d': float(familia.sum_d[j]), 'd_max': float(familia.d_max[j]), 'g_de': float(familia.g_de[j])}
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, float]]]:
+        return ((nome, self._registro(j)) for j, nome in enumerate(self._familia.elementos))
+
+    def values(self) -> Iterator[Dict[str, float]]:
+        return (self._registro(j) for j in range(len(self._familia.elementos)))
+
+
+class ResultadoFamilia(Mapping):
+    """
+    Resultado compacto da avaliação de uma família: os resultados por elemento ficam em vetores NumPy (sum_d, d_max, g_de) e os agregados da família (gde_max, gde_sum, g_df) são calculados uma única vez. Também funciona como o dicionário de avalia_familia (chaves 'gde_max', 'g_df', 'f_r', 'f_r × g_df' e 'resultados_elemento'), de modo que avaliar_estrutura e o relatório o aceitam sem conversão.
+
+    :param elementos: Nomes dos elementos, na ordem dos vetores.
+    :param sum_d: Soma dos danos por elemento.
+    :param d_max: Dano máximo por elemento.
+    :param g_de: Grau de deterioração por elemento.
+    :param f_r: Fator de importância da família.
+    """
+
+    __slots__ = ('elementos', 'sum_d', 'd_max', 'g_de', 'f_r', 'gde_max', 'gde_sum', 'g_df')
+
+    CHAVES = ('gde_max', 'g_df', 'f_r', 'f_r × g_df', 'resultados_elemento')
+
+    def __init__(self, elementos: List[str], sum_d: np.ndarray, d_max: np.ndarray, g_de: np.ndarray, f_r: float):
+        self.elementos = tuple(elementos)
+        self.sum_d = np.asarray(sum_d, dtype=np.float64)
+        self.d_max = np.asarray(d_max, dtype=np.float64)
+        self.g_de = np.asarray(g_de, dtype=np.float64)
+        self.f_r = f_r
+
+        gde_list = self.g_de[self.g_de > 0].tolist()
+        if gde_list:
+            self.gde_max = max(gde_list)
+            self.gde_sum = sum(gde_list)
+            self.g_df = float(self.gde_max * np.sqrt(1 + (self.gde_sum - self.gde_max) / self.gde_sum))
+        else:
+            self.gde_max = self.gde_sum = self.g_df = 0.0
+
+    @property
+    def fr_gdf(self) -> float:
+        return float(self.f_r * self.g_df)
+
+    def com_fr(self, f_r: float) -> "ResultadoFamilia":
+        """
+        Cópia do resultado com outro fator de importância (os vetores por elemento são compartilhados).
+
+        :param f_r: Novo fator de importância.
+
+        :return: Novo ResultadoFamilia.
+        """
+        copia = ResultadoFamilia.__new__(ResultadoFamilia)
+        for atributo in ResultadoFamilia.__slots__:
+            setattr(copia, atributo, getattr(self, atributo))
+        copia.f_r = f_r
+        return copia
+
+    def __getitem__(self, chave: str) -> object:
+        if chave == 'f_r × g_df':
+            return self.fr_gdf
+        if chave == 'resultados_elemento':
+            return ElementosFamilia(self)
+        if chave in ('gde_max', 'g_df', 'f_r'):
+            return getattr(self, chave)
+        raise KeyError(chave)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.CHAVES)
+
+    def __len__(self) -> int:
+        return len(self.CHAVES)
+
+    def como_dict(self) -> Dict[str, object]:
+        """
+        Converte o resultado para o dicionário de avalia_familia.
+
+        :return: Dicionário com as chaves 'gde_max', 'g_df', 'f_r', 'f_r × g_df' e 'resultados_elemento'.
+        """
+        return {
+            'gde_max': self.gde_max,
+            'g_df': self.g_df,
+            'f_r': self.f_r,
+            'f_r × g_df': self.fr_gdf,
+            'resultados_elemento': dict(ElementosFamilia(self).items()),
+        }
+
+
+def avalia_familia_compacta(df_ajustado: pd.DataFrame, nome_arquivo: str, f_r: float) -> Dict[str, ResultadoFamilia]:
+    """
+    Versão compacta de avalia_familia: mesmo cálculo, com o resultado guardado em um ResultadoFamilia.
+
+    :param df_ajustado: DataFrame com os dados ajustados.
+    :param nome_arquivo: Nome do arquivo (sem caminho e sem extensão).
+    :param f_r: Fator de importância.
+
+    :return: Dicionário {nome_arquivo: ResultadoFamilia}.
+    """
+    elementos, codigos, d_fora = extrai_codigos_fi_fp(df_ajustado)
+    sum_d, d_max, g_de = avalia_elementos_codigos(codigos, d_fora)
+    return {nome_arquivo: ResultadoFamilia(elementos, sum_d, d_max, g_de, f_r)}
+
+
+def aplica_fr(resultado_familia: Dict[str, Dict[str, float]], f_r: float) -> Dict[str, Dict[str, float]]:
+    """
+    Atualiza o fator de importância de um resultado de avalia_familia sem reavaliar os elementos: apenas F_r e F_r × G_df são recalculados.
+
+    :param resultado_familia: Saída de avalia_familia ou de avalia_familia_compacta.
+    :param f_r: Novo fator de importância.
+
+    :return: Um novo dicionário no mesmo formato da entrada com o F_r informado.
+    """
+    return {
+        nome_arquivo: dados.com_fr(f_r) if isinstance(dados, ResultadoFamilia) else {**dados, 'f_r': f_r, 'f_r × g_df': float(f_r * dados['g_df'])}
+        for nome_arquivo, dados in resultado_familia.items()
+    }
+
+
+def avaliar_estrutura(resultados_familias: Dict[str, Dict[str, float]]) -> Tuple[float, str]:
     """
     Calcula o grau de deterioração global da estrutura (G_d) e retorna também a classificação e
     recomendação com base no valor de G_d.
 
-    Tabela de níveis:
-        -  0–15: Baixo
-        - 16–50: Médio
-        - 51–80: Alto
-        - 81–100: Sofrível
+    Tabela de níveis:
+        -  0–15: Baixo
+        - 16–50: Médio
+        - 51–80: Alto
+        - 81–100: Sofrível
+
+    :param resultados_familias: Dicionário com resultados de cada família.
+
+    :return: Uma tupla com três elementos: (a) g_d: Grau de deterioração global (float), (b) nivel: Nível de deterioração (str), (c) recomendacao: Recomendação de ação (str).
+    """
+    numerador = 0.0
+    denominador = 0.0
+
+    for _, dados in resultados_familias.items():
+        fr = dados.get('f_r', 0)
+        gdf = dados.get('g_df', 0)
+        numerador += fr * gdf
+        denominador += fr
+
+    g_d = numerador / denominador if denominador else 0.0
+    nivel, recomendacao = classifica_g_d(g_d)
+
+    return g_d, nivel, recomendacao
+
+
+# Limites superiores de G_d dos níveis Baixo, Médio e Alto (acima do último, o nível é Sofrível) e ação recomendada em cada nível.
+NIVEIS_G_D = ("Baixo", "Médio", "Alto", "Sofrível")
+LIMITES_G_D = (15.0, 50.0, 80.0)
+RECOMENDACOES_G_D = (
+    "Estado aceitável. Manutenção preventiva.",
+    "Nova inspeção e plano de intervenção em longo prazo (até 2 anos).",
+    "Inspeção detalhada e intervenção em médio prazo (até 18 meses).",
+    "Inspeção detalhada e intervenção em curto prazo.",
+)
+
+
+def classifica_g_d(g_d: float) -> Tuple[str, str]:
+    """
+    Classifica o Grau de Deterioração da Estrutura (G_d) em nível de deterioração e ação recomendada, pelos limites de LIMITES_G_D (cada limite pertence ao nível de baixo).
+
+    :param g_d: Grau de Deterioração da Estrutura.
+
+    :return: Uma tupla com dois elementos: (a) nivel: Nível de deterioração, (b) recomendacao: Ação recomendada.
+    """
+    indice = next((i for i, limite in enumerate(LIMITES_G_D) if g_d <= limite), len(LIMITES_G_D))
+    return NIVEIS_G_D[indice], RECOMENDACOES_G_D[indice]
+
+
+class AvaliacaoIncremental:
+    """
+    Avaliação incremental de uma estrutura, para sessões de edição em que uma família é incluída, removida ou tem o F_r alterado de cada vez. As somas de F_r · G_df e de F_r são mantidas correntes, de modo que o G_d é atualizado em O(1) por família, e as partes do relatório de cada família (tabela original e resultados, ver gera_secao_familia_html) ficam guardadas já renderizadas: apenas as partes da família alterada são geradas de novo. As galerias não são guardadas (as fotos são codificadas no momento da escrita, com a deduplicação entre famílias de gera_relatorio_html).
+
+    :param fr_descricao: Dicionário com a descrição textual de cada fator F_r.
+    """
+
+    def __init__(self, fr_descricao: Dict[int, str] = FR_DESCRICAO):
+        self.fr_descricao = fr_descricao
+        self.familias = {}
+        self.tabelas = {}
+        self.imagens = {}
+        self.nomes_arquivos = {}
+        self.soma_fr = 0.0
+        self.soma_fr_gdf = 0.0
+        self.renderizacoes = 0
+        self._bases = {}
+        self._tabelas_html = {}
+        self._resultados_html = {}
+
+    def __len__(self) -> int:
+        return len(self.familias)
+
+    def __contains__(self, nome: str) -> bool:
+        return nome in self.familias
+
+    def _soma(self, dados: Dict[str, object], sinal: int) -> None:
+        # Mesmo padrão de avaliar_estrutura: família sem 'f_r' não entra na média ponderada
+        f_r = dados.get('f_r', 0)
+        self.soma_fr += sinal * f_r
+        self.soma_fr_gdf += sinal * f_r * dados.get('g_df', 0)
+        if not self.familias:
+            # Sem famílias, as somas voltam a zero exatamente (sem o resíduo de arredondamento das subtrações)
+            self.soma_fr = self.soma_fr_gdf = 0.0
+
+    def atualiza(self, nome: str, resultado: Dict[str, object], tabela_original: Optional[pd.DataFrame] = None, imagens: Optional[List[tuple]] = None, nome_arquivo: Optional[str] = None) -> bool:
+        """
+        Inclui uma família ou substitui o seu resultado. Se o resultado, a tabela e as imagens forem os mesmos objetos já registrados, nada é recalculado.
+
+        :param nome: Nome da família.
+        :param resultado: Resultado da família (dicionário de avalia_familia ou ResultadoFamilia), já com o F_r.
+        :param tabela_original: DataFrame da planilha de inspeção ou None.
+        :param imagens: Lista de tuplas das imagens da família (ver gera_galeria_html).
+        :param nome_arquivo: Nome exibido no resumo do relatório. Se None, usa o nome da família.
+
+        :return: True se a família foi incluída ou alterada.
+        """
+        self.nomes_arquivos[nome] = nome_arquivo or nome
+        if nome in self.familias:
+            # Famílias sem fotos (None ou lista vazia) contam como as mesmas imagens
+            mesmas_imagens = self.imagens[nome] is imagens or not (self.imagens[nome] or imagens)
+            if self._bases[nome] is resultado and self.tabelas[nome] is tabela_original and mesmas_imagens:
+                return False
+            self._soma(self.familias[nome], -1)
+            if self.tabelas[nome] is not tabela_original:
+                self._tabelas_html.pop(nome, None)
+            self._resultados_html.pop(nome, None)
+        self.familias[nome] = self._bases[nome] = resultado
+        self.tabelas[nome] = tabela_original
+        self.imagens[nome] = imagens if imagens is not None else []
+        self._soma(resultado, 1)
+        return True
+
+    def aplica_fr(self, nome: str, f_r: float) -> bool:
+        """
+        Altera o F_r de uma família já incluída. Apenas os resultados da família são renderizados de novo.
+
+        :param nome: Nome da família.
+        :param f_r: Novo fator de importância.
+
+        :return: True se o F_r foi alterado.
+        """
+        anterior = self.familias[nome]
+        if anterior['f_r'] == f_r:
+            return False
+        self._soma(anterior, -1)
+        self.familias[nome] = aplica_fr({nome: self._bases[nome]}, f_r)[nome]
+        self._soma(self.familias[nome], 1)
+        self._resultados_html.pop(nome, None)
+        return True
+
+    def remove(self, nome: str) -> None:
+        """
+        Remove uma família da avaliação.
+
+        :param nome: Nome da família.
+        """
+        anterior = self.familias.pop(nome)
+        for registro in (self._bases, self.tabelas, self.imagens, self.nomes_arquivos, self._tabelas_html, self._resultados_html):
+            registro.pop(nome, None)
+        self._soma(anterior, -1)
+
+    def mantem(self, nomes: List[str]) -> None:
+        """
+        Remove as famílias fora da lista e ordena as demais na ordem da lista (ordem do relatório). Nada é renderizado de novo.
+
+        :param nomes: Nomes das famílias, na ordem desejada.
+        """
+        manter = set(nomes)
+        for nome in [nome for nome in self.familias if nome not in manter]:
+            self.remove(nome)
+        self.familias = {nome: self.familias[nome] for nome in nomes if nome in self.familias}
+
+    def avalia(self) -> Tuple[float, str, str]:
+        """
+        Calcula o Grau de Deterioração da Estrutura a partir das somas correntes (mesmo resultado de avaliar_estrutura).
+
+        :return: Uma tupla com três elementos: (a) g_d, (b) nivel, (c) recomendacao.
+        """
+        g_d = self.soma_fr_gdf / self.soma_fr if self.soma_fr else 0.0
+        return (g_d, *classifica_g_d(g_d))
+
+    def _parte_html(self, cache: Dict[str, str], nome: str, gerador: Callable[[], Iterator[str]]) -> str:
+        if nome not in cache:
+            cache[nome] = "".join(gerador())
+            self.renderizacoes += 1
+        return cache[nome]
+
+    def gera_relatorio_html(self, diagnostico: Optional[Diagnostico] = None, registro_fotos: Optional[RegistroFotos] = None, diferencas: Optional[Dict[str, pd.DataFrame]] = None) -> Iterator[str]:
+        """
+        Gera o relatório consolidado em HTML (mesmo documento de gera_relatorio_html), reaproveitando as partes já renderizadas de cada família.
+
+        :param diagnostico: Diagnóstico de desempenho opcional, incluído em um apêndice do relatório.
+        :param registro_fotos: Registro de fotos opcional, para consultar as estatísticas de deduplicação (ver RegistroFotos).
+        :param diferencas: Comparação opcional com a inspeção anterior (ver compara_inspecoes).
+
+        :return: Iterador de pedaços (str) do documento HTML.
+        """
+        registro_fotos = RegistroFotos() if registro_fotos is None else registro_fotos
+        g_d, nivel, recomendacao = self.avalia()
+        yield CABECALHO_HTML
+
+        for i, (nome, dados) in enumerate(self.familias.items()):
+            yield f"<hr><h2>Família {i+1} - {nome}</h2>"
+            yield self._parte_html(self._tabelas_html, nome, lambda: gera_tabela_familia_html(self.tabelas[nome]))
+            yield from gera_galeria_html(self.imagens[nome], registro_fotos=registro_fotos)
+            yield self._parte_html(self._resultados_html, nome, lambda: gera_resultados_familia_html(dados, self.fr_descricao))
+
+        yield from gera_resumo_html(self.familias, g_d, nivel, recomendacao, [self.nomes_arquivos[nome] for nome in self.familias], diagnostico, diferencas)
+        yield "</body></html>"
+
+    def escreve_relatorio_html(self, destino: str | Path | IO, diagnostico: Optional[Diagnostico] = None, registro_fotos: Optional[RegistroFotos] = None, diferencas: Optional[Dict[str, pd.DataFrame]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Escreve o relatório consolidado em HTML em um arquivo, pedaço a pedaço (ver gera_relatorio_html e escreve_relatorio_html).
+
+        :param destino: Caminho do arquivo de saída ou objeto de arquivo aberto em modo texto ou binário (UTF-8).
+        :param diagnostico: Diagnóstico de desempenho opcional, incluído em um apêndice do relatório.
+        :param registro_fotos: Registro de fotos opcional, para consultar as estatísticas de deduplicação.
+        :param diferencas: Comparação opcional com a inspeção anterior (ver compara_inspecoes).
+
+        :return: Uma tupla com dois elementos: (a) df_resumo_familias_streamlit, (b) df_estrutura_streamlit (ver tabelas_resumo).
+        """
+        escreve_partes_html(destino, self.gera_relatorio_html(diagnostico, registro_fotos, diferencas))
+        return tabelas_resumo(self.familias, *self.avalia(), [self.nomes_arquivos[nome] for nome in self.familias])
+
+# Probabilidades padrão de variação de −1, 0 e +1 grau nos fatores Fi e Fp da simulação de incerteza.
+PROBABILIDADES_VARIACAO = (0.1, 0.8, 0.1)
+FI_LIMITES = (1, 4)
+FP_LIMITES = (1, 5)
+
+
+def _sorteia_variacao(gerador: np.random.Generator, forma: Tuple[int, int], probabilidades: Tuple[float, float, float]) -> np.ndarray:
+    """
+    Sorteia variações de −1, 0 ou +1 grau com as probabilidades informadas.
+    """
+    p_menos, p_zero, _ = probabilidades
+    u = gerador.random(forma)
+    return (u >= p_menos + p_zero).astype(np.int8) - (u < p_menos).astype(np.int8)
+
+
+def _g_de_amostras(fi: np.ndarray, fp: np.ndarray, inicios: np.ndarray) -> np.ndarray:
+    """
+    Calcula o G_de de cada amostra e elemento a partir dos fatores das células com dano (amostras × células), agrupadas por elemento a partir dos índices inicios. Fatores inteiros (int8) são avaliados por consulta à TABELA_DANO; os demais, pela fórmula.
+    """
+    if fi.shape[1] == 0:
+        return np.zeros((fi.shape[0], 0), dtype=np.float64)
+    if fi.dtype == np.int8:
+        d = tabela_dano().take(fi * np.int8(FP_MAX + 1) + fp)
+    else:
+        d = calcula_dano(fi, fp)
+    sum_d = np.add.reduceat(d, inicios, axis=1)
+    d_max = np.maximum.reduceat(d, inicios, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(sum_d > 0, d_max * (1 + (sum_d - d_max) / sum_d), 0.0)
+
+
+def _g_df_amostras(g_de: np.ndarray) -> np.ndarray:
+    """
+    Calcula o G_df de cada amostra a partir da matriz de G_de (amostras × elementos).
+    """
+    gde_max = g_de.max(axis=1, initial=0.0)
+    gde_sum = g_de.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(gde_sum > 0, gde_max * np.sqrt(1 + (gde_sum - gde_max) / gde_sum), 0.0)
+
+
+def simula_incerteza(familias: Dict[str, Tuple[List[str], np.ndarray, np.ndarray, float]], n_amostras: int = 10000, prob_fi: Tuple[float, float, float] = PROBABILIDADES_VARIACAO, prob_fp: Tuple[float, float, float] = PROBABILIDADES_VARIACAO, semente: Optional[int] = None, tamanho_lote: int = 4096) -> Dict[str, object]:
+    """
+    Simulação de Monte Carlo do G_d da estrutura sob incerteza nas notas Fi e Fp. Em cada amostra, cada célula com dano registrado (Fi > 0 e Fp > 0) varia −1, 0 ou +1 grau, limitada a FI_LIMITES e FP_LIMITES, e toda a cadeia elemento → família → estrutura é recalculada. As amostras são processadas em lotes vetorizados (amostras × células), sem laço em Python por amostra.
+
+    :param familias: Dicionário {nome_da_família: (elementos, fi, fp, f_r)}, com as matrizes de extrai_matrizes_fi_fp e o fator de importância.
+    :param n_amostras: Número de amostras.
+    :param prob_fi: Probabilidades de variação de −1, 0 e +1 grau em Fi.
+    :param prob_fp: Probabilidades de variação de −1, 0 e +1 grau em Fp.
+    :param semente: Semente do gerador de números aleatórios (reprodutibilidade).
+    :param tamanho_lote: Número de amostras calculadas por vez (limita o uso de memória).
+
+    :return: Dicionário com as chaves: (a) 'g_d': Vetor com o G_d de cada amostra, (b) 'g_d_nominal' e 'nivel_nominal': G_d e nível sem variação, (c) 'media', 'desvio' e 'percentis' (5, 50 e 95) do G_d, (d) 'probabilidades': Probabilidade de cada nível, (e) 'sensibilidade': DataFrame com o G_de nominal, a média, o desvio e a correlação com o G_d de cada elemento, ordenado pela correlação.
+    """
+    for probabilidades in (prob_fi, prob_fp):
+        if len(probabilidades) != 3 or min(probabilidades) < 0 or not np.isclose(sum(probabilidades), 1.0):
+            raise ValueError("As probabilidades de variação devem ter três valores não negativos com soma 1")
+
+    preparadas = []
+    rotulos = []
+    for nome, (elementos, fi, fp, f_r) in familias.items():
+        fi_t = np.asarray(fi, dtype=np.float64).T
+        fp_t = np.asarray(fp, dtype=np.float64).T
+        elemento, dano = np.nonzero((fi_t > 0) & (fp_t > 0))
+        com_dano, inicios = np.unique(elemento, return_index=True)
+        fi_c, fp_c = fi_t[elemento, dano], fp_t[elemento, dano]
+        if (codifica_fi_fp(fi_c, fp_c)[0] >= 0).all():
+            # Notas no domínio discreto: a simulação trabalha com códigos int8 e consulta à TABELA_DANO.
+            fi_c, fp_c = fi_c.astype(np.int8), fp_c.astype(np.int8)
+        preparadas.append((fi_c, fp_c, inicios, f_r))
+        rotulos.extend((nome, elementos[k]) for k in com_dano)
+
+    soma_fr = sum(f_r for *_, f_r in preparadas)
+    n_elementos = len(rotulos)
+
+    def amostra(n: int, variar: bool) -> Tuple[np.ndarray, np.ndarray]:
+        numerador = np.zeros(n)
+        g_de_todos = []
+        for fi, fp, inicios, f_r in preparadas:
+            if variar:
+                fi = np.clip(fi + _sorteia_variacao(gerador, (n, fi.size), prob_fi), *FI_LIMITES)
+                fp = np.clip(fp + _sorteia_variacao(gerador, (n, fp.size), prob_fp), *FP_LIMITES)
+            else:
+                fi, fp = np.broadcast_to(fi, (n, fi.size)), np.broadcast_to(fp, (n, fp.size))
+            g_de = _g_de_amostras(fi, fp, inicios)
+            numerador += f_r * _g_df_amostras(g_de)
+            g_de_todos.append(g_de)
+        g_d = numerador / soma_fr if soma_fr else numerador
+        return g_d, np.concatenate(g_de_todos, axis=1) if g_de_todos else np.zeros((n, 0))
+
+    gerador = np.random.default_rng(semente)
+    with etapa("simula_incerteza"):
+        g_d_nominal, g_de_nominal = amostra(1, variar=False)
+
+        amostras = np.empty(n_amostras)
+        soma_x = np.zeros(n_elementos)
+        soma_x2 = np.zeros(n_elementos)
+        soma_xy = np.zeros(n_elementos)
+        for inicio in range(0, n_amostras, tamanho_lote):
+            n = min(tamanho_lote, n_amostras - inicio)
+            g_d, g_de = amostra(n, variar=True)
+            amostras[inicio:inicio + n] = g_d
+            soma_x += g_de.sum(axis=0)
+            soma_x2 += np.square(g_de).sum(axis=0)
+            soma_xy += g_d @ g_de
+
+    media = amostras.mean() if n_amostras else np.nan
+    desvio = amostras.std() if n_amostras else np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        media_x = soma_x / n_amostras
+        desvio_x = np.sqrt(np.maximum(soma_x2 / n_amostras - np.square(media_x), 0.0))
+        correlacao = np.nan_to_num((soma_xy / n_amostras - media_x * media) / (desvio_x * desvio))
+
+    niveis = np.searchsorted(LIMITES_G_D, amostras, side="left")
+    contagem = np.bincount(niveis, minlength=len(NIVEIS_G_D))
+    sensibilidade = pd.DataFrame({
+        'familia': [familia for familia, _ in rotulos],
+        'elemento': [elemento for _, elemento in rotulos],
+        'g_de_nominal': g_de_nominal[0],
+        'g_de_media': media_x,
+        'g_de_desvio': desvio_x,
+        'correlacao_g_d': correlacao,
+    }).sort_values('correlacao_g_d', ascending=False, kind="stable", ignore_index=True)
+
+    return {
+        'g_d': amostras,
+        'g_d_nominal': float(g_d_nominal[0]),
+        'nivel_nominal': NIVEIS_G_D[int(np.searchsorted(LIMITES_G_D, g_d_nominal[0], side="left"))],
+        'media': float(media),
+        'desvio': float(desvio),
+        'percentis': {p: float(v) for p, v in zip((5, 50, 95), np.percentile(amostras, (5, 50, 95)))} if n_amostras else {},
+        'probabilidades': {nivel: float(c / n_amostras) if n_amostras else 0.0 for nivel, c in zip(NIVEIS_G_D, contagem)},
+        'sensibilidade': sensibilidade,
+    }
+
+
+# Versão do formato dos arquivos do cache de planilhas; altere para invalidar entradas antigas.
+VERSAO_CACHE = 2
+
+# Tipos das células das colunas não numéricas no cache (vetor t<i> de cada coluna): vazia, lógico, inteiro, real e texto.
+CELULA_VAZIA, CELULA_LOGICA, CELULA_INTEIRA, CELULA_REAL, CELULA_TEXTO = range(5)
+
+
+def _tipo_celula(valor: object) -> int:
+    if isinstance(valor, (bool, np.bool_)):
+        return CELULA_LOGICA
+    if isinstance(valor, (int, np.integer)):
+        return CELULA_INTEIRA
+    if isinstance(valor, (float, np.floating)):
+        return CELULA_REAL
+    return CELULA_TEXTO
+
+
+class CachePlanilhas:
+    """
+    Cache em disco das planilhas de inspeção já lidas, endereçado pelo hash SHA-256 dos bytes da planilha. Cada entrada guarda os dados ajustados (saída de adequa_dataset) e os nomes dos elementos em um arquivo .npz, uma coluna por array. Nas colunas não numéricas, o tipo de cada célula (ver CELULA_VAZIA a CELULA_TEXTO) é guardado junto com os valores, de modo que uma leitura do cache devolve os mesmos valores da leitura original; células vazias voltam como NaN e tipos sem equivalente (datas, por exemplo) voltam como texto. O tamanho total é limitado e as entradas menos usadas recentemente são descartadas primeiro.
+
+    :param diretorio: Diretório do cache. Se None, usa a variável de ambiente GDE_CACHE_DIR ou ~/.cache/gde_unb.
+    :param tamanho_max: Tamanho máximo do cache em bytes.
+    """
+
+    def __init__(self, diretorio: Optional[str | Path] = None, tamanho_max: int = 256 * 1024 ** 2):
+        self.diretorio = Path(diretorio or os.environ.get("GDE_CACHE_DIR") or Path.home() / ".cache" / "gde_unb")
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.tamanho_max = tamanho_max
+        self.acertos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def chave(dados: bytes) -> str:
+        """
+        Calcula a chave de uma planilha.
+
+        :param dados: Bytes do arquivo da planilha.
+
+        :return: Hash SHA-256 em hexadecimal.
+        """
+        return hashlib.sha256(dados).hexdigest()
+
+    def _caminho(self, chave: str) -> Path:
+        return self.diretorio / f"{chave}.npz"
+
+    def obter(self, chave: str) -> Optional[Tuple[pd.DataFrame, List[str]]]:
+        """
+        Busca uma planilha no cache.
+
+        :param chave: Chave da planilha (ver chave).
+
+        :return: Uma tupla (df_ajustado, nome_elementos) ou None se a planilha não estiver no cache.
+        """
+        caminho = self._caminho(chave)
+        try:
+            with np.load(caminho, allow_pickle=False) as arquivo:
+                if int(arquivo["versao"]) != VERSAO_CACHE:
+                    raise ValueError("Versão do cache incompatível")
+                colunas = arquivo["colunas"].tolist()
+                dados = {}
+                for i, coluna in enumerate(colunas):
+                    if f"t{i}" not in arquivo.files:
+                        dados[coluna] = arquivo[f"c{i}"]
+                        continue
+                    tipos = arquivo[f"t{i}"]
+                    valores = np.full(len(tipos), np.nan, dtype=object)
+                    for tipo, vetor, dtype in ((CELULA_LOGICA, f"i{i}", bool), (CELULA_INTEIRA, f"i{i}", np.int64), (CELULA_REAL, f"n{i}", np.float64), (CELULA_TEXTO, f"c{i}", str)):
+                        celulas = tipos == tipo
+                        if celulas.any():
+                            valores[celulas] = arquivo[vetor][celulas].astype(dtype).astype(object)
+                    dados[coluna] = valores
+                nome_elementos = arquivo["elementos"].tolist()
+            os.utime(caminho)
+        except (OSError, ValueError, KeyError):
+            self.falhas += 1
+            return None
+
+        self.acertos += 1
+        return pd.DataFrame(dados, columns=colunas), nome_elementos
+
+    def guardar(self, chave: str, df_ajustado: pd.DataFrame, nome_elementos: List[str]) -> None:
+        """
+        Grava uma planilha no cache e descarta as entradas mais antigas se o tamanho máximo for excedido.
+
+        :param chave: Chave da planilha (ver chave).
+        :param df_ajustado: Dados da inspeção em colunas simples (saída de adequa_dataset).
+        :param nome_elementos: Nomes dos elementos estruturais.
+        """
+        dados = {
+            "versao": np.array(VERSAO_CACHE),
+            "colunas": np.array([str(coluna) for coluna in df_ajustado.columns], dtype=str),
+            "elementos": np.array(nome_elementos, dtype=str),
+        }
+        for i, coluna in enumerate(df_ajustado.columns):
+            serie = df_ajustado.iloc[:, i]
+            if serie.dtype.kind in "biuf":
+                dados[f"c{i}"] = serie.to_numpy()
+            else:
+                valores = serie.to_numpy(dtype=object)
+                tipos = np.where(serie.isna().to_numpy(), CELULA_VAZIA, [_tipo_celula(valor) for valor in valores]).astype(np.int8)
+                dados[f"t{i}"] = tipos
+                dados[f"c{i}"] = np.array([str(valor) if tipo == CELULA_TEXTO else "" for valor, tipo in zip(valores, tipos)], dtype=str)
+                dados[f"i{i}"] = np.array([int(valor) if tipo in (CELULA_LOGICA, CELULA_INTEIRA) else 0 for valor, tipo in zip(valores, tipos)], dtype=np.int64)
+                dados[f"n{i}"] = np.array([float(valor) if tipo == CELULA_REAL else 0.0 for valor, tipo in zip(valores, tipos)], dtype=np.float64)
+
+        # Nome temporário único: o cache é compartilhado pelas sessões (threads) do Streamlit, que podem gravar a mesma planilha ao mesmo tempo
+        caminho = self._caminho(chave)
+        with tempfile.NamedTemporaryFile(dir=self.diretorio, prefix=f"{chave}.", suffix=".tmp", delete=False) as arquivo:
+            np.savez(arquivo, **dados)
+        os.replace(arquivo.name, caminho)
+
+        self._descarta_excedente()
+
+    def _descarta_excedente(self) -> None:
+        entradas = []
+        for caminho in self.diretorio.glob("*.npz"):
+            try:
+                estado = caminho.stat()
+            except FileNotFoundError:
+                continue
+            entradas.append((estado.st_mtime, estado.st_size, caminho))
+
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= self.tamanho_max:
+                break
+            try:
+                caminho.unlink()
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+    def estatisticas(self) -> Dict[str, int]:
+        """
+        Retorna os contadores do cache.
+
+        :return: Dicionário com as chaves 'acertos', 'falhas', 'entradas' e 'bytes'.
+        """
+        tamanhos = [caminho.stat().st_size for caminho in self.diretorio.glob("*.npz")]
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'entradas': len(tamanhos), 'bytes': sum(tamanhos)}
+
+
+class CacheLRU:
+    """
+    Cache em memória de tamanho limitado, com descarte da entrada usada há mais tempo (LRU). Seguro para uso por várias threads (ex: sessões do Streamlit).
+
+    :param max_entradas: Número máximo de entradas mantidas.
+    :param max_bytes: Tamanho máximo, em bytes, da soma dos valores do tipo bytes ou str guardados (os demais valores não são contados). Se None, só o número de entradas é limitado.
+    """
+
+    def __init__(self, max_entradas: int = 32, max_bytes: Optional[int] = None):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    @staticmethod
+    def _tamanho(valor: object) -> int:
+        return len(valor) if isinstance(valor, (bytes, bytearray, str)) else 0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obter_ou_calcular(self, chave: object, calcula: Callable[[], object]) -> object:
+        """
+        Retorna o valor associado à chave, calculando-o (e guardando-o) se ainda não estiver no cache.
+
+        :param chave: Chave da entrada (deve ser hashable).
+        :param calcula: Função sem argumentos que calcula o valor.
+
+        :return: Valor associado à chave.
+        """
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave]
+            self.falhas += 1
+
+        valor = calcula()
+
+        with self._trava:
+            if chave in self._entradas:
+                self.bytes -= self._tamanho(self._entradas[chave])
+            self._entradas[chave] = valor
+            self._entradas.move_to_end(chave)
+            self.bytes += self._tamanho(valor)
+            while len(self._entradas) > self.max_entradas or (self.max_bytes is not None and self.bytes > self.max_bytes and len(self._entradas) > 1):
+                self.bytes -= self._tamanho(self._entradas.popitem(last=False)[1])
+
+        return valor
+
+
+# Limites padrão dos arquivos temporários de uma sessão (ver EspacoSessao), configuráveis pelas variáveis de ambiente.
+LIMITE_ARQUIVO_BYTES = int(float(os.environ.get("GDE_LIMITE_UPLOAD_MB", 200)) * 1024 ** 2)
+LIMITE_SESSAO_BYTES = int(float(os.environ.get("GDE_LIMITE_SESSAO_MB", 1024)) * 1024 ** 2)
+PREFIXO_SESSAO = "gde_sessao_"
+TAMANHO_BLOCO_COPIA = 1024 ** 2
+
+
+class EspacoSessao:
+    """
+    Diretório temporário de uma sessão (ex: do Streamlit), onde ficam os arquivos enviados, as fotos reduzidas e os relatórios gerados. Assim, a memória do processo guarda apenas os caminhos. O espaço total e o tamanho de cada arquivo são limitados, e o diretório é apagado em limpa() ou quando o objeto é descartado.
+
+    :param diretorio_base: Diretório onde o diretório da sessão é criado. Se None, usa a variável de ambiente GDE_TMPDIR ou o diretório temporário do sistema.
+    :param limite_bytes: Espaço máximo ocupado pelos arquivos da sessão.
+    :param limite_arquivo: Tamanho máximo de cada arquivo enviado.
+    """
+
+    def __init__(self, diretorio_base: Optional[str | Path] = None, limite_bytes: int = LIMITE_SESSAO_BYTES, limite_arquivo: int = LIMITE_ARQUIVO_BYTES):
+        self.diretorio_base = Path(diretorio_base or os.environ.get("GDE_TMPDIR") or tempfile.gettempdir())
+        self.diretorio_base.mkdir(parents=True, exist_ok=True)
+        self.diretorio = Path(tempfile.mkdtemp(prefix=PREFIXO_SESSAO, dir=self.diretorio_base))
+        self.limite_bytes = limite_bytes
+        self.limite_arquivo = limite_arquivo
+        self._tamanhos = {}
+        self._trava = threading.RLock()
+        self._finalizador = weakref.finalize(self, shutil.rmtree, self.diretorio, True)
+
+    @property
+    def bytes_usados(self) -> int:
+        with self._trava:
+            return sum(self._tamanhos.values())
+
+    def _reserva(self, caminho: Path, tamanho: int) -> None:
+        with self._trava:
+            if self.bytes_usados - self._tamanhos.get(caminho, 0) + tamanho > self.limite_bytes:
+                raise ValueError(f"Espaço da sessão esgotado (limite de {self.limite_bytes / 1024 ** 2:.0f} MB); remova arquivos ou reinicie a sessão")
+            self._tamanhos[caminho] = tamanho
+
+    def guarda(self, origem: bytes | IO[bytes], sufixo: str = "") -> Tuple[Path, str]:
+        """
+        Copia um arquivo para o diretório da sessão em blocos, calculando o hash SHA-256 durante a cópia. Arquivos com o mesmo conteúdo são guardados uma única vez.
+
+        :param origem: Bytes ou objeto de arquivo binário (ex: arquivo enviado ao Streamlit); é lido a partir do início.
+        :param sufixo: Sufixo do nome do arquivo (ex: ".zip").
+
+        :return: Uma tupla com dois elementos: (a) caminho: Caminho do arquivo guardado (nomeado pelo hash), (b) chave: Hash SHA-256 do conteúdo.
+        """
+        origem = io.BytesIO(origem) if isinstance(origem, (bytes, bytearray)) else origem
+        if hasattr(origem, "seek"):
+            origem.seek(0)
+        resumo = hashlib.sha256()
+        tamanho = 0
+        with tempfile.NamedTemporaryFile("wb", dir=self.diretorio, delete=False) as destino:
+            try:
+                for bloco in iter(partial(origem.read, TAMANHO_BLOCO_COPIA), b""):
+                    tamanho += len(bloco)
+                    if tamanho > self.limite_arquivo:
+                        raise ValueError(f"Arquivo maior que o limite de {self.limite_arquivo / 1024 ** 2:.0f} MB")
+                    resumo.update(bloco)
+                    destino.write(bloco)
+            except BaseException:
+                destino.close()
+                os.remove(destino.name)
+                raise
+
+        chave = resumo.hexdigest()
+        caminho = self.diretorio / f"{chave}{sufixo}"
+        with self._trava:  # a consulta e a reserva juntas, para que duas cópias do mesmo conteúdo não sejam contadas duas vezes
+            if caminho in self._tamanhos:
+                os.remove(destino.name)
+                return caminho, chave
+            try:
+                self._reserva(caminho, tamanho)
+            except ValueError:
+                os.remove(destino.name)
+                raise
+            os.replace(destino.name, caminho)
+        return caminho, chave
+
+    def novo_caminho(self, sufixo: str = "") -> Path:
+        """
+        Reserva um caminho novo no diretório da sessão (ex: para o relatório). O tamanho do arquivo é contado ao chamar registra.
+
+        :param sufixo: Sufixo do nome do arquivo (ex: ".html").
+
+        :return: Caminho do arquivo (ainda não criado).
+        """
+        descritor, caminho = tempfile.mkstemp(suffix=sufixo, dir=self.diretorio)
+        os.close(descritor)
+        return Path(caminho)
+
+    def registra(self, caminho: str | Path) -> int:
+        """
+        Contabiliza um arquivo escrito diretamente no diretório da sessão. Se o limite de espaço for ultrapassado, o arquivo é apagado.
+
+        :param caminho: Caminho do arquivo.
+
+        :return: Tamanho do arquivo em bytes.
+        """
+        caminho = Path(caminho)
+        tamanho = caminho.stat().st_size
+        try:
+            self._reserva(caminho, tamanho)
+        except ValueError:
+            caminho.unlink(missing_ok=True)
+            raise
+        return tamanho
+
+    def remove(self, caminho: Optional[str | Path]) -> None:
+        """
+        Apaga um arquivo da sessão e libera o espaço ocupado.
+
+        :param caminho: Caminho do arquivo (None é ignorado).
+        """
+        if caminho is None:
+            return
+        caminho = Path(caminho)
+        with self._trava:
+            self._tamanhos.pop(caminho, None)
+        caminho.unlink(missing_ok=True)
+
+    def mantem(self, caminhos: Iterable[Optional[str | Path]]) -> None:
+        """
+        Apaga os arquivos da sessão, exceto os indicados, e libera o espaço ocupado. O diretório da sessão é mantido.
+
+        :param caminhos: Caminhos dos arquivos a manter (None é ignorado).
+        """
+        manter = {Path(caminho) for caminho in caminhos if caminho is not None}
+        for caminho in list(self.diretorio.iterdir()):
+            if caminho not in manter:
+                self.remove(caminho)
+
+    def limpa(self) -> None:
+        """
+        Apaga o diretório da sessão com todos os arquivos.
+        """
+        with self._trava:
+            self._tamanhos.clear()
+        self._finalizador()
+
+    @staticmethod
+    def limpa_antigas(diretorio_base: Optional[str | Path] = None, idade_max: float = 24 * 3600) -> int:
+        """
+        Apaga os diretórios de sessões abandonadas (ex: deixados por um processo encerrado sem limpeza), isto é, sem alteração há mais de idade_max segundos.
+
+        :param diretorio_base: Diretório onde as sessões são criadas (mesmo padrão do construtor).
+        :param idade_max: Idade máxima, em segundos, desde a última alteração.
 
-    :param resultados_familias: Dicionário com resultados de cada família.
+        :return: Número de diretórios apagados.
+        """
+        diretorio_base = Path(diretorio_base or os.environ.get("GDE_TMPDIR") or tempfile.gettempdir())
+        limite = time.time() - idade_max
+        apagados = 0
+        for diretorio in diretorio_base.glob(f"{PREFIXO_SESSAO}*"):
+            try:
+                if diretorio.is_dir() and max((p.stat().st_mtime for p in diretorio.iterdir()), default=diretorio.stat().st_mtime) < limite:
+                    shutil.rmtree(diretorio, ignore_errors=True)
+                    apagados += 1
+            except OSError:
+                continue
+        return apagados
 
-    :return: Uma tupla com três elementos: (a) g_d: Grau de deterioração global (float), (b) nivel: Nível de deterioração (str), (c) recomendacao: Recomendação de ação (str).
+
+# Formatos de ExportadorResultados: extensão dos arquivos e pacote necessário além do pandas.
+FORMATOS_EXPORTACAO = {
+    'parquet': ('.parquet', "pyarrow"),
+    'feather': ('.feather', "pyarrow"),
+    'csv': ('.csv', None),
+}
+COLUNAS_PARTICAO = ('ponte', 'data')
+# O pyarrow é opcional: sem ele, o formato padrão da exportação é CSV.
+FORMATO_EXPORTACAO_PADRAO = 'parquet' if importlib.util.find_spec("pyarrow") is not None else 'csv'
+
+
+class ExportadorResultados:
+    """
+    Exporta os resultados de várias inspeções em tabelas colunares para análise de dados: 'elementos' (uma linha por ponte, data, família e elemento, com sum_d, d_max e g_de), 'familias' (f_r, g_df, f_r_g_df, gde_max e n_elementos) e 'estruturas' (g_d, nivel e n_familias). As inspeções são acumuladas a partir dos vetores de ResultadoFamilia, sem passar pelas tabelas de exibição (tabelas_resumo), e os textos repetidos (ponte, família, elemento e nível) viram colunas categóricas, gravadas com codificação de dicionário no Parquet.
     """
-    numerador = 0.0
-    denominador = 0.0
 
-    for _, dados in resultados_familias.items():
-        fr = dados.get('f_r', 0)
-        gdf = dados.get('g_df', 0)
-        numerador += fr * gdf
-        denominador += fr
+    def __init__(self):
+        self._pontes: Dict[str, int] = {}
+        self._familias: Dict[str, int] = {}
+        self._inspecoes = {'ponte': [], 'data': [], 'g_d': [], 'nivel': [], 'n_familias': []}
+        self._dados_familias = {'inspecao': [], 'familia': [], 'f_r': [], 'g_df': [], 'gde_max': [], 'n_elementos': []}
+        self._elementos: Dict[str, int] = {}
+        self._codigos_elementos: List[int] = []
+        self._vetores = {'sum_d': [], 'd_max': [], 'g_de': []}
 
-    g_d = numerador / denominador if denominador else 0.0
+    def __len__(self) -> int:
+        return len(self._inspecoes['g_d'])
+
+    def adiciona(self, ponte: str, data: str | date, resultados_familias: Dict[str, Dict[str, float]]) -> None:
+        """
+        Adiciona uma inspeção.
+
+        :param ponte: Identificação da ponte.
+        :param data: Data da inspeção (date ou texto no formato AAAA-MM-DD).
+        :param resultados_familias: Resultados das famílias (avalia_familia ou avalia_familia_compacta).
+        """
+        g_d, nivel, _ = avaliar_estrutura(resultados_familias)
+        inspecao = len(self)
+        for chave, valor in (('ponte', self._pontes.setdefault(str(ponte), len(self._pontes))), ('data', data.isoformat() if isinstance(data, date) else str(data)),
+                             ('g_d', g_d), ('nivel', nivel), ('n_familias', len(resultados_familias))):
+            self._inspecoes[chave].append(valor)
+
+        for familia, dados in resultados_familias.items():
+            if isinstance(dados, ResultadoFamilia):
+                elementos, vetores = dados.elementos, (dados.sum_d, dados.d_max, dados.g_de)
+            else:
+                elementos = [str(el) for el in dados['resultados_elemento']]
+                vetores = tuple(np.array([r[chave] for r in dados['resultados_elemento'].values()], dtype=np.float64) for chave in self._vetores)
+            for chave, valor in (('inspecao', inspecao), ('familia', self._familias.setdefault(str(familia), len(self._familias))), ('f_r', float(dados['f_r'])),
+                                 ('g_df', float(dados['g_df'])), ('gde_max', float(dados['gde_max'])), ('n_elementos', len(elementos))):
+                self._dados_familias[chave].append(valor)
+            self._codigos_elementos.extend(self._elementos.setdefault(str(el), len(self._elementos)) for el in elementos)
+            for chave, vetor in zip(self._vetores, vetores):
+                self._vetores[chave].append(vetor)
+
+    def adiciona_lote(self, inspecoes: Iterable[Tuple[str, str | date, Dict[str, Dict[str, float]]]]) -> "ExportadorResultados":
+        """
+        Adiciona várias inspeções, consumidas uma a uma.
+
+        :param inspecoes: Iterável de tuplas (ponte, data, resultados_familias).
+
+        :return: O próprio exportador.
+        """
+        for ponte, data, resultados_familias in inspecoes:
+            self.adiciona(ponte, data, resultados_familias)
+        return self
+
+    def tabelas(self) -> Dict[str, pd.DataFrame]:
+        """
+        Monta as tabelas de elementos, famílias e estruturas.
+
+        :return: Dicionário {'elementos', 'familias', 'estruturas'} de DataFrames. As colunas 'ponte', 'familia', 'elemento' e 'nivel' são categóricas ('nivel' ordenada do Baixo ao Sofrível), 'data' é datetime64 e as demais são float64 ou int64.
+        """
+        inspecoes, familias = self._inspecoes, self._dados_familias
+        pontes = list(self._pontes)
+        codigos_ponte = np.array(inspecoes['ponte'], dtype=np.int64)
+        datas = pd.to_datetime(pd.Series(inspecoes['data'], dtype=object), format="%Y-%m-%d").to_numpy()
+
+        inspecao_familia = np.array(familias['inspecao'], dtype=np.int64)
+        n_elementos = np.array(familias['n_elementos'], dtype=np.int64)
+        familia_elemento = np.repeat(np.arange(len(n_elementos)), n_elementos)
+        inspecao_elemento = inspecao_familia[familia_elemento]
+        codigos_familia = np.array(familias['familia'], dtype=np.int64)
+
+        def chaves(inspecao: np.ndarray) -> Dict[str, object]:
+            return {'ponte': pd.Categorical.from_codes(codigos_ponte[inspecao], categories=pontes), 'data': datas[inspecao]}
+
+        def concatena(vetores: List[np.ndarray]) -> np.ndarray:
+            return np.concatenate(vetores) if vetores else np.zeros(0, dtype=np.float64)
+
+        estruturas = pd.DataFrame({
+            **chaves(np.arange(len(self))),
+            'g_d': np.array(inspecoes['g_d'], dtype=np.float64),
+            'nivel': pd.Categorical(inspecoes['nivel'], categories=NIVEIS_G_D, ordered=True),
+            'n_familias': np.array(inspecoes['n_familias'], dtype=np.int64),
+        })
+        f_r = np.array(familias['f_r'], dtype=np.float64)
+        g_df = np.array(familias['g_df'], dtype=np.float64)
+        tabela_familias = pd.DataFrame({
+            **chaves(inspecao_familia),
+            'familia': pd.Categorical.from_codes(codigos_familia, categories=list(self._familias)),
+            'f_r': f_r,
+            'g_df': g_df,
+            'f_r_g_df': f_r * g_df,
+            'gde_max': np.array(familias['gde_max'], dtype=np.float64),
+            'n_elementos': n_elementos,
+        })
+        elementos = pd.DataFrame({
+            **chaves(inspecao_elemento),
+            'familia': pd.Categorical.from_codes(codigos_familia[familia_elemento], categories=list(self._familias)),
+            'elemento': pd.Categorical.from_codes(np.array(self._codigos_elementos, dtype=np.int64), categories=list(self._elementos)),
+            **{chave: concatena(vetores) for chave, vetores in self._vetores.items()},
+        })
+        return {'elementos': elementos, 'familias': tabela_familias, 'estruturas': estruturas}
+
+    def escreve(self, destino: str | Path, formato: str = FORMATO_EXPORTACAO_PADRAO, particionar: Iterable[str] = ()) -> Dict[str, List[Path]]:
+        """
+        Grava as tabelas em destino/<tabela>.<formato> ou, com partição, em destino/<tabela>/ponte=<ponte>/data=<AAAA-MM-DD>/parte-0.<formato> (partições no estilo Hive, lidas por pyarrow.dataset, DuckDB, Spark etc.). Cada partição é a unidade de substituição: gravar de novo a mesma ponte e data substitui os arquivos da partição.
+
+        :param destino: Diretório de saída (criado se não existir).
+        :param formato: Formato dos arquivos (ver FORMATOS_EXPORTACAO). Parquet e Feather requerem o pacote opcional pyarrow; o padrão é Parquet se o pyarrow estiver instalado e CSV se não estiver (ver FORMATO_EXPORTACAO_PADRAO).
+        :param particionar: Colunas de partição, entre 'ponte' e 'data' (ex: ('ponte', 'data')). Se vazio, grava um arquivo por tabela.
+
+        :return: Dicionário {nome_da_tabela: lista de arquivos gravados}.
+        """
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f"Formato não suportado: {formato} (use {', '.join(FORMATOS_EXPORTACAO)})")
+        extensao, pacote = FORMATOS_EXPORTACAO[formato]
+        if pacote is not None and importlib.util.find_spec(pacote) is None:
+            raise ImportError(f"O formato {formato} requer o pacote {pacote} (pip install {pacote})")
+        particionar = [coluna for coluna in COLUNAS_PARTICAO if coluna in set(particionar)] if particionar else []
+        destino = Path(destino)
+        destino.mkdir(parents=True, exist_ok=True)
+
+        arquivos = {}
+        for nome, tabela in self.tabelas().items():
+            if not particionar:
+                arquivos[nome] = [self._grava(tabela, destino / f"{nome}{extensao}", formato)]
+                continue
+            arquivos[nome] = []
+            chaves_particao = [tabela[coluna] for coluna in particionar]
+            for chave, parte in tabela.drop(columns=particionar).groupby(chaves_particao, observed=True, sort=True):
+                pasta = destino.joinpath(nome, *(f"{coluna}={self._valor_particao(valor)}" for coluna, valor in zip(particionar, chave)))
+                pasta.mkdir(parents=True, exist_ok=True)
+                for antigo in pasta.glob(f"*{extensao}"):
+                    antigo.unlink()
+                # Cada arquivo leva só as categorias da sua partição (o dicionário do Parquet não cresce com o inventário)
+                parte = parte.reset_index(drop=True)
+                for coluna in parte.select_dtypes("category"):
+                    parte[coluna] = parte[coluna].cat.remove_unused_categories()
+                arquivos[nome].append(self._grava(parte, pasta / f"parte-0{extensao}", formato))
+        return arquivos
+
+    @staticmethod
+    def _valor_particao(valor: object) -> str:
+        if isinstance(valor, (pd.Timestamp, date)):
+            return valor.strftime("%Y-%m-%d")
+        return quote(str(valor), safe=" ")
+
+    @staticmethod
+    def _grava(tabela: pd.DataFrame, caminho: Path, formato: str) -> Path:
+        temporario = caminho.with_name(f".{caminho.name}.{os.getpid()}.tmp")
+        if formato == "parquet":
+            tabela.to_parquet(temporario, index=False)
+        elif formato == "feather":
+            tabela.to_feather(temporario)
+        else:
+            tabela.to_csv(temporario, index=False)
+        os.replace(temporario, caminho)
+        return caminho
+
+
+# Chaves de alinhamento e valores comparados em cada tabela de compara_inspecoes; o último valor define a situação da linha.
+COMPARACAO_TABELAS = {
+    'danos': (['familia', 'dano', 'ocorrencia', 'elemento'], ['fi', 'fp', 'd']),
+    'elementos': (['familia', 'elemento'], ['sum_d', 'd_max', 'g_de']),
+    'familias': (['familia'], ['f_r', 'g_df']),
+    'estrutura': ([], ['g_d']),
+}
+SITUACOES_DIFERENCA = ("novo", "removido", "agravado", "atenuado", "igual")
+
+
+def tabelas_inspecao(familias: Mapping[str, Tuple[pd.DataFrame, float]]) -> Dict[str, pd.DataFrame]:
+    """
+    Monta as tabelas de uma inspeção usadas na comparação entre inspeções (ver compara_inspecoes): 'danos' (uma linha por família, dano e elemento, com Fi, Fp e d; 'ocorrencia' numera os danos de mesmo nome na família), 'elementos' (sum_d, d_max e G_de), 'familias' (F_r e G_df) e 'estrutura' (G_d e nível).
+
+    :param familias: Dicionário {nome_da_família: (df_ajustado, f_r)}.
+
+    :return: Dicionário {nome_da_tabela: DataFrame}.
+    """
+    danos, elementos, resultados = [], [], {}
+    for nome, (df_ajustado, f_r) in familias.items():
+        nomes, fi, fp = extrai_matrizes_fi_fp(df_ajustado)
+        rotulos = pd.Series(rotulos_danos(df_ajustado), dtype=object)
+        codigos, d_fora = codifica_fi_fp(fi, fp)
+        resultado = resultados[nome] = ResultadoFamilia(nomes, *avalia_elementos_codigos(codigos, d_fora), f_r)
+        n_elementos = len(nomes)
+        danos.append(pd.DataFrame({
+            'familia': nome,
+            'dano': np.repeat(rotulos.to_numpy(), n_elementos),
+            'ocorrencia': np.repeat(rotulos.groupby(rotulos).cumcount().to_numpy(), n_elementos),
+            'elemento': np.tile(np.array(nomes, dtype=object), len(rotulos)),
+            'fi': fi.ravel(),
+            'fp': fp.ravel(),
+            'd': calcula_dano_codigos(codigos, d_fora).ravel(),
+        }))
+        elementos.append(pd.DataFrame({'familia': nome, 'elemento': np.array(nomes, dtype=object), 'sum_d': resultado.sum_d, 'd_max': resultado.d_max, 'g_de': resultado.g_de}))
+
+    g_d, nivel, _ = avaliar_estrutura(resultados)
+    colunas = {tabela: chaves + valores for tabela, (chaves, valores) in COMPARACAO_TABELAS.items()}
+    return {
+        'danos': pd.concat(danos, ignore_index=True) if danos else pd.DataFrame(columns=colunas['danos']),
+        'elementos': pd.concat(elementos, ignore_index=True) if elementos else pd.DataFrame(columns=colunas['elementos']),
+        'familias': pd.DataFrame({'familia': list(resultados), 'f_r': [float(r.f_r) for r in resultados.values()], 'g_df': [r.g_df for r in resultados.values()]}),
+        'estrutura': pd.DataFrame({'g_d': [g_d], 'nivel': [nivel]}),
+    }
+
+
+def tabelas_ponte(pasta_ponte: str | Path, fr_padrao: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Lê a inspeção de uma ponte (pasta com os .zip das famílias e/ou planilhas .xlsx da ponte, como em avalia_ponte) nas tabelas de tabelas_inspecao.
+
+    :param pasta_ponte: Pasta da ponte.
+    :param fr_padrao: F_r usado quando não for possível inferir o F_r pelo nome do arquivo ou da família.
+
+    :return: Dicionário {nome_da_tabela: DataFrame} (ver tabelas_inspecao).
+    """
+    familias = {}
+    for arquivo in sorted(Path(pasta_ponte).glob("*.zip")):
+        fr = infere_fr(arquivo.name) or fr_padrao
+        if fr is None:
+            raise ValueError(f"{arquivo.name}: F_r não identificado")
+        familia = processa_zip_familia(arquivo, arquivo.name, f_r=fr, ler_fotos=False)
+        familias[familia['nome_arquivo']] = (familia['tabela_original'], fr)
+    for arquivo in sorted(Path(pasta_ponte).glob("*.xlsx")):
+        for familia in processa_planilha_ponte(arquivo, fr_padrao=fr_padrao, ler_fotos=False):
+            if familia['f_r'] is None:
+                raise ValueError(f"{arquivo.name} ({familia['nome_arquivo']}): F_r não identificado")
+            familias[familia['nome_arquivo']] = (familia['tabela_original'], familia['f_r'])
+
+    if not familias:
+        raise ValueError("Nenhum arquivo .zip ou .xlsx encontrado")
+    return tabelas_inspecao(familias)
+
+
+def compara_lote(pares: Iterable[Tuple[str, Dict[str, pd.DataFrame], Dict[str, pd.DataFrame]]], somente_alteracoes: bool = True, tolerancia: float = 1e-9) -> Dict[str, pd.DataFrame]:
+    """
+    Compara pares de inspeções (anterior e atual) de uma só vez: as tabelas de todos os pares são empilhadas com a coluna 'ponte' e alinhadas por junções (merge) vetorizadas, sem laços por par ou por elemento. Ver compara_inspecoes.
+
+    :param pares: Iterável de tuplas (ponte, tabelas_anteriores, tabelas_atuais), com as tabelas de tabelas_inspecao.
+    :param somente_alteracoes: Se True, as tabelas 'danos' e 'elementos' trazem apenas as linhas alteradas, novas ou removidas (sem as células sem dano nas duas inspeções).
+    :param tolerancia: Diferença mínima para considerar um valor alterado.
+
+    :return: Dicionário {nome_da_tabela: DataFrame} com as tabelas 'danos', 'elementos', 'familias' e 'estrutura' (ver compara_inspecoes), cada uma com a coluna 'ponte' na frente.
+    """
+    pontes = []
+    lados = ({tabela: [] for tabela in COMPARACAO_TABELAS}, {tabela: [] for tabela in COMPARACAO_TABELAS})
+    for ponte, *inspecoes in pares:
+        pontes.append(ponte)
+        for lado, inspecao in zip(lados, inspecoes):
+            for tabela, partes in lado.items():
+                partes.append(inspecao[tabela])
+
+    def empilha(partes: List[pd.DataFrame], colunas: List[str]) -> pd.DataFrame:
+        if not partes:
+            return pd.DataFrame(columns=colunas)
+        # A coluna 'ponte' é criada de uma vez para a pilha inteira, e não em cada tabela
+        pilha = pd.concat(partes, ignore_index=True)
+        pilha.insert(0, 'ponte', np.repeat(np.array(pontes, dtype=object), [len(parte) for parte in partes]))
+        return pilha[colunas]
+
+    diferencas = {}
+    for tabela, (chaves, valores) in COMPARACAO_TABELAS.items():
+        chaves = ['ponte'] + chaves
+        extras = ['nivel'] if tabela == 'estrutura' else []
+        colunas = chaves + valores + extras
+        anterior, atual = (empilha(lado[tabela], colunas) for lado in lados)
+        juncao = anterior.merge(atual, on=chaves, how="outer", suffixes=("_anterior", ""), indicator=True, sort=False)
+
+        principal = valores[-1]
+        delta = {}
+        for valor in valores:
+            # Itens novos ou removidos contam como zero do lado ausente
+            delta[f"delta_{valor}"] = juncao[valor].fillna(0.0).astype(np.float64) - juncao[f"{valor}_anterior"].fillna(0.0).astype(np.float64)
+        variacao = delta[f"delta_{principal}"].to_numpy()
+        origem = juncao['_merge'].to_numpy()
+        # Código da situação (posição em SITUACOES_DIFERENCA)
+        situacao = np.select([origem == "right_only", origem == "left_only", variacao > tolerancia, variacao < -tolerancia], [0, 1, 2, 3], default=4)
+
+        resultado = juncao[chaves].copy()
+        for valor in valores + extras:
+            resultado[f"{valor}_anterior"] = juncao[f"{valor}_anterior"]
+            resultado[valor] = juncao[valor]
+            if valor in valores:
+                resultado[f"delta_{valor}"] = delta[f"delta_{valor}"]
+        resultado['situacao'] = pd.Categorical.from_codes(situacao, categories=SITUACOES_DIFERENCA)
+
+        if somente_alteracoes and tabela in ('danos', 'elementos'):
+            sem_dano = (juncao[f"{principal}_anterior"].fillna(0.0) == 0) & (juncao[principal].fillna(0.0) == 0)
+            if tabela == 'danos':
+                sem_dano &= (juncao['fi_anterior'].fillna(0.0) == 0) & (juncao['fi'].fillna(0.0) == 0)
+            manter = (situacao != 4) & ~sem_dano.to_numpy()
+            if tabela == 'elementos':
+                manter |= situacao <= 1
+            resultado = resultado[manter]
+        if tabela in ('danos', 'elementos'):
+            resultado = resultado.sort_values(['ponte', f"delta_{principal}"], ascending=[True, False], kind="stable")
+        diferencas[tabela] = resultado.reset_index(drop=True)
+    return diferencas
+
+
+def compara_inspecoes(anterior: Dict[str, pd.DataFrame], atual: Dict[str, pd.DataFrame], somente_alteracoes: bool = True, tolerancia: float = 1e-9) -> Dict[str, pd.DataFrame]:
+    """
+    Compara duas inspeções da mesma ponte. As famílias são alinhadas pelo nome, os elementos pelo nome (nome_elementos de adequa_dataset) e os danos pelo nome na coluna Danos (e pela ordem, entre danos de mesmo nome). Para cada tabela são calculadas as diferenças (delta_<valor> = atual − anterior) e a situação de cada linha: 'novo' (só na inspeção atual), 'removido' (só na anterior), 'agravado', 'atenuado' ou 'igual', segundo o último valor da tabela (d, G_de, G_df ou G_d; ver COMPARACAO_TABELAS).
+
+    :param anterior: Tabelas da inspeção anterior (ver tabelas_inspecao ou tabelas_ponte).
+    :param atual: Tabelas da inspeção atual.
+    :param somente_alteracoes: Se True, as tabelas 'danos' e 'elementos' trazem apenas as linhas alteradas, novas ou removidas.
+    :param tolerancia: Diferença mínima para considerar um valor alterado.
+
+    :return: Dicionário {nome_da_tabela: DataFrame} com as tabelas 'danos' (Fi, Fp e d), 'elementos' (sum_d, d_max e G_de), 'familias' (F_r e G_df) e 'estrutura' (G_d e nível), com as colunas <valor>_anterior, <valor>, delta_<valor> e 'situacao'. As tabelas 'danos' e 'elementos' vêm em ordem decrescente de agravamento.
+    """
+    diferencas = compara_lote([("", anterior, atual)], somente_alteracoes=somente_alteracoes, tolerancia=tolerancia)
+    return {tabela: diferenca.drop(columns="ponte") for tabela, diferenca in diferencas.items()}
+
+
+class RankingPrioridades:
+    """
+    Ranking das piores pontes, famílias e elementos de uma rede de pontes, alimentado inspeção a inspeção. Para cada nível de deterioração da ponte (NIVEIS_G_D), mantém heaps limitados aos k maiores valores de G_d (pontes), de F_r × G_df (famílias) e de G_de (elementos), de modo que a memória é O(k) e não cresce com o inventário.
+
+    :param k: Número de itens mantidos por nível em cada ranking.
+    """
+
+    TIPOS = {
+        'pontes': ('g_d', ['ponte']),
+        'familias': ('f_r × g_df', ['ponte', 'familia']),
+        'elementos': ('g_de', ['ponte', 'familia', 'elemento']),
+    }
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self.n_inspecoes = 0
+        self._heaps = {tipo: {nivel: [] for nivel in NIVEIS_G_D} for tipo in self.TIPOS}
+        self._contador = 0
+
+    def _empilha(self, heap: list, valor: float, item: tuple) -> None:
+        self._contador += 1
+        if len(heap) < self.k:
+            heapq.heappush(heap, (valor, self._contador, item))
+        elif valor > heap[0][0]:
+            heapq.heappushpop(heap, (valor, self._contador, item))
+
+    def _minimo(self, heap: list) -> float:
+        return heap[0][0] if len(heap) >= self.k else -np.inf
+
+    def adiciona(self, ponte: str, resultados_familias: Dict[str, Dict[str, float]]) -> None:
+        """
+        Adiciona a inspeção de uma ponte aos rankings.
+
+        :param ponte: Identificação da ponte.
+        :param resultados_familias: Resultados das famílias (avalia_familia ou avalia_familia_compacta).
+        """
+        g_d, nivel, _ = avaliar_estrutura(resultados_familias)
+        self.n_inspecoes += 1
+        self._empilha(self._heaps['pontes'][nivel], g_d, (ponte,))
+
+        heap_familias = self._heaps['familias'][nivel]
+        heap_elementos = self._heaps['elementos'][nivel]
+        for familia, dados in resultados_familias.items():
+            self._empilha(heap_familias, float(dados['f_r × g_df']), (ponte, familia))
+
+            if isinstance(dados, ResultadoFamilia):
+                elementos, g_de = dados.elementos, dados.g_de
+            else:
+                elementos = list(dados['resultados_elemento'])
+                g_de = np.array([r['g_de'] for r in dados['resultados_elemento'].values()], dtype=np.float64)
+            # Só os k maiores G_de da família que superam o menor valor do heap podem entrar no ranking (empates: o primeiro elemento)
+            candidatos = np.flatnonzero(g_de > self._minimo(heap_elementos))
+            if len(candidatos) > self.k:
+                candidatos = candidatos[np.argsort(-g_de[candidatos], kind="stable")[:self.k]]
+            for indice in candidatos:
+                self._empilha(heap_elementos, float(g_de[indice]), (ponte, familia, elementos[indice]))
+
+    def adiciona_lote(self, inspecoes: Iterable[Tuple[str, Dict[str, Dict[str, float]]]]) -> "RankingPrioridades":
+        """
+        Adiciona várias inspeções, consumidas uma a uma (ex: gerador que lê as pontes sob demanda).
+
+        :param inspecoes: Iterável de tuplas (ponte, resultados_familias).
+
+        :return: O próprio ranking.
+        """
+        for ponte, resultados_familias in inspecoes:
+            self.adiciona(ponte, resultados_familias)
+        return self
 
-    if g_d <= 15:
-        nivel = "Baixo"
-        recomendacao = "Estado aceitável. Manutenção preventiva."
-    elif g_d <= 50:
-        nivel = "Médio"
-        recomendacao = "Nova inspeção e plano de intervenção em longo prazo (até 2 anos)."
-    elif g_d <= 80:
-        nivel = "Alto"
-        recomendacao = "Inspeção detalhada e intervenção em médio prazo (até 18 meses)."
+    def tabela(self, tipo: str = 'pontes') -> pd.DataFrame:
+        """
+        Exporta um ranking como tabela, agrupado por nível de deterioração da ponte (do Sofrível ao Baixo) e em ordem decrescente de valor dentro de cada nível.
+
+        :param tipo: 'pontes' (G_d), 'familias' (F_r × G_df) ou 'elementos' (G_de).
+
+        :return: DataFrame com as colunas 'nivel', 'posicao', as colunas de identificação do tipo e a coluna do valor.
+        """
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Tipo de ranking inválido: {tipo}")
+        coluna_valor, colunas = self.TIPOS[tipo]
+
+        linhas = []
+        for nivel in reversed(NIVEIS_G_D):
+            itens = sorted(self._heaps[tipo][nivel], key=lambda entrada: (-entrada[0], entrada[1]))
+            linhas.extend((nivel, posicao, *item, valor) for posicao, (valor, _, item) in enumerate(itens, start=1))
+
+        return pd.DataFrame(linhas, columns=['nivel', 'posicao', *colunas, coluna_valor])
+
+
+# Espaços de nomes do formato .xlsx (Office Open XML) usados pelo leitor dedicado das planilhas modelo.
+_NS_XLSX = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Mesmos textos que o pandas interpreta como ausentes ao ler planilhas.
+VALORES_AUSENTES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+def _coluna_da_referencia(referencia: str) -> int:
+    indice = 0
+    for caractere in referencia:
+        if not caractere.isalpha():
+            break
+        indice = indice * 26 + (ord(caractere.upper()) - 64)
+    return indice - 1
+
+
+def _texto_xlsx(elemento) -> str:
+    # Concatena os trechos <t> de um texto (simples ou formatado), ignorando a transcrição fonética <rPh>
+    if elemento.find(f"{_NS_XLSX}t") is not None and len(elemento) == 1:
+        return elemento[0].text or ""
+    return "".join(t.text or "" for filho in elemento if filho.tag in (f"{_NS_XLSX}t", f"{_NS_XLSX}r") for t in filho.iter(f"{_NS_XLSX}t"))
+
+
+def _caminho_aba_xlsx(zip_ref: zipfile.ZipFile, aba: int | str) -> str:
+    workbook = ElementTree.fromstring(zip_ref.read("xl/workbook.xml"))
+    abas = workbook.find(f"{_NS_XLSX}sheets")
+    if isinstance(aba, int):
+        elemento = abas[aba]
     else:
-        nivel = "Sofrível"
-        recomendacao = "Inspeção detalhada e intervenção em curto prazo."
+        elemento = next((s for s in abas if s.get("name") == aba), None)
+        if elemento is None:
+            raise ValueError(f"Aba '{aba}' não encontrada na planilha")
+    rid = elemento.get(f"{_NS_REL}id")
 
-    return g_d, nivel, recomendacao
+    relacoes = ElementTree.fromstring(zip_ref.read("xl/_rels/workbook.xml.rels"))
+    alvo = next(r.get("Target") for r in relacoes.iter(f"{_NS_PKG_REL}Relationship") if r.get("Id") == rid)
+    return alvo.lstrip("/") if alvo.startswith("/") else f"xl/{alvo}"
+
+
+def _textos_compartilhados_xlsx(zip_ref: zipfile.ZipFile) -> List[str]:
+    textos = []
+    if "xl/sharedStrings.xml" in zip_ref.namelist():
+        with zip_ref.open("xl/sharedStrings.xml") as xml:
+            for _, elemento in ElementTree.iterparse(xml):
+                if elemento.tag == f"{_NS_XLSX}si":
+                    textos.append(_texto_xlsx(elemento))
+                    elemento.clear()
+    return textos
+
+
+def _le_aba_xlsx(zip_ref: zipfile.ZipFile, textos: List[str], caminho_aba: str) -> Tuple[List[list], List[str]]:
+    # Lê os valores das células (ver linhas_xlsx) e as referências das células mescladas (ex: "C3:O3") de uma aba
+    tag_linha, tag_celula, tag_valor, tag_inline, tag_mescla = (f"{_NS_XLSX}{t}" for t in ("row", "c", "v", "is", "mergeCell"))
+    linhas = []
+    mescladas = []
+    with zip_ref.open(caminho_aba) as xml:
+        for _, elemento in ElementTree.iterparse(xml):
+            if elemento.tag == tag_mescla:
+                mescladas.append(elemento.get("ref"))
+                continue
+            if elemento.tag != tag_linha:
+                continue
+
+            numero = int(elemento.get("r", len(linhas) + 1))
+            while len(linhas) < numero - 1:
+                linhas.append([])
+
+            linha = []
+            for celula in elemento.iter(tag_celula):
+                referencia = celula.get("r")
+                coluna = _coluna_da_referencia(referencia) if referencia else len(linha)
+                tipo = celula.get("t", "n")
+                valor = celula.find(tag_valor)
+                texto = valor.text if valor is not None else None
+
+                if tipo == "inlineStr":
+                    inline = celula.find(tag_inline)
+                    conteudo = _texto_xlsx(inline) if inline is not None else ""
+                elif texto is None:
+                    conteudo = ""
+                elif tipo == "n":
+                    numero_celula = float(texto)
+                    conteudo = int(numero_celula) if numero_celula.is_integer() else numero_celula
+                elif tipo == "s":
+                    conteudo = textos[int(texto)]
+                elif tipo == "b":
+                    conteudo = texto == "1"
+                elif tipo == "e":
+                    conteudo = np.nan
+                else:
+                    conteudo = texto
+
+                if coluna >= len(linha):
+                    linha.extend([""] * (coluna - len(linha) + 1))
+                linha[coluna] = conteudo
+
+            while linha and linha[-1] == "":
+                linha.pop()
+            linhas.append(linha)
+            elemento.clear()
+
+    while linhas and not linhas[-1]:
+        linhas.pop()
+    largura = max((len(linha) for linha in linhas), default=0)
+    return [linha + [""] * (largura - len(linha)) for linha in linhas], mescladas
+
+
+def linhas_xlsx(arquivo: bytes | str | Path | IO[bytes], aba: int | str = 0) -> List[list]:
+    """
+    Lê os valores das células de uma aba de um arquivo .xlsx, em modo somente leitura e em fluxo (XML da aba lido elemento a elemento), sem carregar estilos, imagens ou outras abas. As células seguem as mesmas convenções do pandas: vazias como "", erros como NaN e números inteiros como int.
+
+    :param arquivo: Bytes, caminho ou objeto de arquivo binário do .xlsx.
+    :param aba: Índice (a partir de 0) ou nome da aba.
+
+    :return: Lista de linhas (listas de valores), todas com a mesma largura. Linhas vazias ao final são descartadas.
+    """
+    if isinstance(arquivo, bytes):
+        arquivo = io.BytesIO(arquivo)
+
+    with zipfile.ZipFile(arquivo) as zip_ref:
+        linhas, _ = _le_aba_xlsx(zip_ref, _textos_compartilhados_xlsx(zip_ref), _caminho_aba_xlsx(zip_ref, aba))
+    return linhas
+
+
+def _dataframe_modelo(linhas: List[list]) -> pd.DataFrame:
+    # Monta o DataFrame com cabeçalho em dois níveis a partir das linhas de uma aba no formato da planilha modelo
+    if len(linhas) < 2:
+        raise ValueError("A planilha deve ter duas linhas de cabeçalho (elemento e Fi/Fp)")
+
+    # Preenche as células mescladas do cabeçalho apenas dentro do mesmo elemento, como o pandas
+    controle = [True] * len(linhas[0])
+    for cabecalho in linhas[:2]:
+        anterior = cabecalho[0]
+        for i in range(1, len(cabecalho)):
+            if not controle[i]:
+                anterior = cabecalho[i]
+            if cabecalho[i] == "":
+                cabecalho[i] = anterior
+            else:
+                controle[i] = False
+                anterior = cabecalho[i]
+
+    # Cabeçalhos vazios e repetidos recebem os mesmos nomes que o pandas dá ("Unnamed: i_level_n" e sufixo ".k" no último nível)
+    nomes = []
+    repeticoes = {}
+    for i, nome in enumerate(zip(*linhas[:2])):
+        nome = tuple(parte if parte != "" else f"Unnamed: {i}_level_{n}" for n, parte in enumerate(nome))
+        k = repeticoes.get(nome, 0)
+        repeticoes[nome] = k + 1
+        nomes.append(nome if k == 0 else (nome[0], f"{nome[1]}.{k}"))
+
+    colunas = {}
+    for i, valores in enumerate(zip(*linhas[2:]) if len(linhas) > 2 else [()] * len(nomes)):
+        serie = pd.Series([np.nan if isinstance(valor, str) and valor in VALORES_AUSENTES else valor for valor in valores], dtype=None if valores else object)
+        # Como em pd.read_excel, colunas de textos numéricos viram numéricas; as demais ficam com o tipo inferido pelo pandas
+        if len(serie) and serie.dtype.kind in "OUT":
+            try:
+                serie = pd.to_numeric(serie)
+            except (ValueError, TypeError):
+                pass
+        colunas[i] = serie
+
+    df = pd.DataFrame(colunas)
+    df.columns = pd.MultiIndex.from_tuples(nomes)
+    return df
+
+
+def le_planilha_modelo(arquivo: bytes | str | Path | IO[bytes], aba: int | str = 0) -> pd.DataFrame:
+    """
+    Leitor dedicado da planilha modelo GDE/UnB (.xlsx). Equivale a pd.read_excel(arquivo, header=[0, 1]), mas lê apenas os valores da aba indicada, em fluxo (ver linhas_xlsx), e reconstrói o cabeçalho em dois níveis (elemento, Fi/Fp). O resultado pode ser passado diretamente para adequa_dataset.
+
+    :param arquivo: Bytes, caminho ou objeto de arquivo binário do .xlsx.
+    :param aba: Índice (a partir de 0) ou nome da aba.
+
+    :return: DataFrame com colunas em dois níveis (elemento, Fi/Fp), como o de pd.read_excel.
+    """
+    return _dataframe_modelo(linhas_xlsx(arquivo, aba))
+
+
+_NS_DESENHO = "{http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing}"
+_NS_DRAWINGML = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+
+def _relacoes_xlsx(zip_ref: zipfile.ZipFile, caminho: str) -> Dict[str, str]:
+    # Relações (Id → caminho no .zip) de uma parte do .xlsx, como uma aba ou um desenho
+    pasta, nome = posixpath.split(caminho)
+    caminho_relacoes = f"{pasta}/_rels/{nome}.rels"
+    if caminho_relacoes not in zip_ref.namelist():
+        return {}
+
+    relacoes = {}
+    for relacao in ElementTree.fromstring(zip_ref.read(caminho_relacoes)).iter(f"{_NS_PKG_REL}Relationship"):
+        if relacao.get("TargetMode") == "External":
+            continue
+        alvo = relacao.get("Target")
+        relacoes[relacao.get("Id")] = alvo.lstrip("/") if alvo.startswith("/") else posixpath.normpath(posixpath.join(pasta, alvo))
+    return relacoes
+
+
+def _imagens_aba_xlsx(zip_ref: zipfile.ZipFile, caminho_aba: str) -> List[Tuple[int, int, str]]:
+    # Imagens ancoradas em uma aba: linha e coluna (a partir de 0) do canto superior esquerdo e caminho da imagem (xl/media)
+    imagens = []
+    for caminho_desenho in _relacoes_xlsx(zip_ref, caminho_aba).values():
+        if not caminho_desenho.startswith("xl/drawings/") or caminho_desenho not in zip_ref.namelist():
+            continue
+        midias = _relacoes_xlsx(zip_ref, caminho_desenho)
+        for ancora in ElementTree.fromstring(zip_ref.read(caminho_desenho)):
+            inicio = ancora.find(f"{_NS_DESENHO}from")
+            imagem = next(ancora.iter(f"{_NS_DRAWINGML}blip"), None)
+            midia = midias.get(imagem.get(f"{_NS_REL}embed")) if imagem is not None else None
+            if inicio is not None and midia:
+                imagens.append((int(inicio.findtext(f"{_NS_DESENHO}row")), int(inicio.findtext(f"{_NS_DESENHO}col")), midia))
+    return imagens
+
+
+def familia_do_elemento(nome_elemento: str) -> str:
+    """
+    Nome da família de um elemento, obtido retirando do nome do elemento a numeração e a posição finais (ex: "Pilar P 01" → "Pilar", "Viga Lateral (Montante)" → "Viga Lateral").
+
+    :param nome_elemento: Nome do elemento.
+
+    :return: Nome da família.
+    """
+    nome = str(nome_elemento).strip()
+    return re.sub(r"(\s*\([^)]*\)|\s+[A-Za-z]?\s*\d+[A-Za-z]?)+$", "", nome) or nome
+
+
+def _blocos_elementos(linhas: List[list], mescladas: List[str]) -> List[Dict[str, object]]:
+    # Blocos por elemento: linha "Elemento | <nome>", linha de cabeçalho "Danos | Fi | Fp" e uma linha por dano, até a primeira linha sem dano
+    fim_mescla = {}
+    for referencia in mescladas:
+        inicio, _, fim = referencia.partition(":")
+        linha_inicio = int(re.sub(r"\D", "", inicio)) - 1
+        fim_mescla[(linha_inicio, _coluna_da_referencia(inicio))] = _coluna_da_referencia(fim or inicio)
+
+    blocos = []
+    for i in range(len(linhas) - 1):
+        textos = [str(valor).strip().lower() for valor in linhas[i]]
+        cabecalho = [str(valor).strip().lower() for valor in linhas[i + 1]]
+        if "elemento" not in textos or "fi" not in cabecalho or "fp" not in cabecalho:
+            continue
+        coluna_rotulo = textos.index("elemento")
+        coluna_nome = next((c for c in range(coluna_rotulo + 1, len(textos)) if textos[c]), None)
+        if coluna_nome is None:
+            continue
+
+        coluna_fi, coluna_fp = cabecalho.index("fi"), cabecalho.index("fp")
+        coluna_danos = cabecalho.index("danos") if "danos" in cabecalho else coluna_rotulo
+        danos = []
+        for linha in linhas[i + 2:]:
+            dano = str(linha[coluna_danos]).strip()
+            if not dano or dano.lower() == "elemento":
+                break
+            danos.append((dano, linha[coluna_fi], linha[coluna_fp]))
+
+        ocupadas = [c for r in (i, i + 1) for c, valor in enumerate(linhas[r]) if str(valor).strip()]
+        coluna_fim = max([*ocupadas, *(fim_mescla.get((r, c), c) for r in (i, i + 1) for c in ocupadas)])
+        blocos.append({'nome': str(linhas[i][coluna_nome]).strip(), 'linha': i, 'coluna_fim': coluna_fim, 'danos': danos})
+
+    for bloco, seguinte in zip(blocos, blocos[1:] + [None]):
+        bloco['linha_fim'] = seguinte['linha'] if seguinte else len(linhas) + 1
+    return blocos
+
+
+def _linhas_bloco(bloco: Dict[str, object]) -> Iterator[Tuple[Tuple[str, int], object, object]]:
+    # Linhas (dano, ocorrência do dano no bloco), Fi e Fp de um bloco; um dano repetido no bloco gera uma linha por ocorrência
+    ocorrencias = Counter()
+    for dano, fi, fp in bloco['danos']:
+        ocorrencias[dano] += 1
+        yield (dano, ocorrencias[dano]), fi, fp
+
+
+def _dataframe_blocos(blocos: List[Dict[str, object]]) -> Tuple[pd.DataFrame, List[str]]:
+    # Dados ajustados (colunas "Danos", "Fi - <elemento>" e "Fp - <elemento>", como os de adequa_dataset) de um grupo de blocos
+    linhas = list(dict.fromkeys(chave for bloco in blocos for chave, _, _ in _linhas_bloco(bloco)))
+    colunas = {'Danos': [dano for dano, _ in linhas]}
+    nomes = []
+    for bloco in blocos:
+        nome, n = bloco['nome'], 1
+        while nome in nomes:  # elementos com o mesmo nome: "X", "X (2)", "X (3)", ...
+            n += 1
+            nome = f"{bloco['nome']} ({n})"
+        nomes.append(nome)
+        valores = {chave: (fi, fp) for chave, fi, fp in _linhas_bloco(bloco)}
+        for k, prefixo in enumerate(("Fi", "Fp")):
+            coluna = [valores[chave][k] if chave in valores else np.nan for chave in linhas]
+            colunas[f"{prefixo} - {nome}"] = pd.to_numeric(pd.Series(coluna, dtype=object).replace("", np.nan), errors="coerce")
+    return pd.DataFrame(colunas), sorted(nomes)
+
+
+def _inclui_familia(familias: Dict[str, Dict[str, object]], nome_familia: str, origem: str) -> None:
+    # Registra a família (pelo nome, sem diferenciar maiúsculas) lida da origem informada (aba modelo ou blocos de uma aba)
+    chave = nome_familia.casefold()
+    if chave in familias:
+        raise ValueError(f"Família {nome_familia} repetida na planilha ({familias[chave]['origem']} e {origem}).")
+    familias[chave] = {'nome_familia': nome_familia, 'origem': origem}
+
+
+def le_planilha_ponte(arquivo: bytes | str | Path | IO[bytes], ler_fotos: bool = True) -> List[Dict[str, object]]:
+    """
+    Lê uma planilha (.xlsx) com todas as famílias de uma ponte, abrindo o arquivo uma única vez. Cada aba pode estar em um de dois formatos: (a) o da planilha modelo (ver le_planilha_modelo), com uma família por aba, nomeada pela aba, ou (b) blocos por elemento ("Elemento" seguido do cabeçalho "Danos, Fi, Fp"), como a aba METODOLOGIA GDE-UNB das planilhas de campo, em que os elementos são agrupados em famílias pelo nome (ver familia_do_elemento). Blocos de uma mesma família em abas diferentes são reunidos; uma família que aparece também como aba modelo (ou em duas abas modelo) gera ValueError. Abas em outros formatos são ignoradas.
+
+    As fotos de cada família são as imagens embutidas na planilha (xl/media) ancoradas na aba da família ou dentro dos blocos dos seus elementos; imagens fora dos blocos (ex: figuras da metodologia ao lado da tabela) são ignoradas. As fotos são lidas do arquivo somente quando usadas.
+
+    :param arquivo: Bytes, caminho ou objeto de arquivo binário do .xlsx.
+    :param ler_fotos: Se False, as fotos não são listadas.
+
+    :return: Lista de dicionários, um por família, com as chaves: (a) 'nome_familia': Nome da família, (b) 'tabela_original': Dados da inspeção em colunas simples, (c) 'nome_elementos': Nomes dos elementos, (d) 'f_r': F_r inferido pelo nome da família (ver infere_fr) ou None, (e) 'fotos': Lista de tuplas (nome_da_imagem, função que lê os bytes da imagem).
+    """
+    if isinstance(arquivo, bytes):
+        arquivo = io.BytesIO(arquivo)
+
+    familias = {}
+    with etapa("le_planilha_ponte") as registro, zipfile.ZipFile(arquivo) as zip_ref:
+        registro['bytes'] = sum(info.compress_size for info in zip_ref.infolist())
+        textos = _textos_compartilhados_xlsx(zip_ref)
+        abas = [aba.get("name") for aba in ElementTree.fromstring(zip_ref.read("xl/workbook.xml")).find(f"{_NS_XLSX}sheets")]
+
+        for aba in abas:
+            caminho_aba = _caminho_aba_xlsx(zip_ref, aba)
+            linhas, mescladas = _le_aba_xlsx(zip_ref, textos, caminho_aba)
+            imagens = _imagens_aba_xlsx(zip_ref, caminho_aba) if ler_fotos else []
+
+            if len(linhas) >= 2 and "Danos" in (str(v).strip() for v in linhas[0]) and {"Fi", "Fp"} <= {str(v).strip() for v in linhas[1]}:
+                _inclui_familia(familias, aba, f"aba {aba}")
+                df_ajustado, nome_elementos = adequa_dataset(_dataframe_modelo(linhas))
+                familias[aba.casefold()].update(tabela_original=df_ajustado, nome_elementos=nome_elementos, midias=[m for _, _, m in imagens])
+                continue
+
+            grupos = {}
+            for bloco in _blocos_elementos(linhas, mescladas):
+                grupos.setdefault(familia_do_elemento(bloco['nome']).casefold(), []).append(bloco)
+            for chave, blocos in grupos.items():
+                if chave not in familias or 'blocos' not in familias[chave]:  # a família pode continuar em outra aba
+                    _inclui_familia(familias, familia_do_elemento(blocos[0]['nome']), f"blocos da aba {aba}")
+                    familias[chave].update(blocos=[], midias=[])
+                familias[chave]['blocos'] += blocos
+                familias[chave]['midias'] += [midia for linha, coluna, midia in sorted(imagens)
+                                              if any(b['linha'] <= linha < b['linha_fim'] and coluna <= b['coluna_fim'] for b in blocos)]
+
+    saida = []
+    for familia in familias.values():
+        if 'blocos' in familia:
+            familia['tabela_original'], familia['nome_elementos'] = _dataframe_blocos(familia.pop('blocos'))
+        nome_familia = familia['nome_familia']
+        midias = [m for m in dict.fromkeys(familia['midias']) if m.lower().endswith(EXTENSOES_IMAGEM)]
+        fotos = [(posixpath.basename(midia), partial(le_entrada_zip, arquivo, midia)) for midia in midias]
+        saida.append({'nome_familia': nome_familia, 'tabela_original': familia['tabela_original'], 'nome_elementos': familia['nome_elementos'],
+                      'f_r': infere_fr(nome_familia), 'fotos': fotos})
+    return saida
+
+
+def le_planilha(dados: bytes, cache: Optional[CachePlanilhas] = None) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Lê a planilha de inspeção (cabeçalho em dois níveis) e a adequa com adequa_dataset. Arquivos .xlsx são lidos com le_planilha_modelo; arquivos .xls, com o pandas. Se um cache for informado e a planilha já tiver sido lida, a leitura do Excel é evitada.
+
+    :param dados: Bytes do arquivo da planilha.
+    :param cache: Cache de planilhas opcional.
+
+    :return: Uma tupla com dois elementos: (a) df_ajustado: Dados da inspeção em colunas simples, (b) nome_elementos: Nomes dos elementos estruturais.
+    """
+    if cache is not None:
+        chave = cache.chave(dados)
+        em_cache = cache.obter(chave)
+        if em_cache is not None:
+            return em_cache
+
+    with etapa("le_planilha", len(dados)):
+        if dados[:2] == b"PK":
+            df_raw = le_planilha_modelo(dados)
+        else:  # .xls (formato binário antigo)
+            df_raw = pd.read_excel(io.BytesIO(dados), header=[0, 1])
+        df_ajustado, nome_elementos = adequa_dataset(df_raw)
+
+    if cache is not None:
+        cache.guardar(chave, df_ajustado, nome_elementos)
+
+    return df_ajustado, nome_elementos
+
+
+def infere_fr(nome_familia: str) -> Optional[int]:
+    """
+    Infere o fator de importância F_r de uma família a partir do nome do arquivo, conforme a tabela FR_DESCRICAO.
+
+    :param nome_familia: Nome do arquivo ou da família (ex: "pilares.zip").
+
+    :return: O F_r inferido ou None quando o nome não corresponde a nenhuma família conhecida.
+    """
+    nome = unicodedata.normalize("NFKD", nome_familia).encode("ascii", "ignore").decode("ascii").lower()
+    for fr, padrao in FR_PALAVRAS_CHAVE:
+        if re.search(rf"(?<![a-z])(?:{padrao})", nome):
+            return fr
+    return None
+
+
+def le_entrada_zip(arquivo_zip: str | Path | IO[bytes], nome_entrada: str) -> bytes:
+    """
+    Lê os bytes de um arquivo contido em um .zip.
+
+    :param arquivo_zip: Caminho do arquivo .zip ou objeto de arquivo aberto em modo binário.
+    :param nome_entrada: Nome do arquivo dentro do .zip.
+
+    :return: Conteúdo do arquivo em bytes.
+    """
+    if isinstance(arquivo_zip, io.BytesIO):
+        # Cursor próprio sobre os mesmos bytes: leituras em paralelo (ex: prepara_fotos) não disputam a posição do arquivo
+        arquivo_zip = io.BytesIO(arquivo_zip.getvalue())
+    with zipfile.ZipFile(arquivo_zip, 'r') as zip_ref:
+        return zip_ref.read(nome_entrada)
+
+
+def processa_zip_familia(arquivo_zip: str | Path | IO[bytes], nome_zip: str, f_r: float, ler_fotos: bool = True, cache: Optional[CachePlanilhas] = None) -> Dict[str, object]:
+    """
+    Processa o arquivo .zip de uma família: lê a planilha de inspeção, avalia a família e (opcionalmente) lista as fotos da pasta "fotos". As fotos não são carregadas aqui: cada uma é lida do .zip somente quando o relatório é escrito.
+
+    :param arquivo_zip: Caminho do arquivo .zip ou objeto de arquivo aberto em modo binário.
+    :param nome_zip: Nome do arquivo .zip (com ou sem extensão), usado para compor o nome da família.
+    :param f_r: Fator de importância da família.
+    :param ler_fotos: Se False, as fotos não são lidas (útil no modo em lote).
+    :param cache: Cache de planilhas opcional (ver CachePlanilhas).
+
+    :return: Dicionário com as chaves: (a) 'nome_arquivo': Nome da família, (b) 'tabela_original': DataFrame lido da planilha, (c) 'nome_elementos': Nomes dos elementos, (d) 'fotos': Lista de tuplas (nome_da_imagem, função que lê os bytes da imagem), (e) 'resultado': Dicionário {nome_da_família: ResultadoFamilia}, como em avalia_familia_compacta, (f) 'problemas': Problemas encontrados na planilha (ver valida_dataset).
+    """
+    with etapa("leitura_zip") as registro, zipfile.ZipFile(arquivo_zip, 'r') as zip_ref:
+        registro['bytes'] = sum(info.compress_size for info in zip_ref.infolist())
+        planilha_nome = next((f for f in zip_ref.namelist() if f.endswith(('.xlsx', '.xls'))), None)
+        if not planilha_nome:
+            raise ValueError("Nenhuma planilha encontrada no .zip")
+
+        fotos = []
+        if ler_fotos:
+            for file in zip_ref.namelist():
+                if file.startswith("fotos/") and file.lower().endswith(EXTENSOES_IMAGEM):
+                    fotos.append((file.split("/")[-1], partial(le_entrada_zip, arquivo_zip, file)))
+
+        df_ajustado, nome_elementos = le_planilha(zip_ref.read(planilha_nome), cache=cache)
+
+    nome_planilha = os.path.splitext(os.path.basename(planilha_nome))[0]
+    nome_arquivo = f"{os.path.splitext(nome_zip)[0]}_{nome_planilha}"
+    with etapa("avalia_familia"):
+        elementos, codigos, d_fora, problemas = valida_dataset_codigos(df_ajustado)
+        resultado = {nome_arquivo: ResultadoFamilia(elementos, *avalia_elementos_codigos(codigos, d_fora), f_r)}
+
+    return {
+        'nome_arquivo': nome_arquivo,
+        'tabela_original': df_ajustado,
+        'nome_elementos': nome_elementos,
+        'fotos': fotos,
+        'resultado': resultado,
+        'problemas': problemas,
+    }
+
+
+def processa_planilha_ponte(arquivo: bytes | str | Path | IO[bytes], fr_padrao: Optional[int] = None, ler_fotos: bool = True, n_workers: Optional[int] = None) -> List[Dict[str, object]]:
+    """
+    Processa a planilha única de uma ponte (ver le_planilha_ponte): detecta as famílias e as avalia em paralelo (pool de threads).
+
+    :param arquivo: Bytes, caminho ou objeto de arquivo binário do .xlsx.
+    :param fr_padrao: F_r usado para famílias cujo nome não permite inferir o F_r.
+    :param ler_fotos: Se False, as fotos não são listadas.
+    :param n_workers: Número de threads. Se None, usa o padrão do ThreadPoolExecutor.
+
+    :return: Lista de dicionários, um por família, com as mesmas chaves de processa_zip_familia ('nome_arquivo' é o nome da família) e a chave 'f_r' (None se não identificado; nesse caso o resultado é calculado com F_r = 1 e deve ser ajustado com aplica_fr).
+    """
+    familias = le_planilha_ponte(arquivo, ler_fotos=ler_fotos)
+
+    def avalia(familia: Dict[str, object]) -> Tuple[Dict[str, ResultadoFamilia], pd.DataFrame]:
+        with etapa(f"avalia_familia ({familia['nome_familia']})"):
+            elementos, codigos, d_fora, problemas = valida_dataset_codigos(familia['tabela_original'])
+            resultado = ResultadoFamilia(elementos, *avalia_elementos_codigos(codigos, d_fora), familia['f_r'] or 1)
+            return {familia['nome_familia']: resultado}, problemas
+
+    for familia in familias:
+        familia['f_r'] = familia['f_r'] or fr_padrao
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        resultados = list(executor.map(avalia, familias))
+
+    return [
+        {
+            'nome_arquivo': familia['nome_familia'],
+            'tabela_original': familia['tabela_original'],
+            'nome_elementos': familia['nome_elementos'],
+            'fotos': familia['fotos'],
+            'resultado': resultado,
+            'problemas': problemas,
+            'f_r': familia['f_r'],
+        }
+        for familia, (resultado, problemas) in zip(familias, resultados)
+    ]
+
+
+def avalia_ponte(pasta_ponte: str | Path, fr_padrao: Optional[int] = None, com_resultados: bool = False) -> Dict[str, object]:
+    """
+    Avalia uma ponte a partir de uma pasta com um arquivo .zip por família e/ou planilhas .xlsx com várias famílias (ver processa_planilha_ponte). O F_r de cada família é inferido pelo nome do arquivo ou da família (ver infere_fr). Erros são registrados na linha de resumo em vez de interromper o lote.
+
+    :param pasta_ponte: Pasta da ponte contendo os arquivos .zip das famílias ou as planilhas .xlsx da ponte.
+    :param fr_padrao: F_r usado quando não for possível inferir o F_r pelo nome do arquivo. Se None, a família é considerada inválida.
+    :param com_resultados: Se True, inclui na linha a chave 'resultados' com os resultados das famílias (ex: para o HistoricoInspecoes).
+
+    :return: Linha de resumo com as chaves 'ponte', 'familias', 'g_d', 'nivel', 'recomendacao', 'problemas' (número de problemas apontados por valida_dataset) e 'erro'.
+    """
+    pasta_ponte = Path(pasta_ponte)
+    linha = {'ponte': pasta_ponte.name, 'familias': 0, 'g_d': None, 'nivel': None, 'recomendacao': None, 'problemas': 0, 'erro': None}
+    resultados_familias = {}
+    erros = []
+
+    for arquivo in sorted(pasta_ponte.glob("*.zip")):
+        fr = infere_fr(arquivo.name) or fr_padrao
+        if fr is None:
+            erros.append(f"{arquivo.name}: F_r não identificado")
+            continue
+        try:
+            familia = processa_zip_familia(arquivo, arquivo.name, f_r=fr, ler_fotos=False)
+        except Exception as erro:
+            erros.append(f"{arquivo.name}: {erro}")
+            continue
+        resultados_familias.update(familia['resultado'])
+        linha['problemas'] += len(familia['problemas'])
+
+    for arquivo in sorted(pasta_ponte.glob("*.xlsx")):
+        try:
+            familias = processa_planilha_ponte(arquivo, fr_padrao=fr_padrao, ler_fotos=False)
+        except Exception as erro:
+            erros.append(f"{arquivo.name}: {erro}")
+            continue
+        for familia in familias:
+            if familia['f_r'] is None:
+                erros.append(f"{arquivo.name} ({familia['nome_arquivo']}): F_r não identificado")
+                continue
+            resultados_familias.update(familia['resultado'])
+            linha['problemas'] += len(familia['problemas'])
+        if not familias:
+            erros.append(f"{arquivo.name}: nenhuma família encontrada")
+
+    if resultados_familias:
+        g_d, nivel, recomendacao = avaliar_estrutura(resultados_familias)
+        linha.update({'familias': len(resultados_familias), 'g_d': g_d, 'nivel': nivel, 'recomendacao': recomendacao})
+    elif not erros:
+        erros.append("Nenhum arquivo .zip ou .xlsx encontrado")
+
+    if erros:
+        linha['erro'] = "; ".join(erros)
+    if com_resultados:
+        linha['resultados'] = resultados_familias
+
+    return linha
@@ -0,0 +1,480 @@
+import sys
+import os
+import io
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gde_unb
+from gde_unb import (
+    adequa_dataset,
+    avalia_elemento,
+    avalia_familia,
+    avaliar_estrutura,
+    avalia_elementos_codigos,
+    calcula_dano,
+    extrai_codigos_fi_fp,
+    extrai_matrizes_fi_fp,
+    gerar_relatorio_html,
+    image_to_base64,
+    le_planilha_modelo,
+)
+from gde_inventario import InventarioMapeado
+from gde_servico import ServicoGDE, cria_servidor_http
+from gde_test import avalia_elemento_escalar
+
+# Limite de colunas do formato .xlsx: famílias com mais elementos só são avaliadas a partir do DataFrame.
+MAX_COLUNAS_XLSX = 16384
+
+# Acima deste número de elementos a implementação linha a linha fica lenta demais para entrar na curva de escala.
+MAX_ELEMENTOS_ESCALAR = 1000
+
+DANOS = [
+    "Carbonatação", "Cobrimento Deficiente", "Contaminação por Cloretos", "Corrosão de armaduras",
+    "Danos por impacto", "Desagregação", "Desplacamento", "Desvio de Geometria", "Eflorescência",
+    "Falha de Concretagem", "Fissuras", "Manchas", "Recalque", "Sinais de Esmagamento", "Umidade na base",
+]
+
+
+def gera_dataframe_inspecao(n_linhas: int, n_elementos: int, semente: int = 0, preenchimento: float = 0.3) -> pd.DataFrame:
+    """
+    Gera, de forma determinística, uma planilha de inspeção no formato lido por pd.read_excel(header=[0, 1]).
+
+    :param n_linhas: Número de danos (linhas).
+    :param n_elementos: Número de elementos (pares de colunas Fi/Fp).
+    :param semente: Semente do gerador de números aleatórios.
+    :param preenchimento: Fração das células (dano, elemento) com Fi e Fp preenchidos.
+
+    :return: DataFrame com colunas em dois níveis (elemento, Fi/Fp).
+    """
+    rng = np.random.default_rng(semente)
+    elementos = [f"Elemento E{i:05d}" for i in range(n_elementos)]
+    colunas = pd.MultiIndex.from_tuples([('Danos', 'Unnamed: 0_level_1')] + [(el, sub) for el in elementos for sub in ('Fi', 'Fp')])
+
+    preenchido = rng.random((n_linhas, n_elementos)) < preenchimento
+    fi = np.where(preenchido, rng.integers(0, 5, (n_linhas, n_elementos)), np.nan)
+    fp = np.where(preenchido, rng.integers(1, 6, (n_linhas, n_elementos)), np.nan)
+    valores = np.empty((n_linhas, 2 * n_elementos), dtype=np.float64)
+    valores[:, 0::2] = fi
+    valores[:, 1::2] = fp
+
+    df = pd.DataFrame(valores, columns=colunas[1:])
+    df.insert(0, colunas[0], [DANOS[i % len(DANOS)] if i < len(DANOS) else f"Dano {i}" for i in range(n_linhas)])
+    return df
+
+
+def gera_planilha_xlsx(df: pd.DataFrame) -> bytes:
+    """
+    Grava uma planilha gerada por gera_dataframe_inspecao no formato da planilha modelo (.xlsx).
+
+    :param df: DataFrame com colunas em dois níveis (elemento, Fi/Fp).
+
+    :return: Bytes do arquivo .xlsx.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("INSPECAO")
+    ws.append([nivel0 if sub in ('Unnamed: 0_level_1', 'Fi') else None for nivel0, sub in df.columns])
+    ws.append([None if sub == 'Unnamed: 0_level_1' else sub for _, sub in df.columns])
+    for linha in df.itertuples(index=False):
+        ws.append([None if isinstance(v, float) and np.isnan(v) else v for v in linha])
+
+    saida = io.BytesIO()
+    wb.save(saida)
+    return saida.getvalue()
+
+
+def gera_foto(lado: int, semente: int) -> bytes:
+    """
+    Gera uma foto sintética (ruído, que comprime mal como uma foto de câmera). Sem o Pillow, gera bytes aleatórios de tamanho equivalente.
+
+    :param lado: Largura e altura da foto, em pixels.
+    :param semente: Semente do gerador de números aleatórios.
+
+    :return: Bytes da foto em JPEG.
+    """
+    rng = np.random.default_rng(semente)
+    if gde_unb.Image is None:
+        return b'\xff\xd8\xff\xe0' + rng.integers(0, 256, lado * lado // 2, dtype=np.uint8).tobytes()
+
+    pixels = rng.integers(0, 256, (lado, lado, 3), dtype=np.uint8)
+    saida = io.BytesIO()
+    gde_unb.Image.fromarray(pixels).save(saida, format="JPEG", quality=90)
+    return saida.getvalue()
+
+
+def gera_inspecao_sintetica(n_familias: int, n_linhas: int, n_elementos: int, n_fotos: int, lado_foto: int, semente: int = 0) -> Dict[str, bytes]:
+    """
+    Gera os arquivos .zip de uma inspeção sintética, um por família, no formato aceito pelo app (planilha + pasta fotos).
+
+    :param n_familias: Número de famílias.
+    :param n_linhas: Número de danos por família.
+    :param n_elementos: Número de elementos por família.
+    :param n_fotos: Número de fotos por família.
+    :param lado_foto: Lado das fotos, em pixels.
+    :param semente: Semente do gerador de números aleatórios.
+
+    :return: Dicionário {nome_do_zip: bytes_do_zip}.
+    """
+    zips = {}
+    for f in range(n_familias):
+        saida = io.BytesIO()
+        with zipfile.ZipFile(saida, "w") as zip_ref:
+            df = gera_dataframe_inspecao(n_linhas, n_elementos, semente=semente + f)
+            zip_ref.writestr(f"inspecao_familia_{f}.xlsx", gera_planilha_xlsx(df))
+            for k in range(n_fotos):
+                zip_ref.writestr(f"fotos/Imagem{k}.jpg", gera_foto(lado_foto, semente=semente + 1000 * f + k))
+        zips[f"familia_{f}.zip"] = saida.getvalue()
+    return zips
+
+
+def mede(funcao: Callable[[], object], repeticoes: int) -> Dict[str, float]:
+    """
+    Mede o tempo (mínimo e mediana de várias repetições) e o pico de memória alocada (tracemalloc, execução separada) de uma função.
+
+    :param funcao: Função sem argumentos a medir.
+    :param repeticoes: Número de repetições cronometradas.
+
+    :return: Dicionário com as chaves 'tempo_min_s', 'tempo_mediana_s' e 'pico_memoria_bytes'.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'tempo_min_s': min(tempos), 'tempo_mediana_s': statistics.median(tempos), 'pico_memoria_bytes': pico}
+
+
+def le_zips(zips: Dict[str, bytes]) -> Dict[str, Tuple[bytes, List[Tuple[str, bytes]]]]:
+    """
+    Etapa de leitura dos .zip: extrai a planilha e as fotos de cada família.
+
+    :param zips: Dicionário {nome_do_zip: bytes_do_zip}.
+
+    :return: Dicionário {nome_do_zip: (bytes_da_planilha, [(nome_da_foto, bytes_da_foto), ...])}.
+    """
+    conteudo = {}
+    for nome, dados in zips.items():
+        with zipfile.ZipFile(io.BytesIO(dados)) as zip_ref:
+            planilha = next(n for n in zip_ref.namelist() if n.endswith('.xlsx'))
+            fotos = [(n.split("/")[-1], zip_ref.read(n)) for n in zip_ref.namelist() if n.startswith("fotos/")]
+            conteudo[nome] = (zip_ref.read(planilha), fotos)
+    return conteudo
+
+
+def benchmark_etapas(n_familias: int, n_linhas: int, n_elementos: int, n_fotos: int, lado_foto: int, repeticoes: int) -> Dict[str, Dict[str, float]]:
+    """
+    Mede cada etapa do fluxo do app sobre uma inspeção sintética: leitura dos .zip, pd.read_excel (e o leitor dedicado), adequa_dataset, avalia_elemento, avalia_familia, avaliar_estrutura e gerar_relatorio_html.
+
+    :return: Dicionário {etapa: medidas (ver mede)}.
+    """
+    zips = gera_inspecao_sintetica(n_familias, n_linhas, n_elementos, n_fotos, lado_foto)
+    conteudo = le_zips(zips)
+    planilhas = {nome: planilha for nome, (planilha, _) in conteudo.items()}
+    brutos = {nome: pd.read_excel(io.BytesIO(planilha), header=[0, 1]) for nome, planilha in planilhas.items()}
+    ajustados = {nome: adequa_dataset(df.copy())[0] for nome, df in brutos.items()}
+    resultados = {}
+    for nome, df in ajustados.items():
+        resultados.update(avalia_familia(df, nome, f_r=5))
+    g_d, nivel, recomendacao = avaliar_estrutura(resultados)
+    imagens = {nome: [(n, image_to_base64(b)) for n, b in fotos] for nome, (_, fotos) in conteudo.items()}
+
+    etapas = {
+        'leitura_zip': lambda: le_zips(zips),
+        'pd_read_excel': lambda: [pd.read_excel(io.BytesIO(p), header=[0, 1]) for p in planilhas.values()],
+        'le_planilha_modelo': lambda: [le_planilha_modelo(p) for p in planilhas.values()],
+        'adequa_dataset': lambda: [adequa_dataset(df.copy()) for df in brutos.values()],
+        'avalia_elemento': lambda: [avalia_elemento(df) for df in ajustados.values()],
+        'avalia_familia': lambda: [avalia_familia(df, nome, f_r=5) for nome, df in ajustados.items()],
+        'avaliar_estrutura': lambda: avaliar_estrutura(resultados),
+        'gerar_relatorio_html': lambda: gerar_relatorio_html(
+            resultados, g_d, nivel, recomendacao, ajustados, imagens, list(zips), [5] * len(zips),
+            gde_unb.FR_DESCRICAO, {nome: [] for nome in zips}
+        ),
+    }
+    return {etapa: mede(funcao, repeticoes) for etapa, funcao in etapas.items()}
+
+
+def avalia_danos_formula(df_ajustado: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Referência do benchmark de escala: soma e máximo dos danos por elemento pela fórmula (calcula_dano), sobre as matrizes float64 completas de extrai_matrizes_fi_fp.
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: Uma tupla com dois vetores por elemento: (a) sum_d, (b) d_max.
+    """
+    _, fi, fp = extrai_matrizes_fi_fp(df_ajustado)
+    d = calcula_dano(fi, fp)
+    return d.sum(axis=0), d.max(axis=0)
+
+
+def benchmark_escala(escala: List[int], n_linhas: int, repeticoes: int) -> List[Dict[str, object]]:
+    """
+    Mede como as etapas de leitura e avaliação de uma família crescem com o número de elementos.
+
+    :param escala: Números de elementos avaliados (ex: [10, 100, 1000, 10000]).
+    :param n_linhas: Número de danos da família.
+    :param repeticoes: Número de repetições cronometradas.
+
+    :return: Lista com um dicionário por ponto da curva, com as chaves 'n_elementos' e uma chave por etapa (None quando a etapa não se aplica).
+    """
+    curva = []
+    for n_elementos in escala:
+        df_raw = gera_dataframe_inspecao(n_linhas, n_elementos)
+        df_ajustado = adequa_dataset(df_raw.copy())[0]
+        ponto = {'n_elementos': n_elementos}
+
+        if 2 * n_elementos + 1 <= MAX_COLUNAS_XLSX:
+            planilha = gera_planilha_xlsx(df_raw)
+            ponto['pd_read_excel'] = mede(lambda: pd.read_excel(io.BytesIO(planilha), header=[0, 1]), repeticoes)
+            ponto['le_planilha_modelo'] = mede(lambda: le_planilha_modelo(planilha), repeticoes)
+        else:
+            ponto['pd_read_excel'] = ponto['le_planilha_modelo'] = None
+
+        ponto['adequa_dataset'] = mede(lambda: adequa_dataset(df_raw.copy()), repeticoes)
+        # Caminho completo a partir de df_ajustado: matrizes float64 + fórmula contra códigos int8 + contagem por código
+        ponto['danos_formula'] = mede(lambda: avalia_danos_formula(df_ajustado), repeticoes)
+        ponto['danos_codigos'] = mede(lambda: avalia_elementos_codigos(*extrai_codigos_fi_fp(df_ajustado)[1:]), repeticoes)
+        ponto['avalia_elemento'] = mede(lambda: avalia_elemento(df_ajustado), repeticoes)
+        if n_elementos <= MAX_ELEMENTOS_ESCALAR:
+            ponto['avalia_elemento_escalar'] = mede(lambda: avalia_elemento_escalar(df_ajustado), 1)
+        else:
+            ponto['avalia_elemento_escalar'] = None
+        ponto['avalia_familia'] = mede(lambda: avalia_familia(df_ajustado, 'familia', f_r=5), repeticoes)
+        curva.append(ponto)
+    return curva
+
+
+# Cenários de partida a frio: código executado em um processo Python novo, que imprime o tempo e os módulos pesados carregados.
+CENARIOS_IMPORTACAO = {
+    'import_gde_unb': "import gde_unb",
+    'avaliar_estrutura': "import gde_unb; gde_unb.avaliar_estrutura({'familia': {'f_r': 5, 'g_df': 20.0}})",
+    'avalia_familia': "import gde_unb; gde_unb.processa_zip_familia(gde_unb.Path('examples/pilares.zip'), 'pilares.zip', f_r=5, ler_fotos=False)",
+}
+
+CODIGO_IMPORTACAO = """
+import json, sys, time
+inicio = time.perf_counter()
+{codigo}
+tempo = time.perf_counter() - inicio
+print(json.dumps({{'tempo_s': tempo, 'modulos': [m for m in ('pandas', 'numpy', 'PIL.Image') if m in sys.modules]}}))
+"""
+
+
+def benchmark_importacao(repeticoes: int) -> Dict[str, Dict[str, object]]:
+    """
+    Mede o custo de partida a frio (importação de gde_unb e primeira chamada) em processos Python novos, como em um contêiner recém-criado.
+
+    :param repeticoes: Número de processos por cenário.
+
+    :return: Dicionário {cenário: {'tempo_min_s', 'tempo_mediana_s', 'modulos'}}, em que 'modulos' lista as dependências pesadas carregadas.
+    """
+    raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    resultado = {}
+    for cenario, codigo in CENARIOS_IMPORTACAO.items():
+        medidas = []
+        for _ in range(repeticoes):
+            saida = subprocess.run([sys.executable, "-c", CODIGO_IMPORTACAO.format(codigo=codigo)], capture_output=True, text=True, check=True, cwd=raiz)
+            medidas.append(json.loads(saida.stdout))
+        tempos = [medida['tempo_s'] for medida in medidas]
+        resultado[cenario] = {'tempo_min_s': min(tempos), 'tempo_mediana_s': statistics.median(tempos), 'modulos': medidas[-1]['modulos']}
+    return resultado
+
+
+def benchmark_reexecucao(repeticoes: int) -> Optional[Dict[str, float]]:
+    """
+    Mede o tempo da primeira execução do app.py e das reexecuções seguintes (o que acontece a cada interação com um widget), com o AppTest do Streamlit.
+
+    :param repeticoes: Número de reexecuções cronometradas.
+
+    :return: Dicionário com as chaves 'primeira_execucao_s', 'reexecucao_min_s' e 'reexecucao_mediana_s', ou None se o Streamlit não estiver instalado.
+    """
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+
+    raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    diretorio = os.getcwd()
+    os.chdir(raiz)  # o app lê os arquivos de assets/ pelo caminho relativo
+    try:
+        app = AppTest.from_file(os.path.join(raiz, "app.py"), default_timeout=120)
+        inicio = time.perf_counter()
+        app.run()
+        primeira = time.perf_counter() - inicio
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            app.run()
+            tempos.append(time.perf_counter() - inicio)
+    finally:
+        os.chdir(diretorio)
+    return {'primeira_execucao_s': primeira, 'reexecucao_min_s': min(tempos), 'reexecucao_mediana_s': statistics.median(tempos)}
+
+
+def benchmark_servico(n_familias: int, n_linhas: int, n_elementos: int, n_requisicoes: int, n_conexoes: int, n_workers: Optional[int] = None) -> Dict[str, object]:
+    """
+    Teste de carga do serviço HTTP (cria_servidor_http) em localhost: n_conexoes clientes persistentes enviam inspeções em JSON para POST /avaliar.
+
+    :param n_familias: Número de famílias da inspeção.
+    :param n_linhas: Número de danos por família.
+    :param n_elementos: Número de elementos por família.
+    :param n_requisicoes: Número total de requisições.
+    :param n_conexoes: Número de clientes simultâneos.
+    :param n_workers: Número de processos do serviço. Se None, usa o número de CPUs.
+
+    :return: Dicionário com as chaves 'requisicoes_por_s', 'tempo_s', 'bytes_requisicao' e 'metricas' (GET /metricas ao final).
+    """
+    import http.client
+
+    familias = {}
+    for i in range(n_familias):
+        elementos, fi, fp = extrai_matrizes_fi_fp(adequa_dataset(gera_dataframe_inspecao(n_linhas, n_elementos, semente=i))[0])
+        familias[f"Familia {i + 1:02d}"] = {'f_r': 1 + i % 5, 'elementos': elementos, 'fi': fi.tolist(), 'fp': fp.tolist()}
+    corpo = json.dumps({'ponte': "sintetica", 'familias': familias}).encode("utf-8")
+
+    servico = ServicoGDE(n_workers=n_workers, max_pendentes=max(256, n_conexoes))
+    servico.aquece()
+    servidor = cria_servidor_http(servico, "127.0.0.1", 0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    porta = servidor.server_address[1]
+
+    def cliente(n: int) -> None:
+        conexao = http.client.HTTPConnection("127.0.0.1", porta)
+        for _ in range(n):
+            conexao.request("POST", "/avaliar", corpo, {"Content-Type": "application/json"})
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                raise RuntimeError(f"POST /avaliar respondeu {resposta.status}")
+        conexao.close()
+
+    try:
+        partes = [n_requisicoes // n_conexoes + (i < n_requisicoes % n_conexoes) for i in range(n_conexoes)]
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n_conexoes) as executor:
+            list(executor.map(cliente, partes))
+        tempo = time.perf_counter() - inicio
+        metricas = servico.metricas()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+        servico.encerra()
+    return {'requisicoes_por_s': n_requisicoes / tempo, 'tempo_s': tempo, 'bytes_requisicao': len(corpo), 'metricas': metricas}
+
+
+def benchmark_inventario(n_pontes: int, n_familias: int, n_linhas: int, n_elementos: int, tamanho_bloco: int = 1 << 20) -> Dict[str, object]:
+    """
+    Grava um inventário sintético de n_pontes pontes (InventarioMapeado.grava) e mede a avaliação em blocos (pontua), com o pico de memória do tracemalloc. As pontes repetem as mesmas matrizes de n_familias famílias, pois o custo de pontua depende só do número de células.
+
+    :param n_pontes: Número de pontes do inventário.
+    :param n_familias: Número de famílias por ponte.
+    :param n_linhas: Número de danos por família.
+    :param n_elementos: Número de elementos por família.
+    :param tamanho_bloco: Número máximo de células por bloco.
+
+    :return: Dicionário com as chaves 'n_pontes', 'n_celulas', 'gravacao_s', 'pontua_s', 'celulas_por_s' e 'pico_memoria_bytes'.
+    """
+    familias = {}
+    for i in range(n_familias):
+        elementos, fi, fp = extrai_matrizes_fi_fp(adequa_dataset(gera_dataframe_inspecao(n_linhas, n_elementos, semente=i))[0])
+        familias[f"Familia {i + 1:02d}"] = (elementos, fi, fp, 1 + i % 5)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        inicio = time.perf_counter()
+        inventario = InventarioMapeado.grava(diretorio, ((f"Ponte {p:06d}", familias) for p in range(n_pontes)))
+        gravacao = time.perf_counter() - inicio
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        inventario.pontua(tamanho_bloco=tamanho_bloco)
+        tempo = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {'n_pontes': n_pontes, 'n_celulas': inventario.n_celulas, 'gravacao_s': gravacao, 'pontua_s': tempo, 'celulas_por_s': inventario.n_celulas / tempo, 'pico_memoria_bytes': pico}
+
+
+def commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do GDE/UnB com inspeções sintéticas.")
+    parser.add_argument("-o", "--saida", default="bench_output.json", help="Arquivo JSON com os resultados (padrão: bench_output.json).")
+    parser.add_argument("--familias", type=int, default=9, help="Número de famílias.")
+    parser.add_argument("--linhas", type=int, default=15, help="Número de danos por família.")
+    parser.add_argument("--elementos", type=int, default=50, help="Número de elementos por família.")
+    parser.add_argument("--fotos", type=int, default=20, help="Número de fotos por família.")
+    parser.add_argument("--lado-foto", type=int, default=1024, help="Lado das fotos, em pixels.")
+    parser.add_argument("--escala", default="10,100,1000,10000", help="Números de elementos da curva de escala, separados por vírgula.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições cronometradas por etapa.")
+    parser.add_argument("--requisicoes", type=int, default=2000, help="Requisições do teste de carga do serviço HTTP.")
+    parser.add_argument("--conexoes", type=int, default=16, help="Clientes simultâneos do teste de carga do serviço HTTP.")
+    parser.add_argument("--pontes", type=int, default=10000, help="Número de pontes do inventário mapeado em disco.")
+    args = parser.parse_args(argv)
+
+    escala = [int(n) for n in args.escala.split(",") if n]
+    resultado = {
+        'data': datetime.now(timezone.utc).isoformat(),
+        'commit': commit_atual(),
+        'ambiente': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+        },
+        'configuracao': vars(args),
+        'etapas': benchmark_etapas(args.familias, args.linhas, args.elementos, args.fotos, args.lado_foto, args.repeticoes),
+        'escala': benchmark_escala(escala, args.linhas, args.repeticoes),
+        'importacao': benchmark_importacao(args.repeticoes),
+        'reexecucao_app': benchmark_reexecucao(args.repeticoes),
+        'servico': benchmark_servico(args.familias, args.linhas, args.elementos, args.requisicoes, args.conexoes),
+        'inventario': benchmark_inventario(args.pontes, args.familias, args.linhas, args.elementos),
+    }
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+    for etapa, medidas in resultado['etapas'].items():
+        print(f"{etapa:<22} {medidas['tempo_min_s'] * 1000:10.2f} ms {medidas['pico_memoria_bytes'] / 1e6:10.2f} MB")
+    for cenario, medidas in resultado['importacao'].items():
+        print(f"{cenario:<22} {medidas['tempo_min_s'] * 1000:10.2f} ms   {', '.join(medidas['modulos']) or '-'}")
+    if resultado['reexecucao_app'] is not None:
+        print(f"{'reexecucao_app':<22} {resultado['reexecucao_app']['reexecucao_min_s'] * 1000:10.2f} ms")
+    servico = resultado['servico']
+    print(f"{'servico_http':<22} {servico['requisicoes_por_s']:10.1f} req/s (p50 = {servico['metricas']['latencia_ms']['p50']:.2f} ms, p99 = {servico['metricas']['latencia_ms']['p99']:.2f} ms)")
+    inventario = resultado['inventario']
+    print(f"{'inventario_mapeado':<22} {inventario['pontua_s'] * 1000:10.2f} ms {inventario['pico_memoria_bytes'] / 1e6:10.2f} MB ({inventario['n_celulas']} células, {inventario['celulas_por_s'] / 1e6:.1f} M células/s)")
+    print(f"Resultados salvos em {args.saida}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
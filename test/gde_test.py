@@ -1,13 +1,85 @@
 import sys
 import os
 import unittest
+import unittest.mock
 import pandas as pd
 import numpy as np
 import base64
+import http.client
+import io
+import importlib.util
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+import warnings
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from gde_unb import adequa_dataset, avalia_elemento, avalia_familia, avaliar_estrutura, image_to_base64, gerar_relatorio_html
+import gde_cli
+import gde_servico
+import gde_unb
+from gde_historico import HistoricoInspecoes
+from gde_inventario import InventarioMapeado
+from gde_servico import ServicoGDE, avalia_zip_json, cria_servidor_http
+from gde_unb import adequa_dataset, avalia_elemento, avalia_familia, avaliar_estrutura, image_to_base64, gerar_relatorio_html, calcula_dano, infere_fr, avalia_ponte, escreve_relatorio_html, escreve_relatorio_arquivo, caminho_imagem_relatorio, RegistroFotos, gera_relatorio_html, processa_zip_familia, base64_em_partes, prepara_fotos, escreve_fotos_originais, CachePlanilhas, le_planilha, CacheLRU, aplica_fr, le_planilha_modelo, Diagnostico, etapa, avalia_familia_compacta, ResultadoFamilia, simula_incerteza, RankingPrioridades, processa_planilha_ponte, le_planilha_ponte, extrai_matrizes_fi_fp, TABELA_DANO, codifica_fi_fp, calcula_dano_codigos, avalia_elementos_lote, avalia_elementos_codigos, extrai_codigos_fi_fp, valida_dataset, valida_dataset_codigos, PROBLEMAS_PLANILHA, AvaliacaoIncremental, EspacoSessao, ExportadorResultados, tabelas_inspecao, compara_inspecoes, compara_lote
+
+EXEMPLOS = Path(__file__).resolve().parent.parent / 'examples'
+
+
+def avalia_elemento_escalar(df_ajustado: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    Implementação de referência (linha a linha) da avaliação dos elementos estruturais. Usada nos testes para conferir os resultados do motor vetorizado de avalia_elemento.
+
+    :param df_ajustado: Dados da inspeção com valor de Fi e Fp preenchido por elemento em colunas simples.
+
+    :return: A saída contém uma única variável dicionário que detalha os resultados para cada elemento. O dicionário possui as seguintes chaves: (a) 'sum_d': Soma total dos valores d. (b) 'd_max': Valor máximo de dano encontrado. (c) 'g_de' : Grau de deterioração do elemento (G_de).
+    """
+    resultados = {}
+    colunas = [col for col in df_ajustado.columns if col != "Danos"]
+    elementos = sorted(set(col.split(" - ")[1] for col in colunas))
+
+    for elemento in elementos:
+        registros = []
+
+        for _, row in df_ajustado.iterrows():
+            dano = str(row["Danos"]).strip()
+            if dano.lower() in ["danos", ""] or pd.isna(dano):
+                continue
+
+            try:
+                fi = float(row[f"Fi - {elemento}"])
+                fp = float(row[f"Fp - {elemento}"])
+            except (KeyError, ValueError, TypeError):
+                fi, fp = 0, 0
+
+            if fi <= 2.0:
+                d = 0.8 * fi * fp
+            elif fi >= 3.0:
+                d = (12 * fi - 28) * fp
+            else:
+                d = 0
+
+            registros.append(d)
+
+        sum_d = sum(registros)
+        d_max = max(registros) if registros else 0
+        g_de = d_max * (1 + ((sum_d - d_max) / sum_d)) if sum_d else 0
+
+        resultados[elemento] = {
+            'sum_d': sum_d,
+            'd_max': d_max,
+            'g_de': g_de
+        }
+
+    return resultados
 
 
 class TestGDE(unittest.TestCase):
@@ -60,6 +132,38 @@ class TestGDE(unittest.TestCase):
             self.assertAlmostEqual(valores['g_de'], 2.4, places=2)
             self.assertEqual(valores['sum_d'], valores['d_max'])
 
+    def test_avalia_elemento_equivale_escalar(self):
+        rng = np.random.default_rng(42)
+        elementos = [f'Laje L{i:03d}' for i in range(40)]
+        columns = pd.MultiIndex.from_tuples([('Danos', '')] + [(el, sub) for el in elementos for sub in ('Fi', 'Fp')])
+        n_linhas = 25
+        fi = rng.choice([np.nan, 0.0, 1.0, 2.0, 2.5, 3.0, 4.0, 5.0], size=(n_linhas, len(elementos)))
+        fp = rng.choice([1.0, 2.0, 3.0, 4.0, 5.0], size=(n_linhas, len(elementos)))
+        fp[np.isnan(fi)] = np.nan
+        valores = np.empty((n_linhas, 2 * len(elementos)), dtype=object)
+        valores[:, 0::2] = fi
+        valores[:, 1::2] = fp
+        valores[3, 4] = 'x'
+        danos = [f'Dano {i}' for i in range(n_linhas)]
+        danos[0] = 'Danos'
+        danos[5] = '  '
+        df = pd.DataFrame(np.column_stack([danos, valores]), columns=columns)
+        df_ajustado, _ = adequa_dataset(df)
+        df_ajustado = df_ajustado.drop(columns=['Fp - Laje L007'])
+
+        vetorizado = avalia_elemento(df_ajustado)
+        escalar = avalia_elemento_escalar(df_ajustado)
+
+        self.assertEqual(list(vetorizado.keys()), list(escalar.keys()))
+        for elemento, valores_escalar in escalar.items():
+            for chave in ('sum_d', 'd_max', 'g_de'):
+                self.assertAlmostEqual(vetorizado[elemento][chave], valores_escalar[chave], places=9)
+
+    def test_calcula_dano(self):
+        fi = np.array([0.0, 1.0, 2.0, 2.5, 3.0, 4.0])
+        fp = np.full(6, 2.0)
+        np.testing.assert_allclose(calcula_dano(fi, fp), [0.0, 1.6, 3.2, 0.0, 16.0, 40.0])
+
     def test_avalia_familia(self):
         columns = pd.MultiIndex.from_tuples([
             ('Danos', ''),
@@ -107,6 +211,44 @@ class TestGDE(unittest.TestCase):
         self.assertEqual(nivel, "Baixo")
         self.assertIn("manutenção preventiva", recomendacao.lower())
 
+    def test_infere_fr(self):
+        self.assertEqual(infere_fr('pilares.zip'), 5)
+        self.assertEqual(infere_fr('inspecao_vigas.zip'), 5)
+        self.assertEqual(infere_fr('Viga_Transversina.zip'), 3)
+        self.assertEqual(infere_fr('junta_dilatacao.zip'), 2)
+        self.assertEqual(infere_fr('Fundação.zip'), 4)
+        self.assertIsNone(infere_fr('desconhecido.zip'))
+
+    def test_avalia_ponte(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pasta = Path(tmp) / 'ponte_01'
+            pasta.mkdir()
+            shutil.copy(EXEMPLOS / 'pilares.zip', pasta)
+            shutil.copy(EXEMPLOS / 'vigas.zip', pasta)
+
+            linha = avalia_ponte(pasta)
+
+        self.assertEqual(linha['ponte'], 'ponte_01')
+        self.assertEqual(linha['familias'], 2)
+        self.assertEqual(linha['nivel'], 'Baixo')
+        self.assertIsNone(linha['erro'])
+
+    def test_linha_de_comando_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pasta = Path(tmp) / 'frota' / 'ponte_01'
+            pasta.mkdir(parents=True)
+            shutil.copy(EXEMPLOS / 'pilares.zip', pasta)
+            resumo = Path(tmp) / 'resumo.csv'
+
+            self.assertEqual(gde_cli.main(['batch', str(pasta.parent), '--saida', str(resumo), '--workers', '1']), 0)
+            linhas = pd.read_csv(resumo)
+            esperado = avalia_ponte(pasta)
+            with self.assertRaises(SystemExit), unittest.mock.patch('sys.stderr', io.StringIO()):
+                gde_cli.main(['batch', str(pasta.parent), '--saida', str(resumo), '--data', '2024-13-01'])
+
+        self.assertEqual(list(linhas['ponte']), ['ponte_01'])
+        self.assertAlmostEqual(linhas['g_d'].iloc[0], esperado['g_d'])
+
     def test_image_to_base64_with_bytes(self):
         jpeg_header = b'\xff\xd8\xff\xe0'
         encoded = image_to_base64(jpeg_header)
@@ -163,6 +305,782 @@ class TestGDE(unittest.TestCase):
         self.assertFalse(df_resumo.empty)
         self.assertFalse(df_total.empty)
 
+    def test_base64_em_partes(self):
+        dados = bytes(range(256)) * 1000
+        partes = list(base64_em_partes(lambda: dados, tamanho_bloco=3 * 100))
+        self.assertGreater(len(partes), 1)
+        self.assertEqual(''.join(partes), image_to_base64(dados))
+
+    def test_escreve_relatorio_html(self):
+        familia = processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=5)
+        nome = familia['nome_arquivo']
+        args = (
+            familia['resultado'], 3.2, "Baixo", "Manutenção preventiva.",
+            {nome: familia['tabela_original']}, {nome: familia['fotos']},
+            ['pilares.zip'], [5], {5: "Vigas e pilares principais"}, {nome: familia['nome_elementos']}
+        )
+
+        destino = io.BytesIO()
+        df_resumo, df_total = escreve_relatorio_html(destino, *args)
+        html, _, _ = gerar_relatorio_html(*args)
+
+        self.assertEqual(len(familia['fotos']), 8)
+        self.assertEqual(destino.getvalue().decode('utf-8'), html)
+        self.assertIn(image_to_base64(familia['fotos'][0][1]()), html)
+        self.assertFalse(df_resumo.empty)
+        self.assertFalse(df_total.empty)
+
+    def test_escreve_relatorio_arquivo(self):
+        familia = processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=5)
+        nome = familia['nome_arquivo']
+        args = (
+            familia['resultado'], 3.2, "Baixo", "Manutenção preventiva.",
+            {nome: familia['tabela_original']}, {nome: familia['fotos']},
+            ['pilares.zip'], [5], {5: "Vigas e pilares principais"}, {nome: familia['nome_elementos']}
+        )
+
+        destino = io.BytesIO()
+        df_resumo, _ = escreve_relatorio_arquivo(destino, *args)
+
+        with zipfile.ZipFile(destino) as zip_ref:
+            indice = zip_ref.read('index.html').decode('utf-8')
+            pagina = zip_ref.read('familia_1.html').decode('utf-8')
+            self.assertIn("href='familia_1.html'", indice)
+            self.assertNotIn('base64', indice + pagina)
+            self.assertEqual(pagina.count("loading='lazy'"), len(familia['fotos']))
+            for j, (nome_img, leitor) in enumerate(familia['fotos']):
+                if nome_img in ('Imagem3.jpg', 'Imagem4.jpg'):  # cópias de Imagem1.jpg e Imagem2.jpg
+                    self.assertNotIn(caminho_imagem_relatorio(0, j, nome_img), zip_ref.namelist())
+                    continue
+                caminho = caminho_imagem_relatorio(0, j, nome_img)
+                self.assertIn(f"src='{caminho}' loading='lazy'", pagina)
+                self.assertEqual(zip_ref.read(caminho), leitor())
+        self.assertFalse(df_resumo.empty)
+
+        # Fotos distintas com o mesmo nome (de subpastas diferentes do .zip) não podem ocupar o mesmo caminho
+        mesmo_nome = [('a/x.jpg', familia['fotos'][0][1]()), ('b/x.jpg', familia['fotos'][1][1]())]
+        args_mesmo_nome = args[:5] + ({nome: mesmo_nome},) + args[6:]
+        with tempfile.TemporaryDirectory() as tmp:
+            for destino in (io.BytesIO(), Path(tmp, 'relatorio')):
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error')
+                    escreve_relatorio_arquivo(destino, *args_mesmo_nome)
+                for j, (nome_img, imagem) in enumerate(mesmo_nome):
+                    caminho = caminho_imagem_relatorio(0, j, nome_img)
+                    if isinstance(destino, Path):
+                        self.assertEqual(Path(destino, caminho).read_bytes(), imagem)
+                    else:
+                        with zipfile.ZipFile(destino) as zip_ref:
+                            self.assertEqual(zip_ref.read(caminho), imagem)
+
+    def test_registro_fotos(self):
+        familia = processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=5)
+        nome = familia['nome_arquivo']
+        copia = dict(familia['resultado'][nome], nome_arquivo='copia')
+        fotos = dict(familia['fotos'])
+        registro_fotos = RegistroFotos()
+
+        html = "".join(gera_relatorio_html(
+            {nome: familia['resultado'][nome], 'copia': copia}, 3.2, "Baixo", "Manutenção preventiva.",
+            {}, {nome: familia['fotos'], 'copia': familia['fotos']}, ['pilares.zip', 'copia.zip'], [5, 5], {}, {},
+            registro_fotos=registro_fotos
+        ))
+
+        estatisticas = registro_fotos.estatisticas()
+        self.assertEqual(estatisticas['fotos'], 16)
+        self.assertEqual(estatisticas['unicas'], 6)
+        self.assertEqual(estatisticas['bytes_economizados'], estatisticas['bytes'] - sum(len(fotos[f"Imagem{k}.jpg"]()) for k in (1, 2, 5, 6, 7, 8)))
+        self.assertEqual(html.count('data:image/jpeg;base64,'), 6)
+        self.assertEqual(html.count("<img class='foto-"), 16)
+        self.assertEqual(html.count(image_to_base64(fotos['Imagem1.jpg']())), 1)
+        self.assertNotIn('<script>', html)
+
+        # Fotos já em base64 contam o tamanho decodificado, como as fotos em bytes
+        registro_bytes, registro_base64 = RegistroFotos(), RegistroFotos()
+        for nome_img, leitor in familia['fotos'] * 2:
+            registro_bytes.registra(leitor(), nome_img)
+            registro_base64.registra(image_to_base64(leitor()), nome_img)
+        self.assertEqual(registro_base64.estatisticas(), registro_bytes.estatisticas())
+
+        # A mesma foto em bytes e em base64 é registrada uma única vez
+        registro_misto = RegistroFotos()
+        for nome_img, leitor in familia['fotos']:
+            registro_misto.registra(leitor(), nome_img)
+            registro_misto.registra(image_to_base64(leitor()), nome_img)
+        self.assertEqual(registro_misto.estatisticas()['unicas'], registro_bytes.estatisticas()['unicas'])
+
+
+    @unittest.skipIf(gde_unb.Image is None, "Pillow não instalado")
+    def test_prepara_fotos(self):
+        familia = processa_zip_familia(EXEMPLOS / 'vigas.zip', 'vigas.zip', f_r=5)
+        fotos = [(nome, leitor, f"originais/{nome}") for nome, leitor in familia['fotos']]
+
+        reduzidas = prepara_fotos(fotos, dimensao_max=120, qualidade=60)
+
+        self.assertEqual([f[0] for f in reduzidas], [f[0] for f in fotos])
+        self.assertEqual([f[2] for f in reduzidas], [f[2] for f in fotos])
+        for (_, leitor, _), (_, dados, _) in zip(fotos, reduzidas):
+            self.assertLess(len(dados), len(leitor()))
+            with gde_unb.Image.open(io.BytesIO(dados)) as img:
+                self.assertEqual(img.format, 'JPEG')
+                self.assertLessEqual(max(img.size), 120)
+
+    def test_escreve_fotos_originais(self):
+        familia = processa_zip_familia(EXEMPLOS / 'vigas.zip', 'vigas.zip', f_r=5)
+        destino = io.BytesIO()
+
+        n_fotos = escreve_fotos_originais(destino, {'vigas': familia['fotos']})
+
+        self.assertEqual(n_fotos, 2)
+        with zipfile.ZipFile(destino) as zip_ref:
+            self.assertEqual(zip_ref.read('originais/vigas/001_Imagem9.jpg'), familia['fotos'][0][1]())
+
+
+    def test_cache_planilhas(self):
+        with zipfile.ZipFile(EXEMPLOS / 'pilares.zip') as zip_ref:
+            dados = zip_ref.read('inspecao_pilares.xlsx')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = CachePlanilhas(tmp)
+            df_lido, elementos_lidos = le_planilha(dados, cache=cache)
+            df_cache, elementos_cache = le_planilha(dados, cache=cache)
+
+            self.assertEqual(cache.estatisticas()['acertos'], 1)
+            self.assertEqual(cache.estatisticas()['falhas'], 1)
+            self.assertEqual(cache.estatisticas()['entradas'], 1)
+            self.assertEqual(elementos_cache, elementos_lidos)
+            self.assertEqual(list(df_cache.columns), list(df_lido.columns))
+            self.assertEqual(avalia_elemento(df_cache), avalia_elemento(df_lido))
+            pd.testing.assert_frame_equal(df_cache, df_lido)
+
+            misto = pd.DataFrame({'Danos': ['Fissura', 2, None, 1.5, True], 'Fi - P01': [1.0, 2.0, np.nan, 3.0, 4.0]})
+            cache.guardar(cache.chave(b'misto'), misto, ['P01'])
+            df_misto, _ = cache.obter(cache.chave(b'misto'))
+            pd.testing.assert_frame_equal(df_misto, misto.fillna({'Danos': np.nan}))
+            self.assertEqual([type(valor) for valor in df_misto['Danos'][[0, 1, 3, 4]]], [str, int, float, bool])
+
+            cache.tamanho_max = 0
+            cache.guardar(cache.chave(b'outra'), df_lido, elementos_lidos)
+            self.assertEqual(cache.estatisticas()['entradas'], 0)
+
+
+    def test_aplica_fr(self):
+        familia = processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=1, ler_fotos=False)
+        nome = familia['nome_arquivo']
+        df_ajustado = familia['tabela_original']
+
+        resultado = aplica_fr(familia['resultado'], 5)
+
+        self.assertEqual(resultado, avalia_familia(df_ajustado, nome, f_r=5))
+        self.assertEqual(familia['resultado'][nome]['f_r'], 1)
+
+    def test_cache_lru(self):
+        cache = CacheLRU(max_entradas=2)
+        chamadas = []
+
+        def calcula(valor):
+            chamadas.append(valor)
+            return valor * 10
+
+        self.assertEqual(cache.obter_ou_calcular('a', lambda: calcula(1)), 10)
+        self.assertEqual(cache.obter_ou_calcular('b', lambda: calcula(2)), 20)
+        self.assertEqual(cache.obter_ou_calcular('a', lambda: calcula(1)), 10)
+        cache.obter_ou_calcular('c', lambda: calcula(3))
+        cache.obter_ou_calcular('b', lambda: calcula(2))
+
+        self.assertEqual(chamadas, [1, 2, 3, 2])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.acertos, cache.falhas), (1, 4))
+
+
+    def test_le_planilha_modelo(self):
+        raiz = EXEMPLOS.parent
+        arquivos = [(caminho.name, caminho.read_bytes(), 0) for caminho in sorted((raiz / 'modelos').glob('*.xlsx'))]
+        with zipfile.ZipFile(EXEMPLOS / 'pilares.zip') as zip_ref:
+            arquivos.append(('pilares', zip_ref.read('inspecao_pilares.xlsx'), 0))
+        planilha_campo = EXEMPLOS / 'Planilha de Inspecção - Ponte Ribeirao do Braço - Teste.xlsx'
+        arquivos.append((planilha_campo.name, planilha_campo.read_bytes(), 'METODOLOGIA GDE-UNB'))
+
+        for nome, dados, aba in arquivos:
+            with self.subTest(planilha=nome):
+                esperado = pd.read_excel(io.BytesIO(dados), sheet_name=aba, header=[0, 1])
+                pd.testing.assert_frame_equal(le_planilha_modelo(dados, aba), esperado)
+
+
+    def test_diagnostico(self):
+        with etapa("sem_diagnostico") as registro:
+            registro['bytes'] = 10
+
+        with Diagnostico(memoria=True) as diagnostico:
+            with etapa("externa", 5):
+                with etapa("interna") as registro:
+                    registro['bytes'] = 1000
+                    bloco = bytearray(1024 * 1024)
+                del bloco
+
+        self.assertEqual([r['etapa'] for r in diagnostico.registros], ["externa", "interna"])
+        externa, interna = diagnostico.registros
+        self.assertEqual((externa['nivel'], interna['nivel']), (0, 1))
+        self.assertEqual((externa['bytes'], interna['bytes']), (5, 1000))
+        self.assertGreaterEqual(interna['pico_memoria_bytes'], 1024 * 1024)
+        self.assertGreaterEqual(externa['pico_memoria_bytes'], interna['pico_memoria_bytes'])
+        self.assertGreaterEqual(externa['tempo_s'], interna['tempo_s'])
+        self.assertEqual(len(diagnostico.tabela()), 2)
+
+
+    def test_avalia_familia_compacta(self):
+        familia = processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=5, ler_fotos=False)
+        nome = familia['nome_arquivo']
+        df_ajustado = familia['tabela_original']
+
+        compacta = avalia_familia_compacta(df_ajustado, nome, f_r=5)[nome]
+        esperado = avalia_familia(df_ajustado, nome, f_r=5)[nome]
+
+        self.assertIsInstance(compacta, ResultadoFamilia)
+        self.assertEqual(compacta.como_dict(), esperado)
+        self.assertEqual(compacta['f_r × g_df'], esperado['f_r × g_df'])
+        self.assertEqual(dict(compacta['resultados_elemento'].items()), esperado['resultados_elemento'])
+        self.assertEqual(compacta['resultados_elemento']['Pilar P03'], esperado['resultados_elemento']['Pilar P03'])
+        self.assertEqual(avaliar_estrutura({nome: compacta}), avaliar_estrutura({nome: esperado}))
+
+        outra = compacta.com_fr(2)
+        self.assertEqual(outra['f_r × g_df'], 2 * compacta.g_df)
+        self.assertIs(outra.g_de, compacta.g_de)
+        self.assertEqual(compacta.f_r, 5)
+
+
+    def test_simula_incerteza(self):
+        familias = {}
+        resultados = {}
+        for nome_zip in ('pilares.zip', 'vigas.zip'):
+            familia = processa_zip_familia(EXEMPLOS / nome_zip, nome_zip, f_r=5, ler_fotos=False)
+            familias[familia['nome_arquivo']] = (*extrai_matrizes_fi_fp(familia['tabela_original']), 5)
+            resultados.update(familia['resultado'])
+        g_d, nivel, _ = avaliar_estrutura(resultados)
+
+        fixa = simula_incerteza(familias, n_amostras=50, prob_fi=(0, 1, 0), prob_fp=(0, 1, 0))
+        simulacao = simula_incerteza(familias, n_amostras=20000, semente=42)
+
+        self.assertAlmostEqual(fixa['g_d_nominal'], g_d)
+        self.assertEqual(fixa['nivel_nominal'], nivel)
+        np.testing.assert_allclose(fixa['g_d'], g_d)
+        self.assertEqual(len(simulacao['g_d']), 20000)
+        self.assertAlmostEqual(sum(simulacao['probabilidades'].values()), 1.0)
+        self.assertGreater(simulacao['desvio'], 0)
+        self.assertEqual(len(simulacao['sensibilidade']), 6)
+        self.assertTrue((simulacao['sensibilidade']['correlacao_g_d'] > 0).all())
+        with self.assertRaises(ValueError):
+            simula_incerteza(familias, prob_fi=(0.5, 0.6, 0.1))
+
+    def test_historico_inspecoes(self):
+        familia = processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=5, ler_fotos=False)
+        nome = familia['nome_arquivo']
+        anterior = familia['resultado'][nome]
+        atual = ResultadoFamilia(anterior.elementos, anterior.sum_d, anterior.d_max, anterior.g_de + np.arange(len(anterior.g_de)), 5)
+
+        with HistoricoInspecoes(":memory:") as historico:
+            n_inspecoes = historico.registra_lote([
+                ('ponte A', '2023-06-01', {nome: anterior}),
+                ('ponte A', '2024-06-01', {nome: atual}),
+                ('ponte B', '2024-01-15', {nome: anterior.como_dict()}),
+            ])
+            historico.registra('ponte B', '2024-01-15', {nome: atual})  # substitui a inspeção da mesma data
+            with self.assertRaises(ValueError):
+                historico.registra('ponte C', '15/01/2024', {nome: atual})
+            ultimos = historico.ultimos_g_d()
+            serie = historico.serie_g_d('ponte A')
+            crescimentos = historico.maiores_crescimentos(2)
+            n_elementos = historico.consulta("SELECT COUNT(*) AS n FROM elementos")['n'][0]
+
+        self.assertEqual(n_inspecoes, 3)
+        self.assertEqual(ultimos['ponte'].tolist(), ['ponte A', 'ponte B'])
+        self.assertEqual(ultimos['data'].tolist(), ['2024-06-01', '2024-01-15'])
+        self.assertAlmostEqual(ultimos['g_d'][0], avaliar_estrutura({nome: atual})[0])
+        self.assertEqual(serie['data'].tolist(), ['2023-06-01', '2024-06-01'])
+        self.assertEqual(n_elementos, 3 * len(anterior.elementos))
+        self.assertEqual(crescimentos['elemento'].tolist(), [anterior.elementos[-1], anterior.elementos[-2]])
+        self.assertEqual(crescimentos['variacao'].tolist(), [len(anterior.g_de) - 1, len(anterior.g_de) - 2])
+
+    def test_ranking_prioridades(self):
+        gerador = np.random.default_rng(7)
+        inspecoes = []
+        for p in range(60):
+            escala = gerador.uniform(1, 60)
+            resultados = {
+                f"familia{f}": ResultadoFamilia([f"E{e}" for e in range(8)], np.zeros(8), np.zeros(8), gerador.random(8) * escala, f + 1)
+                for f in range(3)
+            }
+            inspecoes.append((f"ponte{p}", resultados))
+
+        ranking = RankingPrioridades(k=5).adiciona_lote(iter(inspecoes))
+        pontes = ranking.tabela('pontes')
+        elementos = ranking.tabela('elementos')
+
+        esperado = []
+        for ponte, resultados in inspecoes:
+            g_d, nivel, _ = avaliar_estrutura(resultados)
+            for familia, dados in resultados.items():
+                esperado.extend((nivel, ponte, familia, el, g_de) for el, g_de in zip(dados.elementos, dados.g_de))
+        esperado = pd.DataFrame(esperado, columns=['nivel', 'ponte', 'familia', 'elemento', 'g_de'])
+
+        self.assertEqual(ranking.n_inspecoes, 60)
+        self.assertEqual(list(pontes.columns), ['nivel', 'posicao', 'ponte', 'g_d'])
+        self.assertTrue(pontes.groupby('nivel', sort=False)['g_d'].apply(lambda v: v.is_monotonic_decreasing).all())
+        for nivel, grupo in elementos.groupby('nivel', sort=False):
+            top = esperado[esperado['nivel'] == nivel].nlargest(5, 'g_de')
+            self.assertEqual(grupo['g_de'].tolist(), top['g_de'].tolist())
+            self.assertEqual(grupo['posicao'].tolist(), list(range(1, len(top) + 1)))
+        self.assertLessEqual(len(ranking.tabela('familias')), 4 * 5)
+        with self.assertRaises(ValueError):
+            ranking.tabela('vigas')
+
+    def test_le_planilha_ponte(self):
+        planilha = EXEMPLOS / 'Planilha de Inspecção - Ponte Ribeirao do Braço - Teste.xlsx'
+
+        familias = {f['nome_arquivo']: f for f in processa_planilha_ponte(planilha)}
+        pilares = familias['Pilar']
+        resultado = pilares['resultado']['Pilar']
+
+        self.assertEqual(list(familias), ['Pilar', 'Viga Lateral', 'Viga Transversina', 'Cortinas e Alas', 'Fundação do Pilar', 'Laje', 'Pista de Rolamento'])
+        self.assertEqual([familias[nome]['f_r'] for nome in familias], [5, 5, 3, 3, 4, 4, 1])
+        self.assertEqual(pilares['nome_elementos'], ['Pilar P 01', 'Pilar P 02', 'Pilar P 03', 'Pilar P 04'])
+        self.assertEqual(resultado.g_de.tolist(), [2.4000000000000004] * 4)
+        self.assertEqual(familias['Laje']['resultado']['Laje'].g_de.tolist(), [28.0])
+        self.assertEqual(len(familias['Fundação do Pilar']['fotos']), 0)
+        self.assertEqual([nome for nome, _ in familias['Laje']['fotos']], ['image30.jpeg', 'image31.jpeg'])
+        with zipfile.ZipFile(planilha) as zip_ref:
+            self.assertEqual(familias['Laje']['fotos'][0][1](), zip_ref.read('xl/media/image30.jpeg'))
+
+        # Uma aba por família, no formato da planilha modelo
+        modelo_pilar = EXEMPLOS.parent / 'modelos' / 'pilar_modelo.xlsx'
+        modelo = le_planilha_ponte(modelo_pilar)
+        self.assertEqual([(f['nome_familia'], f['f_r']) for f in modelo], [('PILARES', 5)])
+        pd.testing.assert_frame_equal(modelo[0]['tabela_original'], le_planilha(modelo_pilar.read_bytes())[0])
+
+    def test_le_planilha_ponte_blocos_repetidos(self):
+        import openpyxl
+
+        def planilha(abas):
+            livro = openpyxl.Workbook()
+            livro.remove(livro.active)
+            for nome, linhas in abas.items():
+                folha = livro.create_sheet(nome)
+                for linha in linhas:
+                    folha.append(linha)
+            saida = io.BytesIO()
+            livro.save(saida)
+            return saida.getvalue()
+
+        def bloco(nome, danos):
+            return [["Elemento", nome], ["Danos", "Fi", "Fp"], *[list(dano) for dano in danos], []]
+
+        aba_a = bloco("Pilar P 01", [("Fissura", 1, 2), ("Fissura", 3, 2), ("Umidade", 2, 1)]) + bloco("Pilar P 01", [("Fissura", 2, 2)])
+        aba_b = bloco("Pilar P 01", [("Umidade", 1, 1)]) + bloco("Laje L1", [("Fissura", 1, 1)])
+        familias = {f['nome_familia']: f for f in le_planilha_ponte(planilha({"A": aba_a, "B": aba_b}), ler_fotos=False)}
+        pilar = familias['Pilar']['tabela_original']
+
+        # Os blocos do Pilar nas duas abas são reunidos, sem perder linhas de danos repetidos
+        self.assertEqual(list(familias), ['Pilar', 'Laje'])
+        self.assertEqual(familias['Pilar']['nome_elementos'], ['Pilar P 01', 'Pilar P 01 (2)', 'Pilar P 01 (3)'])
+        self.assertEqual(pilar['Danos'].tolist(), ['Fissura', 'Fissura', 'Umidade'])
+        self.assertEqual(pilar['Fi - Pilar P 01'].tolist(), [1, 3, 2])
+        self.assertEqual(pilar['Fi - Pilar P 01 (2)'].fillna(-1).tolist(), [2, -1, -1])
+        self.assertEqual(pilar['Fp - Pilar P 01 (3)'].fillna(-1).tolist(), [-1, -1, 1])
+
+        modelo_laje = [["Danos", "Laje L2", ""], ["", "Fi", "Fp"], ["Fissura", 1, 2]]
+        with self.assertRaises(ValueError):
+            le_planilha_ponte(planilha({"A": aba_a, "B": aba_b, "laje": modelo_laje}))
+
+    def test_tabela_dano(self):
+        fi, fp = np.meshgrid(np.arange(5.0), np.arange(6.0), indexing="ij")
+        np.testing.assert_array_equal(TABELA_DANO, calcula_dano(fi, fp).ravel())
+
+        gerador = np.random.default_rng(0)
+        fi = gerador.integers(0, 5, (30, 8)).astype(float)
+        fp = gerador.integers(0, 6, (30, 8)).astype(float)
+        fi[2, 3], fp[5, 1], fi[7, 0] = 2.5, np.nan, 6
+        codigos, d_fora = codifica_fi_fp(fi, fp)
+
+        self.assertEqual(codigos.dtype, np.int8)
+        self.assertEqual((codigos < 0).sum(), 3)
+        np.testing.assert_array_equal(calcula_dano_codigos(codigos, d_fora), calcula_dano(fi, fp))
+        sum_d, d_max, g_de = avalia_elementos_lote(fi, fp)
+        d = calcula_dano(fi, fp)
+        np.testing.assert_allclose(sum_d, d.sum(axis=0), rtol=1e-12)
+        np.testing.assert_array_equal(d_max, d.max(axis=0))
+        with self.assertRaises(ValueError):
+            calcula_dano_codigos(codigos)
+        with self.assertRaises(ValueError):
+            avalia_elementos_codigos(codigos)
+
+
+    def test_extrai_codigos_em_blocos(self):
+        gerador = np.random.default_rng(1)
+        df = pd.DataFrame({'Danos': [f'Dano {i}' for i in range(12)] + ['Danos', '']})
+        for j in range(9):
+            df[f'Fi - E{j:02d}'] = np.append(gerador.integers(0, 5, 12).astype(float), [np.nan, 1.0])
+            df[f'Fp - E{j:02d}'] = np.append(gerador.integers(0, 6, 12).astype(float), [np.nan, 1.0])
+        df.loc[1, 'Fi - E03'], df.loc[4, 'Fp - E07'], df.loc[9, 'Fi - E00'] = 2.5, 7.0, np.nan
+        df['Fi - E05'] = df['Fi - E05'].astype(object)
+        df.loc[6, 'Fi - E05'] = 'x'
+
+        elementos, fi, fp, problemas = valida_dataset(df)
+        codigos_esperados, d_fora_esperado = codifica_fi_fp(fi, fp)
+        # Blocos de 30 células: 2 elementos por vez sobre as 12 linhas de danos
+        with unittest.mock.patch.object(gde_unb, 'TAMANHO_BLOCO_CELULAS', 30):
+            elementos_c, codigos, d_fora, problemas_c = valida_dataset_codigos(df)
+            resultado = avalia_elementos_codigos(codigos, d_fora)
+        self.assertEqual(elementos_c, elementos)
+        self.assertEqual(codigos.dtype, np.int8)
+        np.testing.assert_array_equal(codigos, codigos_esperados)
+        np.testing.assert_array_equal(d_fora, d_fora_esperado)
+        pd.testing.assert_frame_equal(problemas_c, problemas)
+        self.assertEqual(extrai_codigos_fi_fp(df)[0], elementos)
+
+        d = calcula_dano(fi, fp)
+        for obtido, esperado in zip(resultado, (d.sum(axis=0), d.max(axis=0))):
+            np.testing.assert_allclose(obtido, esperado, rtol=1e-12)
+        referencia = avalia_elemento_escalar(df)
+        for j, elemento in enumerate(elementos):
+            self.assertAlmostEqual(resultado[2][j], referencia[elemento]['g_de'], places=9)
+
+
+    def test_valida_dataset(self):
+        df = pd.DataFrame({
+            'Danos': ['Fissuras', 'Danos', 'Manchas', 'Umidade', 'Eflorescência'],
+            'Fi - P01': [2, 'Fi', 'x', 5, 3],
+            'Fp - P01': [3, 'Fp', 2, 4, None],
+            'Fi - P02': [1, 'Fi', 2.0, None, ' '],
+            'Fp - P02': [1, 'Fp', 3, 2, None],
+            'Fi - P03': [4, 'Fi', 4, 4, 4],
+            'Obs': ['', '', '', '', ''],
+        })
+
+        elementos, fi, fp, problemas = valida_dataset(df)
+
+        self.assertEqual(elementos, ['P01', 'P02', 'P03'])
+        self.assertEqual(fi.shape, (4, 3))
+        self.assertEqual(set(problemas['tipo']), set(PROBLEMAS_PLANILHA) - {'sem_coluna_danos', 'coluna_duplicada'})
+        registros = set(zip(problemas['linha'], problemas['coluna'], problemas['tipo']))
+        self.assertIn((-1, 'Obs', 'coluna_invalida'), registros)
+        self.assertIn((-1, 'Fp - P03', 'coluna_ausente'), registros)
+        self.assertIn((2, 'Fi - P01', 'nao_numerico'), registros)
+        self.assertIn((3, 'Fi - P01', 'fora_do_intervalo'), registros)
+        self.assertIn((4, 'Fp - P01', 'par_incompleto'), registros)
+        self.assertIn((3, 'Fi - P02', 'par_incompleto'), registros)
+        self.assertEqual(len(problemas), 6)
+        np.testing.assert_array_equal(fi[:, 0], [2, 0, 5, 0])
+        np.testing.assert_array_equal(fp[:, 1], [1, 3, 0, 0])
+        for extraida, validada in zip(extrai_matrizes_fi_fp(df), (elementos, fi, fp)):
+            np.testing.assert_array_equal(extraida, validada)
+
+        familia = processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=5, ler_fotos=False)
+        self.assertEqual(len(familia['problemas']), 0)
+
+
+    def test_avaliacao_incremental(self):
+        familias = [processa_zip_familia(EXEMPLOS / nome_zip, nome_zip, f_r=5) for nome_zip in ('pilares.zip', 'vigas.zip')]
+        avaliacao = AvaliacaoIncremental()
+        for familia in familias:
+            nome = familia['nome_arquivo']
+            avaliacao.atualiza(nome, familia['resultado'][nome], familia['tabela_original'], familia['fotos'])
+
+        def relatorio_completo():
+            resultados = {nome: avaliacao.familias[nome] for nome in avaliacao.familias}
+            g_d, nivel, recomendacao = avaliar_estrutura(resultados)
+            self.assertEqual(avaliacao.avalia(), (g_d, nivel, recomendacao))
+            return "".join(gera_relatorio_html(
+                resultados, g_d, nivel, recomendacao, avaliacao.tabelas, avaliacao.imagens, list(resultados),
+                [], gde_unb.FR_DESCRICAO, {}
+            ))
+
+        self.assertEqual("".join(avaliacao.gera_relatorio_html()), relatorio_completo())
+        self.assertEqual(avaliacao.renderizacoes, 4)
+
+        nome = familias[1]['nome_arquivo']
+        self.assertFalse(avaliacao.atualiza(nome, familias[1]['resultado'][nome], familias[1]['tabela_original'], familias[1]['fotos']))
+        self.assertTrue(avaliacao.aplica_fr(nome, 2))
+        self.assertFalse(avaliacao.aplica_fr(nome, 2))
+        self.assertEqual("".join(avaliacao.gera_relatorio_html()), relatorio_completo())
+        self.assertEqual(avaliacao.renderizacoes, 5)
+
+        avaliacao.remove(familias[0]['nome_arquivo'])
+        self.assertEqual("".join(avaliacao.gera_relatorio_html()), relatorio_completo())
+        self.assertEqual(avaliacao.renderizacoes, 5)
+        avaliacao.mantem([])
+        self.assertEqual((len(avaliacao), avaliacao.soma_fr, avaliacao.soma_fr_gdf), (0, 0.0, 0.0))
+
+        # Família sem fotos não é recalculada, e família sem 'f_r' fica fora da média, como em avaliar_estrutura
+        resultados = {'A': {'g_df': 10.0, 'f_r': 5}, 'B': {'g_df': 50.0}}
+        for nome, resultado in resultados.items():
+            self.assertTrue(avaliacao.atualiza(nome, resultado))
+        self.assertFalse(avaliacao.atualiza('A', resultados['A']))
+        self.assertFalse(avaliacao.atualiza('A', resultados['A'], imagens=[]))
+        self.assertEqual(avaliacao.avalia(), avaliar_estrutura(resultados))
+        self.assertEqual(avaliacao.avalia()[0], 10.0)
+
+
+    def test_espaco_sessao(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            espaco = EspacoSessao(tmp, limite_bytes=3000, limite_arquivo=2000)
+            diretorio = espaco.diretorio
+
+            caminho, chave = espaco.guarda(io.BytesIO(b'a' * 1500), '.zip')
+            self.assertEqual(caminho.read_bytes(), b'a' * 1500)
+            self.assertEqual(espaco.guarda(b'a' * 1500, '.zip'), (caminho, chave))
+            self.assertEqual(espaco.bytes_usados, 1500)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                guardados = set(executor.map(lambda _: espaco.guarda(b'a' * 1500, '.zip'), range(32)))
+            self.assertEqual(guardados, {(caminho, chave)})
+            self.assertEqual(espaco.bytes_usados, 1500)
+            with self.assertRaises(ValueError):
+                espaco.guarda(b'b' * 2001)
+            with self.assertRaises(ValueError):
+                espaco.guarda(b'c' * 1600)
+            self.assertEqual(sorted(p.name for p in diretorio.iterdir()), [caminho.name])
+
+            fotos = [('a.jpg', b'foto'), ('b.jpg', b'foto')]
+            preparadas = prepara_fotos(fotos, espaco=espaco)
+            self.assertTrue(all(callable(imagem) for _, imagem in preparadas))
+            self.assertEqual(preparadas[1][1](), b'foto')
+            self.assertEqual(espaco.bytes_usados, 1504)
+
+            relatorio = espaco.novo_caminho('.html')
+            relatorio.write_bytes(b'relatorio')
+            espaco.registra(relatorio)
+            espaco.mantem([relatorio, None])
+            self.assertEqual(sorted(diretorio.iterdir()), [relatorio])
+            self.assertEqual(espaco.bytes_usados, 9)
+            espaco.guarda(b'a' * 1500, '.zip')
+
+            espaco.remove(caminho)
+            self.assertFalse(caminho.exists())
+            self.assertEqual(espaco.bytes_usados, 9)
+            espaco.limpa()
+            self.assertFalse(diretorio.exists())
+
+            antigo = Path(tempfile.mkdtemp(prefix='gde_sessao_', dir=tmp))
+            os.utime(antigo, (0, 0))
+            self.assertEqual(EspacoSessao.limpa_antigas(tmp, idade_max=3600), 1)
+
+        cache = CacheLRU(max_entradas=10, max_bytes=10)
+        for chave in 'abc':
+            cache.obter_ou_calcular(chave, lambda: b'1234')
+        self.assertEqual((len(cache), cache.bytes), (2, 8))
+
+
+    def test_importacao_sem_dependencias_pesadas(self):
+        codigo = (
+            "import sys, gde_unb; "
+            "print(gde_unb.avaliar_estrutura({'a': {'f_r': 5, 'g_df': 20.0}})[1]); "
+            "print(sorted(m for m in ('pandas', 'numpy', 'PIL.Image') if m in sys.modules))"
+        )
+        saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True, cwd=EXEMPLOS.parent)
+        self.assertEqual(saida.stdout.splitlines(), ['Médio', '[]'])
+        np.testing.assert_array_equal(gde_unb.TABELA_DANO, gde_unb.tabela_dano())
+
+    def test_servico_http(self):
+        servico = ServicoGDE(n_workers=2, max_pendentes=8)
+        servidor = cria_servidor_http(servico, '127.0.0.1', 0)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{servidor.server_address[1]}'
+
+        def post(rota, corpo):
+            with urlopen(Request(url + rota, data=corpo, method='POST'), timeout=60) as resposta:
+                return json.loads(resposta.read())
+
+        try:
+            inspecao = {'ponte': 'P1', 'familias': {
+                'Pilares': {'elementos': ['P01', 'P02'], 'fi': [[1, 2], [3, 0]], 'fp': [[2, 3], [4, 1]]},
+                'Vigas': {'f_r': 4, 'elementos': {'V01': {'fi': [2], 'fp': [5]}}},
+                'Pilares de apoio': {'f_r': 0, 'elementos': {'P03': {'fi': [4], 'fp': [5]}}},
+            }}
+            resposta = post('/avaliar', json.dumps(inspecao).encode())
+            self.assertEqual(resposta['familias']['Pilares de apoio']['f_r'], 0)
+            esperado = {
+                'Pilares': ResultadoFamilia(['P01', 'P02'], *avalia_elementos_lote(np.array([[1, 2], [3, 0]]), np.array([[2, 3], [4, 1]])), 5),
+                'Vigas': ResultadoFamilia(['V01'], *avalia_elementos_lote(np.array([[2]]), np.array([[5]])), 4),
+            }
+            self.assertAlmostEqual(resposta['g_d'], avaliar_estrutura(esperado)[0])
+            self.assertEqual(resposta['familias']['Pilares']['f_r'], 5)
+            self.assertAlmostEqual(resposta['familias']['Vigas']['resultados_elemento']['V01']['d_max'], 8.0)
+
+            lote = lote_valido = post('/avaliar', json.dumps({'inspecoes': [inspecao, {'ponte': 'P2', 'familias': {}}]}).encode())
+            self.assertAlmostEqual(lote['resultados'][0]['g_d'], resposta['g_d'])
+            self.assertIn('erro', lote['resultados'][1])
+
+            zip_familia = post('/avaliar/zip?nome=pilares.zip', (EXEMPLOS / 'pilares.zip').read_bytes())
+            g_d_zip = avaliar_estrutura(processa_zip_familia(EXEMPLOS / 'pilares.zip', 'pilares.zip', f_r=5, ler_fotos=False)['resultado'])[0]
+            self.assertAlmostEqual(zip_familia['g_d'], g_d_zip)
+
+            with self.assertRaises(HTTPError) as contexto:
+                post('/avaliar', b'{invalido')
+            self.assertEqual(contexto.exception.code, 400)
+
+            with urlopen(url + '/metricas', timeout=60) as resposta:
+                metricas = json.loads(resposta.read())
+            self.assertEqual(metricas['requisicoes'], {'/avaliar': 3, '/avaliar/zip': 1})
+            self.assertEqual(metricas['erros'], {'/avaliar': 1})
+            self.assertEqual(metricas['pendentes'], 0)
+            self.assertGreater(metricas['latencia_ms']['p99'], 0)
+
+            # Content-Length ausente, negativo ou não numérico: resposta imediata, sem ler o corpo
+            for cabecalho, status in ((None, 411), ('-1', 400), ('abc', 400)):
+                conexao = http.client.HTTPConnection('127.0.0.1', servidor.server_address[1], timeout=10)
+                conexao.putrequest('POST', '/avaliar')
+                if cabecalho is not None:
+                    conexao.putheader('Content-Length', cabecalho)
+                conexao.endheaders()
+                self.assertEqual(conexao.getresponse().status, status)
+                conexao.close()
+
+            # Rota desconhecida: o corpo não lido não pode ser tomado como a próxima requisição da conexão
+            conexao = http.client.HTTPConnection('127.0.0.1', servidor.server_address[1], timeout=10)
+            conexao.request('POST', '/outra', body=b'GET /saude HTTP/1.1\r\n\r\n')
+            resposta_rota = conexao.getresponse()
+            resposta_rota.read()
+            self.assertEqual((resposta_rota.status, resposta_rota.getheader('Connection')), (404, 'close'))
+            conexao.close()
+
+            # Elemento que não é um objeto: erro 400 (ou 'erro' na posição do lote) com o nome do elemento
+            invalida = {'ponte': 'P3', 'familias': {'Vigas': {'f_r': 4, 'elementos': {'V01': 5}}}}
+            with self.assertRaises(HTTPError) as contexto:
+                post('/avaliar', json.dumps(invalida).encode())
+            self.assertEqual(contexto.exception.code, 400)
+            self.assertIn('V01', json.loads(contexto.exception.read())['erro'])
+            lote = post('/avaliar', json.dumps({'inspecoes': [invalida, inspecao]}).encode())
+            self.assertIn('V01', lote['resultados'][0]['erro'])
+            self.assertAlmostEqual(lote['resultados'][1]['g_d'], lote_valido['resultados'][0]['g_d'])
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+            servico.encerra()
+    def test_avalia_zip_json_limites(self):
+        def zip_ponte(membros):
+            dados = io.BytesIO()
+            with zipfile.ZipFile(dados, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+                for nome, conteudo in membros:
+                    zip_ref.writestr(nome, conteudo)
+            return dados.getvalue()
+
+        familia = (EXEMPLOS / 'pilares.zip').read_bytes()
+        self.assertEqual(len(avalia_zip_json(zip_ponte([('pilares.zip', familia)]), 'ponte.zip', 5)['familias']), 1)
+        with self.assertRaisesRegex(ValueError, 'mesmo nome'):
+            avalia_zip_json(zip_ponte([('a/pilares.zip', familia), ('b/pilares.zip', familia)]), 'ponte.zip', 5)
+
+        # Conteúdo descompactado acima do limite, no pacote da ponte, nos .zip das famílias e no .zip de uma família
+        bomba = zip_ponte([('planilha.xlsx', b'\0' * 100000)])
+        with unittest.mock.patch.object(gde_servico, 'LIMITE_ARQUIVO_BYTES', 50000):
+            for dados, nome in ((zip_ponte([('ponte.xlsx', b'\0' * 100000)]), 'ponte.zip'), (zip_ponte([('pilares.zip', bomba)]), 'ponte.zip'), (bomba, 'pilares.zip')):
+                with self.subTest(nome=nome), self.assertRaisesRegex(ValueError, 'limite'):
+                    avalia_zip_json(dados, nome, 5)
+
+    def test_exportador_resultados(self):
+        pilares = ResultadoFamilia(['P01', 'P02'], *avalia_elementos_lote(np.array([[1, 2]]), np.array([[3, 4]])), 5)
+        vigas = ResultadoFamilia(['V01'], *avalia_elementos_lote(np.array([[3]]), np.array([[4]])), 4).como_dict()
+        exportador = ExportadorResultados().adiciona_lote([
+            ('OAE/1', '2025-05-01', {'Pilares': pilares, 'Vigas': vigas}),
+            ('OAE 2', '2025-06-01', {'Pilares': pilares}),
+        ])
+        tabelas = exportador.tabelas()
+
+        elementos = tabelas['elementos']
+        self.assertEqual(list(elementos.columns), ['ponte', 'data', 'familia', 'elemento', 'sum_d', 'd_max', 'g_de'])
+        self.assertEqual(list(elementos['elemento'].astype(str)), ['P01', 'P02', 'V01', 'P01', 'P02'])
+        np.testing.assert_allclose(elementos['g_de'], np.concatenate([pilares.g_de, [32.0], pilares.g_de]))
+        self.assertEqual(elementos['data'].dtype.kind, 'M')
+        self.assertEqual(tabelas['familias']['f_r_g_df'].iloc[1], 128.0)
+        estruturas = tabelas['estruturas']
+        self.assertAlmostEqual(estruturas['g_d'].iloc[0], avaliar_estrutura({'Pilares': pilares, 'Vigas': vigas})[0])
+        self.assertEqual(list(estruturas['nivel'].cat.categories), ['Baixo', 'Médio', 'Alto', 'Sofrível'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            arquivos = exportador.escreve(tmp, formato='csv', particionar=('data', 'ponte'))
+            self.assertEqual(arquivos['elementos'][0], Path(tmp) / 'elementos' / 'ponte=OAE%2F1' / 'data=2025-05-01' / 'parte-0.csv')
+            lido = pd.read_csv(arquivos['elementos'][1])
+            self.assertEqual(list(lido.columns), ['familia', 'elemento', 'sum_d', 'd_max', 'g_de'])
+            self.assertEqual(len(lido), 2)
+            with self.assertRaises(ValueError):
+                exportador.escreve(tmp, formato='xls')
+
+            if importlib.util.find_spec('pyarrow') is not None:
+                caminho = exportador.escreve(tmp, formato='parquet')['elementos'][0]
+                pd.testing.assert_frame_equal(pd.read_parquet(caminho), elementos, check_categorical=False)
+    def test_compara_inspecoes(self):
+        anterior = pd.DataFrame({'Danos': ['Fissura', 'Corrosão', 'Fissura'], 'Fi - P01': [1, 0, 2], 'Fp - P01': [2, 0, 3], 'Fi - P02': [0, 3, 0], 'Fp - P02': [0, 4, 0]})
+        atual = pd.DataFrame({'Danos': ['Fissura', 'Corrosão', 'Fissura', 'Eflorescência'], 'Fi - P01': [1, 0, 3, 0], 'Fp - P01': [2, 0, 3, 0], 'Fi - P03': [2, 0, 0, 1], 'Fp - P03': [2, 0, 0, 1]})
+        tabelas_anteriores = tabelas_inspecao({'Pilares': (anterior, 5)})
+        tabelas_atuais = tabelas_inspecao({'Pilares': (atual, 5), 'Vigas': (anterior, 4)})
+        diferencas = compara_inspecoes(tabelas_anteriores, tabelas_atuais)
+
+        danos = diferencas['danos'].set_index(['familia', 'dano', 'ocorrencia', 'elemento'])
+        agravado = danos.loc[('Pilares', 'Fissura', 1, 'P01')]
+        self.assertEqual((agravado['fi_anterior'], agravado['fi'], agravado['delta_fi']), (2.0, 3.0, 1.0))
+        self.assertAlmostEqual(agravado['delta_d'], 24.0 - 4.8)
+        self.assertEqual(agravado['situacao'], 'agravado')
+        self.assertEqual(danos.loc[('Pilares', 'Corrosão', 0, 'P02'), 'situacao'], 'removido')
+        self.assertEqual(danos.loc[('Pilares', 'Eflorescência', 0, 'P03'), 'situacao'], 'novo')
+        self.assertNotIn(('Pilares', 'Fissura', 0, 'P01'), danos.index)
+
+        elementos = diferencas['elementos'].set_index(['familia', 'elemento'])['situacao']
+        self.assertEqual(elementos[('Pilares', 'P02')], 'removido')
+        self.assertEqual(elementos[('Pilares', 'P03')], 'novo')
+        self.assertEqual(diferencas['elementos']['delta_g_de'].iloc[0], diferencas['elementos']['delta_g_de'].max())
+        self.assertEqual(list(diferencas['familias']['situacao']), ['atenuado', 'novo'])
+        estrutura = diferencas['estrutura'].iloc[0]
+        self.assertAlmostEqual(estrutura['delta_g_d'], tabelas_atuais['estrutura']['g_d'][0] - tabelas_anteriores['estrutura']['g_d'][0])
+
+        completas = compara_inspecoes(tabelas_anteriores, tabelas_anteriores, somente_alteracoes=False)
+        self.assertTrue((completas['danos']['situacao'] == 'igual').all())
+        self.assertEqual(len(completas['danos']), len(tabelas_anteriores['danos']))
+
+        lote = compara_lote([('A', tabelas_anteriores, tabelas_atuais), ('B', tabelas_anteriores, tabelas_anteriores)])
+        self.assertEqual(list(lote['estrutura']['ponte']), ['A', 'B'])
+        self.assertEqual(len(lote['elementos']), len(diferencas['elementos']))
+
+        html = ''.join(gera_relatorio_html(
+            {'Pilares': avalia_familia_compacta(atual, 'Pilares', 5)['Pilares']}, 0.0, 'Baixo', '', {}, {}, ['pilares.zip'], [5], gde_unb.FR_DESCRICAO, {}, diferencas=diferencas
+        ))
+        self.assertIn('Comparação com a inspeção anterior', html)
+
+    def test_inventario_mapeado(self):
+        rng = np.random.default_rng(3)
+        pontes = []
+        for indice in range(12):
+            familias = {}
+            for familia in range(indice % 4):
+                fi = rng.integers(0, 5, (4, 5)).astype(float)
+                fp = rng.integers(0, 6, (4, 5)).astype(float)
+                fi[:, 0] = 0
+                if indice % 3 == 0:
+                    fi[0, 1], fp[0, 1] = 2.5, 3.5
+                familias[f"Familia {familia}"] = ([f"E{k}" for k in range(5)], fi, fp, float(familia + 1))
+            pontes.append((f"Ponte {indice}", familias))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            inventario = InventarioMapeado.grava(tmp, pontes)
+            self.assertEqual((inventario.n_pontes, inventario.n_familias, inventario.n_elementos), (12, 18, 90))
+            self.assertEqual(inventario.nomes('pontes', 3, 5), ['Ponte 3', 'Ponte 4'])
+
+            for tamanho_bloco in (1, 30, 1 << 20):
+                tabela = inventario.pontua(tamanho_bloco=tamanho_bloco)
+                for (ponte, familias), linha in zip(pontes, tabela.itertuples()):
+                    esperados = {nome: ResultadoFamilia(elementos, *avalia_elementos_lote(fi, fp), f_r) for nome, (elementos, fi, fp, f_r) in familias.items()}
+                    g_d, nivel, _ = avaliar_estrutura(esperados)
+                    self.assertEqual(linha.ponte, ponte)
+                    self.assertAlmostEqual(linha.g_d, g_d)
+                    self.assertEqual(linha.nivel, nivel)
+
+            lidos = inventario.resultados_ponte('Ponte 3')
+            esperados = {nome: ResultadoFamilia(elementos, *avalia_elementos_lote(fi, fp), f_r) for nome, (elementos, fi, fp, f_r) in pontes[3][1].items()}
+            self.assertEqual(list(lidos), list(esperados))
+            for nome, esperado in esperados.items():
+                np.testing.assert_allclose(lidos[nome].g_de, esperado.g_de)
+                self.assertAlmostEqual(lidos[nome].g_df, esperado.g_df)
+                self.assertEqual(lidos[nome].elementos, esperado.elementos)
+
+            dobrada = inventario.pontua(dano=lambda fi, fp: 2 * calcula_dano(fi, fp))
+            np.testing.assert_allclose(dobrada['g_d'], 2 * tabela['g_d'])
 
 
 if __name__ == '__main__':